@@ -1,11 +1,177 @@
 # You are helping build an AI Product Decision Platform. Never add generic charts or infra metrics. All outputs must directly support: what is broken, why, and what to fix first for an AI SaaS product.
 
+"""Supabase JWT verification.
+
+auth_mode "local" (default) checks the signature and expiry in-process: HS256 tokens against the project's
+JWT secret, RS256/ES256 tokens against the project's JWKS, which is cached and refreshed in the background
+(and on an unknown key id). When no key is available locally the token is checked with GET /auth/v1/user,
+which is also the only check in auth_mode "remote". Verified claims are kept in a short-TTL LRU keyed by
+token hash, never past the token's own expiry."""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from typing import Any
+
+import httpx
+import jwt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-import httpx
+
+logger = logging.getLogger(__name__)
 
 security = HTTPBearer(auto_error=False)
 
+AUTH_MODES = ("local", "remote")
+AUDIENCE = "authenticated"
+LOCAL_ALGORITHMS = ("HS256", "RS256", "ES256")
+JWK_KEY_TYPES = {"RS256": "RSA", "ES256": "EC"}  # the token's alg must match the type of the key its kid names
+LEEWAY_SEC = 10  # clock skew tolerated on exp/iat
+JWKS_REFRESH_SEC = 600
+JWKS_MIN_REFETCH_SEC = 30  # at most one refetch per this interval for unknown key ids
+CLAIMS_CACHE_SIZE = 10_000
+HTTP_TIMEOUT_SEC = 10
+
+
+class _ClaimsCache:
+    def __init__(self, max_entries: int = CLAIMS_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+
+    @staticmethod
+    def key(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def get(self, token: str) -> dict | None:
+        key = self.key(token)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def put(self, token: str, user: dict, ttl_sec: float, exp: Any = None) -> None:
+        expires = time.time() + ttl_sec
+        if isinstance(exp, (int, float)):
+            expires = min(expires, float(exp))
+        if ttl_sec <= 0 or expires <= time.time():
+            return
+        key = self.key(token)
+        self._entries[key] = (expires, user)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+class _JWKSCache:
+    def __init__(self):
+        self.keys: dict[str, jwt.PyJWK] = {}
+        self.fetched_at = 0.0
+
+    async def get(self, kid: str | None) -> jwt.PyJWK | None:
+        if kid not in self.keys and time.monotonic() - self.fetched_at >= JWKS_MIN_REFETCH_SEC:
+            await self.refresh()
+        return self.keys.get(kid)
+
+    async def refresh(self) -> None:
+        self.fetched_at = time.monotonic()
+        try:
+            jwks = await _fetch_jwks()
+        except Exception as e:
+            logger.warning("JWKS refresh failed, keeping %s cached keys: %s", len(self.keys), e)
+            return
+        keys = {}
+        for jwk in jwks.get("keys") or []:
+            try:
+                keys[jwk.get("kid")] = jwt.PyJWK(jwk)
+            except Exception as e:
+                logger.warning("skipping unusable JWKS key %s: %s", jwk.get("kid"), e)
+        self.keys = keys
+
+
+_claims = _ClaimsCache()
+_jwks = _JWKSCache()
+_http: httpx.AsyncClient | None = None
+_http_loop: asyncio.AbstractEventLoop | None = None
+_refresh_task: asyncio.Task | None = None
+
+
+def _client() -> httpx.AsyncClient:
+    """One pooled client per event loop for JWKS and /auth/v1/user calls."""
+    global _http, _http_loop
+    loop = asyncio.get_running_loop()
+    if _http is None or _http_loop is not loop:
+        _http = httpx.AsyncClient(timeout=HTTP_TIMEOUT_SEC)
+        _http_loop = loop
+    return _http
+
+
+async def _fetch_jwks() -> dict:
+    from app.config import settings
+    if not settings.supabase_url:
+        return {}
+    r = await _client().get(
+        f"{settings.supabase_url.rstrip('/')}/auth/v1/.well-known/jwks.json",
+        headers={"apikey": settings.supabase_anon_key},
+    )
+    r.raise_for_status()
+    return r.json()
+
+
+async def _remote_user(token: str) -> dict | None:
+    """User JSON from GET /auth/v1/user, or None if Supabase rejects the token."""
+    from app.config import settings
+    if not settings.supabase_url or not settings.supabase_anon_key:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Auth not configured",
+        )
+    r = await _client().get(
+        f"{settings.supabase_url.rstrip('/')}/auth/v1/user",
+        headers={
+            "Authorization": f"Bearer {token}",
+            "apikey": settings.supabase_anon_key,
+        },
+    )
+    if r.status_code != 200:
+        return None
+    return r.json()
+
+
+async def _local_claims(token: str, header: dict) -> dict | None:
+    """Verified claims, or None if no key is available locally. Raises jwt.InvalidTokenError for bad tokens."""
+    from app.config import settings
+    alg = header.get("alg")
+    if alg not in LOCAL_ALGORITHMS:
+        raise jwt.InvalidAlgorithmError(f"unsupported alg {alg!r}")
+    if alg == "HS256":
+        key = settings.supabase_jwt_secret or None
+    else:
+        jwk = await _jwks.get(header.get("kid"))
+        if jwk is not None and jwk.key_type != JWK_KEY_TYPES[alg]:
+            raise jwt.InvalidAlgorithmError(f"alg {alg!r} does not match {jwk.key_type} key {header.get('kid')!r}")
+        key = jwk.key if jwk is not None else None
+    if key is None:
+        return None
+    return jwt.decode(
+        token,
+        key,
+        algorithms=[alg],
+        audience=AUDIENCE,
+        leeway=LEEWAY_SEC,
+        options={"require": ["exp", "sub"]},
+    )
+
 
 async def verify_supabase_jwt(
     credentials: HTTPAuthorizationCredentials | None = Depends(security),
@@ -17,25 +183,57 @@ async def verify_supabase_jwt(
             detail="Missing or invalid authorization header",
         )
     token = credentials.credentials
+    cached = _claims.get(token)
+    if cached is not None:
+        return cached
     from app.config import settings
-    if not settings.supabase_url or not settings.supabase_anon_key:
-        raise HTTPException(
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail="Auth not configured",
-        )
-    url = f"{settings.supabase_url.rstrip('/')}/auth/v1/user"
-    async with httpx.AsyncClient() as client:
-        r = await client.get(
-            url,
-            headers={
-                "Authorization": f"Bearer {token}",
-                "apikey": settings.supabase_anon_key,
-            },
-        )
-    if r.status_code != 200:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid or expired token",
-        )
-    data = r.json()
-    return {"sub": data.get("id"), "email": data.get("email"), "raw": data}
+    invalid = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid or expired token",
+    )
+
+    claims = None
+    if settings.auth_mode != "remote":
+        try:
+            claims = await _local_claims(token, jwt.get_unverified_header(token))
+        except (jwt.PyJWTError, TypeError, ValueError):
+            # TypeError/ValueError: a key PyJWT cannot use with the token's alg; still the token's fault.
+            raise invalid
+    if claims is not None:
+        user = {"sub": claims.get("sub"), "email": claims.get("email"), "raw": claims}
+        exp = claims.get("exp")
+    else:
+        data = await _remote_user(token)
+        if data is None:
+            raise invalid
+        user = {"sub": data.get("id"), "email": data.get("email"), "raw": data}
+        try:
+            exp = jwt.decode(token, options={"verify_signature": False}).get("exp")
+        except jwt.InvalidTokenError:
+            exp = None
+    _claims.put(token, user, settings.auth_claims_cache_ttl_sec, exp)
+    return user
+
+
+async def _refresh_jwks_forever() -> None:
+    while True:
+        await _jwks.refresh()
+        await asyncio.sleep(JWKS_REFRESH_SEC)
+
+
+def start_auth() -> None:
+    """Start the background JWKS refresh (local mode with a Supabase URL). Called from the app lifespan."""
+    global _refresh_task
+    from app.config import settings
+    if settings.auth_mode == "local" and settings.supabase_url:
+        _refresh_task = asyncio.create_task(_refresh_jwks_forever())
+
+
+async def stop_auth() -> None:
+    global _refresh_task, _http
+    if _refresh_task is not None:
+        _refresh_task.cancel()
+        _refresh_task = None
+    if _http is not None:
+        client, _http = _http, None
+        await client.aclose()
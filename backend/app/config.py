@@ -9,11 +9,40 @@ class Settings(BaseSettings):
     supabase_url: str = ""
     supabase_anon_key: str = ""
     supabase_service_role_key: str = ""
+    supabase_jwt_secret: str = ""  # project JWT secret; lets HS256 access tokens be verified without calling Supabase Auth
+    auth_mode: str = "local"  # "local" (signature/expiry checked in-process, JWKS or JWT secret) or "remote" (GET /auth/v1/user)
+    auth_claims_cache_ttl_sec: int = 60  # verified tokens are not re-checked within this window (never past exp)
+    account_context_ttl_sec: int = 30  # org / account_id / billing state cached per user; org creation and billing webhooks invalidate
     database_url: str = ""
+    supabase_pool_size: int = 20  # pooled HTTP connections to PostgREST, shared by all requests in the process
+    supabase_timeout_sec: float = 30  # per PostgREST request
+    supabase_connect_timeout_sec: float = 5
+    supabase_keepalive_sec: float = 30  # idle pooled connections are closed after this
+    supabase_http2: bool = True
+    io_threads: int = 32  # blocking Supabase/Stripe/embedding calls run on this many threads, off the event loop
+    cluster_processes: int = 2  # KMeans runs in this many worker processes; 0 runs it on the I/O threads
     openai_api_key: str = ""
     allowed_origins: str = ""
     frontend_base_url: str = ""  # e.g. https://your-app.vercel.app — used for Stripe success/cancel redirects
-    max_upload_bytes: int = 5 * 1024 * 1024  # 5MB
+    max_upload_bytes: int = 200 * 1024 * 1024  # 200MB; uploads are parsed and inserted as a stream
+    max_compressed_upload_bytes: int = 100 * 1024 * 1024  # 100MB on the wire for .gz/.zst uploads
+    max_decompressed_bytes: int = 1024 * 1024 * 1024  # 1GB after decompression (zip-bomb guard)
+    ingest_insert_concurrency: int = 4  # ai_logs insert batches in flight per upload
+    ingest_max_concurrent_jobs: int = 2  # background uploads (?async=true) processed at once per process
+    embedding_provider: str = "openai"  # "openai" or "local" (offline TF-IDF + SVD; also used by /insights/generate?preview=true)
+    embedding_batch_tokens: int = 60_000  # estimated tokens per OpenAI embeddings request (provider cap: 300k)
+    embedding_cache_dir: str = ".cache/embeddings"  # local float32 fallback for the ai_log_embeddings cache; "" disables
+    embedding_cache_max_mb: int = 512  # least recently used vectors are deleted past this size
+    llm_cache_max_entries: int = 2048  # cached LLM responses kept in memory per process (LRU)
+    llm_cache_ttl_sec: int = 7 * 24 * 3600  # how long an identical prompt is answered from cache
+    llm_cache_shared: bool = False  # also read/write the llm_response_cache table so instances share answers
+    llm_max_concurrency: int = 16  # chat completions in flight per process
+    llm_account_concurrency: int = 4  # chat completions in flight per account
+    llm_timeout_sec: int = 30  # deadline per chat completion, including retries on 429/5xx
+    llm_max_retries: int = 3
+    rate_limits: str = ""  # per endpoint key, e.g. "insights/generate=5/600,ingestion/upload=30/600" (requests/seconds); others 10/600
+    rate_limit_shared: bool = False  # count in the rate_limit_counters table so all instances share limits
+    decision_cards_batched: bool = False  # several insights per Decision Card request (fewer tokens and round trips)
 
     stripe_secret_key: str = ""
     stripe_webhook_secret: str = ""
@@ -0,0 +1,79 @@
+# You are helping build an AI Product Decision Platform. Never add generic charts or infra metrics. All outputs must directly support: what is broken, why, and what to fix first for an AI SaaS product.
+
+"""Shared FastAPI dependencies for routers."""
+
+import httpx
+from fastapi import Depends, HTTPException
+from supabase import Client, ClientOptions, create_client
+
+from app.auth import verify_supabase_jwt
+from app.config import settings
+from app.services.offload import run_io
+from app.services.organization import AccountContext, account_contexts
+
+_supabase: Client | None = None
+_http: httpx.Client | None = None
+
+
+def _storage_configured() -> bool:
+    return bool(settings.supabase_url and settings.supabase_service_role_key)
+
+
+def create_supabase_client() -> tuple[Client, httpx.Client]:
+    """
+    Service-role client on one pooled httpx session (keep-alive, HTTP/2 when enabled). httpx.Client is
+    thread-safe, so route handlers and worker threads share it.
+    """
+    http = httpx.Client(
+        http2=settings.supabase_http2,
+        limits=httpx.Limits(
+            max_connections=settings.supabase_pool_size,
+            max_keepalive_connections=settings.supabase_pool_size,
+            keepalive_expiry=settings.supabase_keepalive_sec,
+        ),
+        timeout=httpx.Timeout(settings.supabase_timeout_sec, connect=settings.supabase_connect_timeout_sec),
+    )
+    options = ClientOptions(
+        httpx_client=http,
+        postgrest_client_timeout=settings.supabase_timeout_sec,
+        auto_refresh_token=False,
+        persist_session=False,
+    )
+    return create_client(settings.supabase_url, settings.supabase_service_role_key, options=options), http
+
+
+def init_supabase() -> None:
+    """Create the application-scoped client (app lifespan). No-op when storage is not configured."""
+    global _supabase, _http
+    if _supabase is None and _storage_configured():
+        _supabase, _http = create_supabase_client()
+
+
+def close_supabase() -> None:
+    global _supabase, _http
+    if _http is not None:
+        _http.close()
+    _supabase, _http = None, None
+
+
+def get_supabase() -> Client:
+    """The shared Supabase client; created on first use if the lifespan did not create it (e.g. scripts)."""
+    if not _storage_configured():
+        raise HTTPException(status_code=503, detail="Server not configured for storage.")
+    if _supabase is None:
+        init_supabase()
+    return _supabase
+
+
+async def get_account_context(
+    user: dict = Depends(verify_supabase_jwt),
+    supabase: Client = Depends(get_supabase),
+) -> AccountContext:
+    """
+    Organization, account_id and billing entitlement of the caller, resolved once per request (FastAPI
+    reuses a dependency's result within a request) and cached across requests for a short TTL.
+    """
+    user_id = user.get("sub")
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Invalid session.")
+    return await run_io(account_contexts.get, supabase, user_id)
@@ -1,10 +1,15 @@
 # You are helping build an AI Product Decision Platform. Never add generic charts or infra metrics. All outputs must directly support: what is broken, why, and what to fix first for an AI SaaS product.
 
+import codecs
 import csv
-import io
+import hashlib
 import json
-from datetime import datetime
-from typing import Any
+import re
+import zlib
+from datetime import datetime, timezone
+from typing import Any, BinaryIO, Iterable, Iterator
+
+UPLOAD_CHUNK_BYTES = 256 * 1024
 
 REQUIRED = {"session_id", "timestamp", "input", "output", "feedback_type", "feedback_value"}
 OPTIONAL = {"user_id", "tags", "metadata"}
@@ -14,8 +19,8 @@ def _normalize_key(k: str) -> str:
     return k.strip().lower().replace(" ", "_").replace("-", "_")
 
 
-def _parse_ts(v: Any) -> str | None:
-    """Return ISO timestamptz string or None if invalid."""
+def _parse_dt(v: Any) -> tuple[str, datetime] | None:
+    """Return (ISO timestamptz string, parsed datetime) or None if invalid."""
     if v is None or (isinstance(v, str) and not v.strip()):
         return None
     s = str(v).strip()
@@ -23,16 +28,59 @@ def _parse_ts(v: Any) -> str | None:
         return None
     try:
         dt = datetime.fromisoformat(s.replace("Z", "+00:00"))
-        return dt.isoformat()
+        return dt.isoformat(), dt
     except (ValueError, TypeError):
         pass
     try:
         dt = datetime.utcfromtimestamp(float(s))
-        return dt.isoformat() + "Z"
+        return dt.isoformat() + "Z", dt
     except (ValueError, TypeError, OSError):
         return None
 
 
+def _parse_ts(v: Any) -> str | None:
+    """Return ISO timestamptz string or None if invalid."""
+    parsed = _parse_dt(v)
+    return parsed[0] if parsed else None
+
+
+def content_hash(account_id: str, session_id: str, ts: datetime, input_text: str, output_text: str) -> str:
+    """
+    Stable dedup key for an ai_logs row (first 128 bits of sha256, hex). Naive timestamps count as UTC.
+    Must stay in sync with the SQL backfill in migration 20261018000001_ai_logs_content_hash.sql.
+    """
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    ts_key = ts.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+    payload = "\x1f".join((account_id, session_id, ts_key, input_text, output_text))
+    return hashlib.sha256(payload.encode("utf-8", "surrogatepass")).hexdigest()[:32]
+
+
+NEGATIVE_FEEDBACK_TYPES = ("thumb_down", "thumbs_down", "negative", "down")
+POSITIVE_FEEDBACK_TYPES = ("thumb_up", "thumbs_up", "positive", "up")
+
+
+# Same pattern as the backfill in migration 20261018000002, so ingest and backfill agree on what a score is
+# (float() would also accept "inf", "nan" and "1_0"). ASCII \s, like Postgres. Out-of-range values saturate
+# in float() ("1e400" -> inf, "1e-400" -> 0.0); the backfill's feedback_score does the same.
+_SCORE_RE = re.compile(r"\s*[-+]?([0-9]+\.?[0-9]*|\.[0-9]+)([eE][-+]?[0-9]{1,3})?\s*", re.ASCII)
+
+
+def is_negative_feedback(feedback_type: Any, feedback_value: Any) -> bool:
+    """
+    Negative if the type says so, else if the value is a score below 3.
+    Stored as ai_logs.is_negative at ingest; the backfill in migration 20261018000002 mirrors this.
+    """
+    ft = (feedback_type or "").lower()
+    if ft in NEGATIVE_FEEDBACK_TYPES:
+        return True
+    if ft in POSITIVE_FEEDBACK_TYPES:
+        return False
+    if feedback_value is None or not _SCORE_RE.fullmatch(str(feedback_value)):
+        return False
+    return float(feedback_value) < 3.0
+
+
 def _parse_tags(v: Any) -> list[str]:
     if v is None:
         return []
@@ -49,92 +97,465 @@ def _parse_tags(v: Any) -> list[str]:
     return [x.strip() for x in s.split(",") if x.strip()]
 
 
+# Canonical fields in lookup order; RowValidator resolves each to a column once per header.
+_FIELDS = ("session_id", "timestamp", "user_id", "input", "output", "feedback_type", "feedback_value", "tags", "metadata")
+_FIELD_POS = {f: i for i, f in enumerate(_FIELDS)}
+_ABSENT = object()
+
+
+class RowValidator:
+    """
+    Header-compiled row converter: keys are normalized once (CSV header row or a JSON object's keys),
+    then each row is read by column position / original key with no per-row normalization.
+    Same output and error messages as the old per-row lookup; when several columns normalize to the
+    same field, the last one wins as before.
+    """
+
+    __slots__ = ("_lookup", "_positional")
+
+    def __init__(self, keys: Iterable[str], positional: bool = False):
+        # Mirrors csv.DictReader + dict comprehension semantics: a repeated header keeps its first
+        # slot in key order but takes the value from its last column.
+        last_pos: dict[str, int] = {}
+        for pos, k in enumerate(keys):
+            last_pos[k] = pos
+        by_field: dict[str, Any] = {}
+        for k, pos in last_pos.items():
+            by_field[_normalize_key(k)] = pos if positional else k
+        self._lookup = tuple(by_field.get(f, _ABSENT) for f in _FIELDS)
+        self._positional = positional
+
+    def _values(self, raw: Any) -> list[Any]:
+        if self._positional:
+            n = len(raw)
+            return [raw[p] if p is not _ABSENT and p < n else None for p in self._lookup]
+        return [None if k is _ABSENT else raw.get(k) for k in self._lookup]
+
+    def to_log(self, account_id: str, raw: Any) -> tuple[dict[str, Any], list[str]]:
+        """Convert a raw row (dict for key mode, list for positional mode) to ai_logs shape. Returns (row, errors)."""
+        vals = self._values(raw)
+        errors = []
+        for field in REQUIRED:
+            v = vals[_FIELD_POS[field]]
+            if v is None or (isinstance(v, str) and not v.strip()):
+                errors.append(f"Missing or empty required field: '{field}'")
+
+        if errors:
+            return {}, errors
+
+        session_id, timestamp, user_id, inp, outp, feedback_type, feedback_value, tags, metadata = vals
+        parsed = _parse_dt(timestamp)
+        if not parsed:
+            errors.append("Invalid timestamp: use ISO 8601 like 2026-02-22T12:00:00Z")
+            return {}, errors
+
+        session_id = str(session_id).strip()
+        inp = str(inp).strip()
+        outp = str(outp).strip()
+        feedback_type = str(feedback_type).strip()
+        feedback_value = str(feedback_value).strip() if feedback_value is not None else None
+        out = {
+            "account_id": account_id,
+            "session_id": session_id,
+            "timestamp": parsed[0],
+            "user_id": str(user_id).strip() or None,
+            "input": inp,
+            "output": outp,
+            "feedback_type": feedback_type,
+            "feedback_value": feedback_value,
+            "tags": _parse_tags(tags),
+            "metadata": {},
+            "content_hash": content_hash(account_id, session_id, parsed[1], inp, outp),
+            "is_negative": is_negative_feedback(feedback_type, feedback_value),
+        }
+        if metadata:
+            try:
+                if isinstance(metadata, dict):
+                    out["metadata"] = metadata
+                else:
+                    out["metadata"] = json.loads(str(metadata))
+            except (json.JSONDecodeError, TypeError):
+                pass
+        return out, []
+
+
 def _row_to_log(account_id: str, raw: dict[str, Any]) -> tuple[dict[str, Any], list[str]]:
     """Convert a raw row to ai_logs shape. Returns (row, list of human-readable errors)."""
-    errors = []
-    key_map = {_normalize_key(k): k for k in raw}
-    normalized = {_normalize_key(k): v for k, v in raw.items()}
-
-    def get(req: str, default: Any = None) -> Any:
-        return normalized.get(_normalize_key(req), default)
-
-    for field in REQUIRED:
-        if get(field) is None or (isinstance(get(field), str) and not str(get(field)).strip()):
-            errors.append(f"Missing or empty required field: '{field}'")
-
-    if errors:
-        return {}, errors
-
-    ts = _parse_ts(get("timestamp"))
-    if not ts:
-        errors.append("Invalid timestamp: use ISO 8601 like 2026-02-22T12:00:00Z")
-        return {}, errors
-
-    out = {
-        "account_id": account_id,
-        "session_id": str(get("session_id")).strip(),
-        "timestamp": ts,
-        "user_id": str(get("user_id")).strip() or None,
-        "input": str(get("input")).strip(),
-        "output": str(get("output")).strip(),
-        "feedback_type": str(get("feedback_type")).strip(),
-        "feedback_value": str(get("feedback_value")).strip() if get("feedback_value") is not None else None,
-        "tags": _parse_tags(get("tags")),
-        "metadata": {},
-    }
-    if get("metadata"):
-        try:
-            if isinstance(get("metadata"), dict):
-                out["metadata"] = get("metadata")
-            else:
-                out["metadata"] = json.loads(str(get("metadata")))
-        except (json.JSONDecodeError, TypeError):
-            pass
-    return out, []
+    return RowValidator(raw).to_log(account_id, raw)
 
 
-def parse_json_rows(body: bytes, account_id: str) -> tuple[list[dict], list[dict]]:
-    """Parse JSON (array of objects or single object). Return (valid_rows, errors_with_index)."""
+_MAX_CACHED_VALIDATORS = 64
+
+
+class _ValidatorCache:
+    """RowValidators for JSON objects, keyed by key tuple; exports almost always share one key layout."""
+
+    __slots__ = ("_by_keys",)
+
+    def __init__(self):
+        self._by_keys: dict[tuple[str, ...], RowValidator] = {}
+
+    def to_log(self, account_id: str, raw: dict[str, Any]) -> tuple[dict[str, Any], list[str]]:
+        keys = tuple(raw)
+        validator = self._by_keys.get(keys)
+        if validator is None:
+            validator = RowValidator(keys)
+            if len(self._by_keys) < _MAX_CACHED_VALIDATORS:
+                self._by_keys[keys] = validator
+        return validator.to_log(account_id, raw)
+
+
+class UploadTooLargeError(Exception):
+    """Raised while streaming an upload once more than the allowed number of bytes has been read."""
+
+    def __init__(self, limit: int):
+        super().__init__(f"Upload exceeds {limit} bytes")
+        self.limit = limit
+
+
+class _NotRowContainer(ValueError):
+    """Top-level JSON value is neither an array nor an object."""
+
+
+class _JSONItemTooLarge(ValueError):
+    """One JSON value (the single object, or an array element) is over MAX_JSON_ITEM_CHARS."""
+
+
+def iter_file_chunks(fileobj: BinaryIO, max_bytes: int | None = None, chunk_size: int = UPLOAD_CHUNK_BYTES) -> Iterator[bytes]:
+    """Read a binary file in fixed-size chunks. Raises UploadTooLargeError once more than max_bytes were read."""
+    total = 0
+    while True:
+        chunk = fileobj.read(chunk_size)
+        if not chunk:
+            return
+        total += len(chunk)
+        if max_bytes is not None and total > max_bytes:
+            raise UploadTooLargeError(max_bytes)
+        yield chunk
+
+
+class DecompressedTooLargeError(UploadTooLargeError):
+    """Raised when a compressed upload inflates past the allowed decompressed size (zip-bomb guard)."""
+
+
+class DecompressionError(ValueError):
+    """Compressed upload is corrupt, truncated, or uses a codec this server cannot read."""
+
+
+# Suffix -> codec. The remaining name (e.g. logs.csv from logs.csv.gz) picks the parser.
+COMPRESSION_SUFFIXES = {".gz": "gzip", ".gzip": "gzip", ".zst": "zstd", ".zstd": "zstd"}
+DECOMPRESS_OUTPUT_BYTES = 256 * 1024
+_ZSTD_MAX_WINDOW = 1 << 27  # 128MB: zstd's own default limit, stated explicitly
+_ZSTD_READ_BYTES = 64 * 1024  # compressed input pulled per stream_reader refill
+
+
+def split_compression(filename: str) -> tuple[str, str | None]:
+    """Return (filename without compression suffix, codec or None)."""
+    for suffix, codec in COMPRESSION_SUFFIXES.items():
+        if filename.endswith(suffix):
+            return filename[: -len(suffix)], codec
+    return filename, None
+
+
+def _iter_gunzip(chunks: Iterable[bytes], max_bytes: int) -> Iterator[bytes]:
+    # max_length bounds each inflate step, so a tiny input can never expand into one huge buffer.
+    d = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    total = 0
+    consumed = False
     try:
-        data = json.loads(body.decode("utf-8", errors="replace"))
+        for chunk in chunks:
+            data = chunk
+            while data:
+                consumed = True
+                out = d.decompress(data, DECOMPRESS_OUTPUT_BYTES)
+                data = d.unconsumed_tail
+                if d.eof:
+                    # Concatenated gzip members (e.g. `cat a.gz b.gz`) are valid; start the next one.
+                    data = d.unused_data + data
+                    d = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                    consumed = False
+                if out:
+                    total += len(out)
+                    if total > max_bytes:
+                        raise DecompressedTooLargeError(max_bytes)
+                    yield out
+        tail = d.flush()
+    except zlib.error as e:
+        raise DecompressionError(f"Invalid gzip data: {e}") from e
+    if tail:
+        total += len(tail)
+        if total > max_bytes:
+            raise DecompressedTooLargeError(max_bytes)
+        yield tail
+    if consumed and not d.eof:
+        raise DecompressionError("Gzip data is truncated.")
+
+
+class _ChunkSource:
+    """File-like read() over byte chunks, as zstandard's stream_reader expects."""
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._pending = b""
+
+    def read(self, size: int = -1) -> bytes:
+        while not self._pending:
+            nxt = next(self._chunks, None)
+            if nxt is None:
+                return b""
+            self._pending = bytes(nxt)
+        if size < 0:
+            size = len(self._pending)
+        out, self._pending = self._pending[:size], self._pending[size:]
+        return out
+
+
+def _iter_unzstd(chunks: Iterable[bytes], max_bytes: int) -> Iterator[bytes]:
+    try:
+        import zstandard
+    except ImportError:
+        raise DecompressionError("zstd uploads are not supported on this server; use .gz instead.")
+    # zstd's decompressobj has no max_length; stream_reader.read(n) returns at most n bytes per step, so no
+    # input (however small) is expanded into one large buffer. Concatenated frames are read in sequence.
+    # A truncated stream just ends early; the parser reports the row it cuts off.
+    dctx = zstandard.ZstdDecompressor(max_window_size=_ZSTD_MAX_WINDOW)
+    reader = dctx.stream_reader(_ChunkSource(chunks), read_size=_ZSTD_READ_BYTES, read_across_frames=True)
+    total = 0
+    try:
+        while True:
+            out = reader.read(DECOMPRESS_OUTPUT_BYTES)
+            if not out:
+                return
+            total += len(out)
+            if total > max_bytes:
+                raise DecompressedTooLargeError(max_bytes)
+            yield out
+    except zstandard.ZstdError as e:
+        raise DecompressionError(f"Invalid zstd data: {e}") from e
+
+
+def iter_decompressed(chunks: Iterable[bytes], codec: str, max_bytes: int) -> Iterator[bytes]:
+    """
+    Stream-decompress byte chunks (codec from split_compression).
+    Raises DecompressedTooLargeError past max_bytes of output, DecompressionError on bad input.
+    """
+    if codec == "gzip":
+        return _iter_gunzip(chunks, max_bytes)
+    if codec == "zstd":
+        return _iter_unzstd(chunks, max_bytes)
+    raise DecompressionError(f"Unsupported compression: {codec}")
+
+
+def _iter_text(chunks: Iterable[bytes]) -> Iterator[str]:
+    """Decode UTF-8 incrementally so multi-byte characters split across chunks survive."""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    for chunk in chunks:
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+def _iter_lines(chunks: Iterable[bytes]) -> Iterator[str]:
+    """Yield lines (newline kept, as csv expects) from a stream of byte chunks."""
+    pending = ""
+    for text in _iter_text(chunks):
+        pending += text
+        lines = pending.split("\n")
+        pending = lines.pop()
+        for line in lines:
+            yield line + "\n"
+    if pending:
+        yield pending
+
+
+MAX_JSON_ITEM_CHARS = 16 * 1024 * 1024  # one log object; the file as a whole is streamed
+_JSON_TOKEN_TAIL = 6  # longest token that can fail only because it is cut short: \uXXXX escape
+
+
+def _cut_short(e: json.JSONDecodeError, buf: str) -> bool:
+    """True if the decode error may come from buf ending mid-value (an unterminated string or a partial token)."""
+    return e.pos >= len(buf) - _JSON_TOKEN_TAIL or e.msg.startswith("Unterminated string")
+
+
+def _iter_json_items(chunks: Iterable[bytes]) -> Iterator[Any]:
+    """
+    Yield the elements of a top-level JSON array one at a time, keeping only the undecoded tail in memory.
+    A top-level object is yielded as a single item; any other top level is rejected at its first character.
+    Raises json.JSONDecodeError, _NotRowContainer, or _JSONItemTooLarge once one value outgrows
+    MAX_JSON_ITEM_CHARS.
+    """
+    decoder = json.JSONDecoder()
+    text = _iter_text(chunks)
+    buf = ""
+    pos = 0
+    eof = False
+
+    def fill() -> bool:
+        nonlocal buf, pos, eof
+        if eof:
+            return False
+        nxt = next(text, None)
+        if nxt is None:
+            eof = True
+            return False
+        buf = buf[pos:] + nxt
+        pos = 0
+        return True
+
+    def skip_ws() -> None:
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n\ufeff":
+                pos += 1
+            if pos < len(buf) or not fill():
+                return
+
+    def fill_value() -> bool:
+        # Only the value being decoded is buffered; bound it so one huge value cannot take the whole upload.
+        if len(buf) - pos > MAX_JSON_ITEM_CHARS:
+            raise _JSONItemTooLarge()
+        return fill()
+
+    def decode_value() -> Any:
+        nonlocal pos
+        while True:
+            try:
+                value, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError as e:
+                # Only an error where the buffer ends can be fixed by reading more; anything else is bad JSON.
+                if _cut_short(e, buf) and fill_value():
+                    continue
+                raise
+            # A value ending exactly at the buffer edge may be cut short (e.g. a number); read more first.
+            if end == len(buf) and fill_value():
+                continue
+            pos = end
+            return value
+
+    skip_ws()
+    if pos >= len(buf):
+        raise json.JSONDecodeError("Expecting value", buf, pos)
+    if buf[pos] == "{":
+        yield decode_value()  # a single object is one row
+    elif buf[pos] != "[":
+        raise _NotRowContainer()
+    else:
+        pos += 1
+        skip_ws()
+        if pos < len(buf) and buf[pos] == "]":
+            pos += 1
+        else:
+            while True:
+                skip_ws()
+                yield decode_value()
+                skip_ws()
+                if pos < len(buf) and buf[pos] == "]":
+                    pos += 1
+                    break
+                if pos >= len(buf) or buf[pos] != ",":
+                    raise json.JSONDecodeError("Expecting ',' delimiter", buf, pos)
+                pos += 1
+    skip_ws()
+    if pos < len(buf):
+        raise json.JSONDecodeError("Extra data", buf, pos)
+
+
+def iter_json_rows(chunks: Iterable[bytes], account_id: str) -> Iterator[tuple[int, dict | None, list[str]]]:
+    """
+    Stream-parse JSON (array of objects or single object).
+    Yields (row, log or None, errors) per item; row 0 carries file-level errors.
+    """
+    validators = _ValidatorCache()
+    try:
+        for i, item in enumerate(_iter_json_items(chunks), start=1):
+            if not isinstance(item, dict):
+                yield i, None, ["Each item must be an object."]
+                continue
+            row, row_errors = validators.to_log(account_id, item)
+            yield i, (None if row_errors else row), row_errors
     except json.JSONDecodeError as e:
-        return [], [{"row": 0, "error": f"Invalid JSON: {e.msg}"}]
-    if isinstance(data, dict):
-        data = [data]
-    if not isinstance(data, list):
-        return [], [{"row": 0, "error": "JSON must be an array of objects or a single object."}]
-    valid = []
-    errs = []
-    for i, item in enumerate(data):
+        yield 0, None, [f"Invalid JSON: {e.msg}"]
+    except _NotRowContainer:
+        yield 0, None, ["JSON must be an array of objects or a single object."]
+    except _JSONItemTooLarge:
+        yield 0, None, [f"A single JSON item is over {MAX_JSON_ITEM_CHARS // (1024 * 1024)}MB; split it or upload JSON Lines."]
+
+
+def iter_ndjson_rows(chunks: Iterable[bytes], account_id: str) -> Iterator[tuple[int, dict | None, list[str]]]:
+    """
+    Stream-parse JSON Lines / NDJSON: one object per line, blank lines ignored.
+    Yields (line number, log or None, errors) per line; row 0 carries file-level errors.
+    """
+    validators = _ValidatorCache()
+    seen = 0
+    for line_no, line in enumerate(_iter_lines(chunks), start=1):
+        if line_no == 1:
+            line = line.lstrip("\ufeff")
+        if not line.strip():
+            continue
+        seen += 1
+        try:
+            item = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_no, None, [f"Invalid JSON: {e.msg}"]
+            continue
         if not isinstance(item, dict):
-            errs.append({"row": i + 1, "error": "Each item must be an object."})
+            yield line_no, None, ["Each line must be a JSON object."]
             continue
-        row, row_errors = _row_to_log(account_id, item)
-        if row_errors:
-            for e in row_errors:
-                errs.append({"row": i + 1, "error": e})
-        else:
-            valid.append(row)
-    return valid, errs
+        row, row_errors = validators.to_log(account_id, item)
+        yield line_no, (None if row_errors else row), row_errors
+    if not seen:
+        yield 0, None, ["File has no JSON lines."]
 
 
-def parse_csv_rows(body: bytes, account_id: str) -> tuple[list[dict], list[dict]]:
-    """Parse CSV. First row = headers. Return (valid_rows, errors_with_row)."""
+def iter_csv_rows(chunks: Iterable[bytes], account_id: str) -> Iterator[tuple[int, dict | None, list[str]]]:
+    """
+    Stream-parse CSV. First row = headers.
+    Yields (row, log or None, errors) per data row; row 0 carries file-level errors.
+    """
+    seen = 0
     try:
-        text = body.decode("utf-8", errors="replace")
-        reader = csv.DictReader(io.StringIO(text))
-        rows = list(reader)
-    except Exception as e:
-        return [], [{"row": 0, "error": f"Invalid CSV: {e}"}]
-    if not rows:
-        return [], [{"row": 0, "error": "CSV has no data rows."}]
+        reader = csv.reader(_iter_lines(chunks))
+        header = next(reader, None)
+        if header is not None:
+            validator = RowValidator(header, positional=True)
+            for raw in reader:
+                if not raw:
+                    continue  # blank line; csv.DictReader skipped these without counting a row
+                seen += 1
+                row, row_errors = validator.to_log(account_id, raw)
+                yield seen + 1, (None if row_errors else row), row_errors
+    except csv.Error as e:
+        yield 0, None, [f"Invalid CSV: {e}"]
+        return
+    if not seen:
+        yield 0, None, ["CSV has no data rows."]
+
+
+def _collect(rows: Iterable[tuple[int, dict | None, list[str]]]) -> tuple[list[dict], list[dict]]:
     valid = []
     errs = []
-    for i, raw in enumerate(rows):
-        row, row_errors = _row_to_log(account_id, raw)
-        if row_errors:
-            for e in row_errors:
-                errs.append({"row": i + 2, "error": e})
-        else:
+    for row_no, row, row_errors in rows:
+        for e in row_errors:
+            errs.append({"row": row_no, "error": e})
+        if row is not None:
             valid.append(row)
     return valid, errs
+
+
+def parse_json_rows(body: bytes, account_id: str) -> tuple[list[dict], list[dict]]:
+    """Parse JSON (array of objects or single object). Return (valid_rows, errors_with_index)."""
+    return _collect(iter_json_rows([body], account_id))
+
+
+def parse_ndjson_rows(body: bytes, account_id: str) -> tuple[list[dict], list[dict]]:
+    """Parse JSON Lines / NDJSON. Return (valid_rows, errors_with_line)."""
+    return _collect(iter_ndjson_rows([body], account_id))
+
+
+def parse_csv_rows(body: bytes, account_id: str) -> tuple[list[dict], list[dict]]:
+    """Parse CSV. First row = headers. Return (valid_rows, errors_with_row)."""
+    return _collect(iter_csv_rows([body], account_id))
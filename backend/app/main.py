@@ -7,8 +7,14 @@ from fastapi import FastAPI, Depends, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 
-from app.auth import verify_supabase_jwt
+from app.auth import AUTH_MODES, start_auth, stop_auth, verify_supabase_jwt
 from app.config import settings
+from app.dependencies import close_supabase, get_supabase, init_supabase
+from app.rate_limit import SupabaseRateLimitBackend, configure_rate_limiter, parse_limits
+from app.services.llm_cache import SupabaseResponseStore, configure_response_cache
+from app.services.llm_gateway import llm_gateway
+from app.services.offload import configure_offload, shutdown_offload
+from app.services.organization import account_contexts
 from app.routers import ingestion as ingestion_router, insights as insights_router, decision_cards as decision_cards_router, reports as reports_router, organizations as organizations_router, billing as billing_router
 
 logger = logging.getLogger(__name__)
@@ -33,14 +39,46 @@ def _validate_env() -> None:
         missing.append("SUPABASE_SERVICE_ROLE_KEY")
     if missing:
         logger.warning("Missing required env vars (server may fail): %s", ", ".join(missing))
+    if settings.auth_mode not in AUTH_MODES:
+        logger.warning("AUTH_MODE=%s is not one of %s; tokens will be checked locally.", settings.auth_mode, ", ".join(AUTH_MODES))
     if not (settings.openai_api_key or "").strip():
         logger.warning("OPENAI_API_KEY not set; insight and Decision Card generation will be disabled.")
 
 
+def _configure_llm_cache() -> None:
+    shared = None
+    if settings.llm_cache_shared and settings.supabase_url and settings.supabase_service_role_key:
+        shared = SupabaseResponseStore(get_supabase())
+    configure_response_cache(settings.llm_cache_max_entries, settings.llm_cache_ttl_sec, shared)
+
+
+def _configure_rate_limiter() -> None:
+    try:
+        limits = parse_limits(settings.rate_limits)
+    except ValueError as e:
+        logger.warning("RATE_LIMITS ignored, using default limits: %s", e)
+        limits = {}
+    shared = None
+    if settings.rate_limit_shared and settings.supabase_url and settings.supabase_service_role_key:
+        shared = SupabaseRateLimitBackend(get_supabase())
+    configure_rate_limiter(limits, shared)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     _validate_env()
+    configure_offload(settings.io_threads, settings.cluster_processes)
+    init_supabase()
+    _configure_llm_cache()
+    _configure_rate_limiter()
+    llm_gateway.configure(settings.llm_max_concurrency, settings.llm_account_concurrency, settings.llm_timeout_sec, settings.llm_max_retries)
+    start_auth()
+    account_contexts.ttl_sec = settings.account_context_ttl_sec
     yield
+    await stop_auth()
+    await llm_gateway.aclose()
+    close_supabase()
+    shutdown_offload()
 
 
 app = FastAPI(
@@ -83,12 +121,6 @@ app.include_router(organizations_router.router)
 app.include_router(billing_router.router)
 
 
-@app.get("/ingestion/status")
-def ingestion_status(_: dict = Depends(verify_supabase_jwt)):
-    """Ingestion status (no dashboard metrics)."""
-    return {"message": "Ingestion ready. Upload logs to get started."}
-
-
 @app.get("/ingestion/schema")
 def ingestion_schema(_: dict = Depends(verify_supabase_jwt)):
     """Required and optional fields for CSV/JSON upload; sample row."""
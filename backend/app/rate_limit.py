@@ -1,33 +1,165 @@
 # You are helping build an AI Product Decision Platform. Never add generic charts or infra metrics. All outputs must directly support: what is broken, why, and what to fix first for an AI SaaS product.
 
-"""In-memory per-account rate limit. MVP: 10 requests per 10 minutes per account_id per endpoint key.
+"""Per-account rate limit per endpoint key. Default: 10 requests per 10 minutes per account_id per key.
 
-Production note: This is in-memory only. On Render (or any multi-instance/restart environment),
-rate limiting is inconsistent across instances. For production, use Redis (e.g. Upstash Redis
-free tier) or Supabase table-based throttling and replace this module."""
+Sliding-window counter: each (key, account) keeps the request count of the current and the previous
+fixed window, and a request is allowed while previous x (share of the previous window still inside the
+sliding window) + current + 1 stays within the limit. Every check is O(1); counters idle for two windows
+are evicted, and the number of tracked keys is bounded. Limits can be set per endpoint key (RATE_LIMITS).
 
+The in-memory backend counts per process. With RATE_LIMIT_SHARED=true, counters live in the
+rate_limit_counters table (updated atomically by the rate_limit_hit function), so every instance
+enforces the same limit; if the table is unreachable, the in-memory counters are used instead, and the
+table is not tried again for SHARED_RETRY_SEC (so requests don't each wait out a timeout)."""
+
+from __future__ import annotations
+
+import logging
+import threading
 import time
-from collections import defaultdict
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Protocol
+
+from supabase import Client
+
+from app.services.offload import run_io
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_KEYS = 100_000
+RATE_LIMIT_FUNCTION = "rate_limit_hit"
+SHARED_RETRY_SEC = 30.0
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    max_requests: int
+    window_sec: int
+
+
+DEFAULT_LIMIT = RateLimit(max_requests=10, window_sec=10 * 60)
+
+
+def parse_limits(spec: str) -> dict[str, RateLimit]:
+    """'insights/generate=5/600, ingestion/upload=30/600' -> per-key limits (requests per seconds)."""
+    limits: dict[str, RateLimit] = {}
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        key, _, value = item.partition("=")
+        requests, _, window = value.partition("/")
+        try:
+            limit = RateLimit(int(requests), int(window))
+        except ValueError:
+            raise ValueError(f"invalid rate limit {item.strip()!r}; expected key=requests/seconds")
+        if not key.strip() or limit.max_requests < 0 or limit.window_sec <= 0:
+            raise ValueError(f"invalid rate limit {item.strip()!r}; expected key=requests/seconds")
+        limits[key.strip()] = limit
+    return limits
+
+
+class RateLimitBackend(Protocol):
+    def hit(self, key: str, limit: RateLimit) -> bool: ...
+
+
+class MemoryRateLimitBackend:
+    """Thread-safe per-process sliding-window counters, least recently used first."""
+
+    def __init__(self, max_keys: int = DEFAULT_MAX_KEYS):
+        self.max_keys = max_keys
+        # key -> (window index, current_count, previous_count, expires_at)
+        self._counters: OrderedDict[str, tuple[int, int, int, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, key: str, limit: RateLimit) -> bool:
+        now = time.monotonic()
+        window = limit.window_sec
+        index = int(now // window)
+        with self._lock:
+            self._evict(now)
+            prev, cur = 0, 0
+            counter = self._counters.get(key)
+            if counter is not None and counter[0] == index:
+                cur, prev = counter[1], counter[2]
+            elif counter is not None and counter[0] == index - 1:
+                prev = counter[1]
+            elapsed = (now - index * window) / window  # share of the current window already passed
+            allowed = prev * (1 - elapsed) + cur + 1 <= limit.max_requests
+            self._counters[key] = (index, cur + int(allowed), prev, (index + 2) * window)
+            self._counters.move_to_end(key)
+            return allowed
+
+    def __len__(self) -> int:
+        return len(self._counters)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._counters.clear()
+
+    def _evict(self, now: float) -> None:
+        # Least recently used first: pop idle counters (no count left in any window) and anything over max_keys.
+        while self._counters:
+            key, counter = next(iter(self._counters.items()))
+            if counter[3] > now and len(self._counters) < self.max_keys:
+                break
+            del self._counters[key]
+
+
+class SupabaseRateLimitBackend:
+    """rate_limit_counters rows, updated by the rate_limit_hit function in one round trip."""
+
+    def __init__(self, supabase: Client):
+        self._supabase = supabase
+
+    def hit(self, key: str, limit: RateLimit) -> bool:
+        r = self._supabase.rpc(
+            RATE_LIMIT_FUNCTION, {"p_key": key, "p_limit": limit.max_requests, "p_window_sec": limit.window_sec}
+        ).execute()
+        return bool(r.data)
+
+
+class RateLimiter:
+    def __init__(
+        self,
+        limits: dict[str, RateLimit] | None = None,
+        default: RateLimit = DEFAULT_LIMIT,
+        shared: RateLimitBackend | None = None,
+        max_keys: int = DEFAULT_MAX_KEYS,
+    ):
+        self.limits = dict(limits or {})
+        self.default = default
+        self.shared = shared
+        self.local = MemoryRateLimitBackend(max_keys)
+        self._shared_retry_at = 0.0  # monotonic time before which the shared backend is skipped after a failure
+
+    def limit_for(self, key: str) -> RateLimit:
+        return self.limits.get(key, self.default)
+
+    def check(self, account_id: str, key: str) -> bool:
+        """True if the request is allowed (and counted), False if rate limited."""
+        limit = self.limit_for(key)
+        counter_key = f"{key}:{account_id}"
+        if self.shared is not None and time.monotonic() >= self._shared_retry_at:
+            try:
+                return self.shared.hit(counter_key, limit)
+            except Exception as e:
+                self._shared_retry_at = time.monotonic() + SHARED_RETRY_SEC
+                logger.warning("shared rate limit unavailable, counting in this process for %ss: %s", SHARED_RETRY_SEC, e)
+        return self.local.hit(counter_key, limit)
 
 
-# (account_id, key) -> list of request timestamps
-_buckets: dict[tuple[str, str], list[float]] = defaultdict(list)
-_WINDOW_SEC = 10 * 60  # 10 minutes
-_MAX_REQUESTS = 10
+# Process-wide limiter; app.main applies per-key limits and the shared table from settings at startup.
+rate_limiter = RateLimiter()
 
 
-def _trim(bucket: list[float], now: float) -> None:
-    cutoff = now - _WINDOW_SEC
-    while bucket and bucket[0] < cutoff:
-        bucket.pop(0)
+def configure_rate_limiter(limits: dict[str, RateLimit], shared: RateLimitBackend | None = None) -> None:
+    rate_limiter.limits = dict(limits)
+    rate_limiter.shared = shared
 
 
-def check_rate_limit(account_id: str, key: str) -> bool:
-    """Returns True if request is allowed, False if rate limited."""
-    now = time.time()
-    k = (account_id, key)
-    _trim(_buckets[k], now)
-    if len(_buckets[k]) >= _MAX_REQUESTS:
-        return False
-    _buckets[k].append(now)
-    return True
+async def check_rate_limit(account_id: str, key: str) -> bool:
+    """Returns True if request is allowed, False if rate limited. The shared table is queried off the event loop."""
+    if rate_limiter.shared is None:
+        return rate_limiter.check(account_id, key)
+    return await run_io(rate_limiter.check, account_id, key)
@@ -4,10 +4,13 @@ from datetime import datetime, timezone
 from fastapi import APIRouter, Depends, HTTPException, Request, Header
 from pydantic import BaseModel
 import stripe
+from supabase import Client
 
 from app.auth import verify_supabase_jwt
 from app.config import settings
-from app.services.organization import get_organization_for_user
+from app.dependencies import get_account_context, get_supabase
+from app.services.offload import run_io
+from app.services.organization import AccountContext, account_contexts
 
 router = APIRouter(prefix="/billing", tags=["billing"])
 
@@ -41,34 +44,34 @@ class CreateCheckoutBody(BaseModel):
 async def create_checkout_session(
     body: CreateCheckoutBody | None = None,
     user: dict = Depends(verify_supabase_jwt),
+    ctx: AccountContext = Depends(get_account_context),
+    supabase: Client = Depends(get_supabase),
 ):
     """Create a Stripe Checkout session for $20/month. Redirect user to Stripe to enter card."""
-    user_id = user.get("sub")
-    if not user_id:
-        raise HTTPException(status_code=401, detail="Invalid session.")
     if not settings.stripe_secret_key or not settings.stripe_price_id:
         raise HTTPException(status_code=503, detail="Billing not configured (STRIPE_SECRET_KEY, STRIPE_PRICE_ID).")
-    from app.routers.organizations import get_supabase
-    supabase = get_supabase()
-    org = get_organization_for_user(supabase, user_id)
+    org = ctx.organization
     if not org:
         raise HTTPException(status_code=400, detail="Create an organization first (sign up with org name).")
     org_id = org["id"]
     customer_id = org.get("stripe_customer_id")
     stripe.api_key = settings.stripe_secret_key
     if not customer_id:
-        cust = stripe.Customer.create(
+        cust = await run_io(
+            stripe.Customer.create,
             metadata={"organization_id": str(org_id)},
             email=user.get("email"),
         )
         customer_id = cust.id
-        supabase.table("organizations").update({
+        await run_io(supabase.table("organizations").update({
             "stripe_customer_id": customer_id,
             "updated_at": datetime.now(timezone.utc).isoformat(),
-        }).eq("id", org_id).execute()
+        }).eq("id", org_id).execute)
+        account_contexts.invalidate(organization_id=org_id)
     success = (body.success_url if body and body.success_url else _default_success_url())
     cancel = (body.cancel_url if body and body.cancel_url else _default_cancel_url())
-    session = stripe.checkout.Session.create(
+    session = await run_io(
+        stripe.checkout.Session.create,
         customer=customer_id,
         mode="subscription",
         line_items=[{"price": settings.stripe_price_id, "quantity": 1}],
@@ -97,7 +100,6 @@ async def stripe_webhook(
     except stripe.SignatureVerificationError:
         raise HTTPException(status_code=400, detail="Invalid signature.")
     stripe.api_key = settings.stripe_secret_key
-    from app.routers.organizations import get_supabase
     supabase = get_supabase()
     if event.type == "customer.subscription.updated" or event.type == "customer.subscription.deleted":
         sub = event.data.object
@@ -106,7 +108,7 @@ async def stripe_webhook(
         if not org_id:
             cust_id = sub.get("customer")
             if cust_id:
-                r = supabase.table("organizations").select("id").eq("stripe_customer_id", cust_id).limit(1).execute()
+                r = await run_io(supabase.table("organizations").select("id").eq("stripe_customer_id", cust_id).limit(1).execute)
                 if r.data and len(r.data) > 0:
                     org_id = r.data[0]["id"]
         if org_id:
@@ -114,9 +116,10 @@ async def stripe_webhook(
             sub_status = getattr(sub, "status", None) or (sub.get("status") if isinstance(sub, dict) else None)
             if event.type != "customer.subscription.deleted" and sub_status in ("active", "trialing"):
                 status = sub_status or "active"
-            supabase.table("organizations").update({
+            await run_io(supabase.table("organizations").update({
                 "subscription_status": status,
                 "stripe_subscription_id": getattr(sub, "id", sub.get("id")) if status != "none" else None,
                 "updated_at": datetime.now(timezone.utc).isoformat(),
-            }).eq("id", org_id).execute()
+            }).eq("id", org_id).execute)
+            account_contexts.invalidate(organization_id=org_id)
     return {"received": True}
@@ -1,106 +1,329 @@
 # You are helping build an AI Product Decision Platform. Never add generic charts or infra metrics. All outputs must directly support: what is broken, why, and what to fix first for an AI SaaS product.
 
 import logging
+import os
+import tempfile
 import uuid
-from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
-from supabase import create_client, Client
+from typing import Any, BinaryIO, Callable, Iterable, Iterator
+
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
+from fastapi.responses import JSONResponse
+from supabase import Client
 
-from app.auth import verify_supabase_jwt
 from app.config import settings
-from app.ingestion import parse_csv_rows, parse_json_rows
+from app.dependencies import get_account_context, get_supabase
+from app.ingestion import (
+    DecompressedTooLargeError,
+    DecompressionError,
+    UploadTooLargeError,
+    iter_csv_rows,
+    iter_decompressed,
+    iter_file_chunks,
+    iter_json_rows,
+    iter_ndjson_rows,
+    split_compression,
+)
 from app.rate_limit import check_rate_limit
-from app.services.organization import get_organization_for_user, get_account_id_for_user, can_upload_or_generate
+from app.services import ingestion_jobs
+from app.services.log_writer import RowsInterrupted, insert_log_rows
+from app.services.offload import run_io
+from app.services.organization import AccountContext
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/ingestion", tags=["ingestion"])
 MAX_UPLOAD_BYTES = settings.max_upload_bytes
+MAX_COMPRESSED_UPLOAD_BYTES = settings.max_compressed_upload_bytes
+MAX_DECOMPRESSED_BYTES = settings.max_decompressed_bytes
 ALLOWED_CSV_TYPES = {"text/csv", "application/csv", "text/plain"}
 ALLOWED_JSON_TYPES = {"application/json"}
+ALLOWED_NDJSON_TYPES = {"application/x-ndjson", "application/ndjson", "application/jsonl", "application/x-jsonlines", "application/json", "text/plain"}
+ALLOWED_COMPRESSED_TYPES = {"application/gzip", "application/x-gzip", "application/zstd", "application/x-zstd", "application/octet-stream"}
+MAX_REPORTED_ERRORS = 50
 
 
-def get_supabase() -> Client:
-    if not settings.supabase_url or not settings.supabase_service_role_key:
-        raise HTTPException(status_code=503, detail="Server not configured for storage.")
-    return create_client(settings.supabase_url, settings.supabase_service_role_key)
+def _too_large(limit: int = MAX_UPLOAD_BYTES, what: str = "File") -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"{what} too large. Maximum size is {limit // (1024*1024)}MB.",
+    )
 
 
-def _upload_response(ok: bool, stored: int, errors: list[dict], warnings: list[str] | None = None):
-    """Consistent JSON shape: stored, errors (list of {row, error})."""
+def _upload_response(
+    ok: bool,
+    stored: int,
+    errors: list[dict],
+    warnings: list[str] | None = None,
+    stored_ranges: list[dict] | None = None,
+    failed_ranges: list[dict] | None = None,
+    duplicates: int = 0,
+    partial: bool = False,
+):
+    """
+    Consistent JSON shape: stored, duplicates skipped, errors (list of {row, error}), stored/failed source row ranges ({from, to}).
+    partial: the file could not be read to the end, but rows before that point were stored.
+    """
     return {
         "ok": ok,
         "stored": stored,
+        "duplicates": duplicates,
         "errors": errors,
         "warnings": warnings or [],
+        "stored_ranges": stored_ranges or [],
+        "failed_ranges": failed_ranges or [],
+        "partial": partial,
     }
 
 
+class _UploadInterrupted(HTTPException):
+    """413 raised mid-stream; body is the upload response for the rows stored before the limit was hit."""
+
+    def __init__(self, detail: str, body: dict[str, Any]):
+        super().__init__(status_code=413, detail=detail)
+        self.body = body
+
+
+def _is_empty(src: BinaryIO) -> bool:
+    """Peek one byte of the upload (a SpooledTemporaryFile, possibly on disk) and rewind."""
+    empty = not src.read(1)
+    src.seek(0)
+    return empty
+
+
+def _spool_to_tempfile(src: BinaryIO, max_bytes: int) -> str:
+    """Copy the request's upload to a temp file that outlives the request (for background jobs)."""
+    fd, path = tempfile.mkstemp(prefix="ingest-", suffix=".upload")
+    try:
+        with os.fdopen(fd, "wb") as dst:
+            for chunk in iter_file_chunks(src, max_bytes):
+                dst.write(chunk)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path
+
+
+async def _ingest(
+    supabase: Client,
+    fileobj: BinaryIO,
+    parse_rows: Callable[[Iterable[bytes], str], Iterator[tuple[int, dict | None, list[str]]]],
+    compression: str | None,
+    max_bytes: int,
+    account_id: str,
+    request_id: str,
+    job: dict[str, Any] | None = None,
+) -> dict[str, Any]:
+    """
+    Stream: file chunks -> parsed rows -> concurrent batched inserts; memory stays flat regardless of file size.
+    Returns the upload response; raises _UploadInterrupted (413, body reports rows already stored) past size
+    limits. If the file breaks off (invalid JSON/CSV, size limit), rows before that point stay stored and the
+    response says so (ok false, partial true). When job is given, its bytes_read / stored / failed / error_count
+    are kept current for GET /ingestion/jobs/{id}.
+    """
+    chunks = iter_file_chunks(fileobj, max_bytes)
+    if job is not None:
+        chunks = _track_bytes(chunks, job)
+    if compression:
+        chunks = iter_decompressed(chunks, compression, MAX_DECOMPRESSED_BYTES)
+    errors: list[dict] = []
+    error_count = 0
+    file_error = False  # a file-level (row 0) error: the file could not be read to the end
+
+    def add_error(row_no: int, error: str) -> None:
+        nonlocal error_count, file_error
+        error_count += 1
+        file_error = file_error or row_no == 0
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append({"row": row_no, "error": error})
+
+    def valid_rows():
+        # Runs in the insert pipeline's worker thread (parsing is CPU-bound).
+        try:
+            for row_no, row, row_errors in parse_rows(chunks, account_id):
+                for e in row_errors:
+                    add_error(row_no, e)
+                if job is not None:
+                    job["error_count"] = error_count
+                if row is not None:
+                    yield row_no, row
+        except DecompressionError as e:
+            logger.warning("ingestion upload decompression failed account_id=%s request_id=%s: %s", account_id, request_id, e)
+            add_error(0, f"Could not decompress file: {e}")
+
+    def on_batch(stored: int, failed: int, duplicates: int) -> None:
+        if job is not None:
+            job["stored"] = stored
+            job["failed"] = failed
+            job["duplicates"] = duplicates
+
+    try:
+        result = await insert_log_rows(
+            supabase, valid_rows(), max_concurrency=settings.ingest_insert_concurrency, on_batch=on_batch
+        )
+    except RowsInterrupted as e:
+        if isinstance(e.__cause__, DecompressedTooLargeError):
+            logger.warning("ingestion upload rejected decompressed size account_id=%s request_id=%s", account_id, request_id)
+            too_large = _too_large(MAX_DECOMPRESSED_BYTES, "Decompressed file")
+        elif isinstance(e.__cause__, UploadTooLargeError):
+            logger.warning("ingestion upload rejected size account_id=%s request_id=%s", account_id, request_id)
+            too_large = _too_large(max_bytes, "Compressed file" if compression else "File")
+        else:
+            raise e.__cause__
+        add_error(0, too_large.detail)
+        if job is not None:
+            job["error_count"] = error_count
+        raise _UploadInterrupted(too_large.detail, _result_response(e.result, errors, error_count, file_error))
+    if job is not None:
+        job["error_count"] = error_count
+    response = _result_response(result, errors, error_count, file_error)
+    logger.info(
+        "ingestion upload account_id=%s request_id=%s stored=%s duplicates=%s failed=%s errors_len=%s partial=%s",
+        account_id, request_id, result["stored"], result["duplicates"], result["failed"], error_count, response["partial"],
+    )
+    return response
+
+
+def _result_response(result: dict[str, Any], errors: list[dict], error_count: int, file_error: bool) -> dict[str, Any]:
+    """Upload response for insert_log_rows' result; file_error means the file broke off after the rows it counts."""
+    stored = result["stored"]
+    duplicates = result["duplicates"]
+    if not stored and not result["failed"] and not duplicates:
+        return _upload_response(ok=False, stored=0, errors=errors[:50], warnings=["No valid rows to store."] if errors else [])
+
+    warnings = []
+    if file_error:
+        warnings.append(
+            f"The file could not be read to the end; {stored} row(s) before that point were stored (see stored_ranges). "
+            "Fix the file and upload it again: rows already stored are skipped as duplicates."
+        )
+    if error_count:
+        warnings.append(f"{error_count} row(s) had validation errors and were skipped.")
+    if duplicates:
+        warnings.append(f"{duplicates} row(s) were already stored and were skipped as duplicates.")
+    if result["failed"]:
+        warnings.append(f"{result['failed']} valid row(s) could not be stored; see failed_ranges and retry those rows.")
+
+    return _upload_response(
+        ok=not file_error and (stored > 0 or (duplicates > 0 and not result["failed"])),
+        stored=stored,
+        duplicates=duplicates,
+        errors=errors[:30],
+        warnings=warnings,
+        stored_ranges=result["stored_ranges"],
+        failed_ranges=result["failed_ranges"],
+        partial=file_error,
+    )
+
+
+def _track_bytes(chunks: Iterable[bytes], job: dict[str, Any]) -> Iterator[bytes]:
+    for chunk in chunks:
+        job["bytes_read"] += len(chunk)
+        yield chunk
+
+
 @router.post("/upload")
 async def upload_logs(
     file: UploadFile = File(...),
-    user: dict = Depends(verify_supabase_jwt),
+    async_mode: bool = Query(False, alias="async"),
+    ctx: AccountContext = Depends(get_account_context),
+    supabase: Client = Depends(get_supabase),
 ):
-    """Accept CSV or JSON file. Validate required fields; return human-readable errors or store and return counts."""
+    """
+    Accept CSV, JSON or JSON Lines (.jsonl/.ndjson) file, optionally gzip/zstd compressed (.gz/.zst). Validate required fields; return human-readable errors or store and return counts.
+    With ?async=true the file is queued and 202 returns a job id; poll GET /ingestion/jobs/{id} for progress.
+    """
     request_id = str(uuid.uuid4())[:8]
-    user_id = user.get("sub")
-    if not user_id:
-        raise HTTPException(status_code=401, detail="Invalid session.")
-    supabase = get_supabase()
-    org = get_organization_for_user(supabase, user_id)
-    if org is not None and not can_upload_or_generate(org, user_id):
+    if not ctx.can_upload_or_generate:
         raise HTTPException(
             status_code=403,
             detail="Trial ended. Subscribe to continue uploading logs ($20/month).",
         )
-    account_id = get_account_id_for_user(supabase, user_id) or user_id
+    account_id = ctx.account_id
 
-    if not check_rate_limit(account_id, "ingestion/upload"):
+    if not await check_rate_limit(account_id, "ingestion/upload"):
         logger.warning("ingestion upload rate limited account_id=%s request_id=%s", account_id, request_id)
         raise HTTPException(
             status_code=429,
             detail="Too many uploads. Please try again in a few minutes.",
         )
 
-    content = await file.read()
-    if len(content) > MAX_UPLOAD_BYTES:
-        logger.warning("ingestion upload rejected size account_id=%s request_id=%s len=%s", account_id, request_id, len(content))
-        raise HTTPException(
-            status_code=413,
-            detail=f"File too large. Maximum size is {MAX_UPLOAD_BYTES // (1024*1024)}MB.",
-        )
-    if not content:
+    content_type = (file.content_type or "").lower().split(";")[0].strip()
+    filename, compression = split_compression((file.filename or "").lower())
+    max_bytes = MAX_COMPRESSED_UPLOAD_BYTES if compression else MAX_UPLOAD_BYTES
+    if file.size is not None and file.size > max_bytes:
+        logger.warning("ingestion upload rejected size account_id=%s request_id=%s len=%s", account_id, request_id, file.size)
+        raise _too_large(max_bytes, "Compressed file" if compression else "File")
+    if await run_io(_is_empty, file.file):
         return _upload_response(ok=False, stored=0, errors=[{"row": 0, "error": "File is empty."}])
 
-    content_type = (file.content_type or "").lower().split(";")[0].strip()
-    filename = (file.filename or "").lower()
-    if filename.endswith(".json"):
+    if compression:
+        if content_type and content_type not in ALLOWED_COMPRESSED_TYPES:
+            return _upload_response(ok=False, stored=0, errors=[{"row": 0, "error": "Compressed file must be gzip (.gz) or zstd (.zst)."}])
+        content_type = ""  # the declared type describes the archive, not the inner file
+    if filename.endswith((".jsonl", ".ndjson")):
+        if content_type and content_type not in ALLOWED_NDJSON_TYPES and content_type != "application/octet-stream":
+            return _upload_response(ok=False, stored=0, errors=[{"row": 0, "error": "File must be JSON Lines (content-type application/x-ndjson)."}])
+        parse_rows = iter_ndjson_rows
+    elif filename.endswith(".json"):
         if content_type and content_type not in ALLOWED_JSON_TYPES and content_type != "application/octet-stream":
             return _upload_response(ok=False, stored=0, errors=[{"row": 0, "error": "File must be JSON (content-type application/json)."}])
-        valid_rows, errors = parse_json_rows(content, account_id)
+        parse_rows = iter_json_rows
     elif filename.endswith(".csv"):
         if content_type and content_type not in ALLOWED_CSV_TYPES and content_type not in ("application/octet-stream", ""):
             return _upload_response(ok=False, stored=0, errors=[{"row": 0, "error": "File must be CSV (content-type text/csv or application/csv)."}])
-        valid_rows, errors = parse_csv_rows(content, account_id)
+        parse_rows = iter_csv_rows
     else:
-        return _upload_response(ok=False, stored=0, errors=[{"row": 0, "error": "File must be .csv or .json."}])
+        return _upload_response(ok=False, stored=0, errors=[{"row": 0, "error": "File must be .csv, .json or .jsonl (optionally .gz or .zst compressed)."}])
 
-    if not valid_rows:
-        logger.info("ingestion upload no_valid_rows account_id=%s request_id=%s errors_len=%s", account_id, request_id, len(errors))
-        return _upload_response(ok=False, stored=0, errors=errors[:50], warnings=["No valid rows to store."] if errors else [])
+    if async_mode:
+        try:
+            path = await run_io(_spool_to_tempfile, file.file, max_bytes)
+        except UploadTooLargeError:
+            raise _too_large(max_bytes, "Compressed file" if compression else "File")
 
-    supabase = get_supabase()
-    batch_size = 500
-    stored = 0
-    for i in range(0, len(valid_rows), batch_size):
-        chunk = valid_rows[i : i + batch_size]
-        resp = supabase.table("ai_logs").insert(chunk).execute()
-        if getattr(resp, "data", None):
-            stored += len(resp.data)
-        else:
-            stored += len(chunk)
+        async def work(job: dict) -> dict:
+            try:
+                with open(path, "rb") as f:
+                    return await _ingest(supabase, f, parse_rows, compression, max_bytes, account_id, request_id, job=job)
+            except _UploadInterrupted as e:
+                return e.body
+            finally:
+                os.unlink(path)
 
-    warnings = []
-    if errors:
-        warnings.append(f"{len(errors)} row(s) had validation errors and were skipped.")
+        try:
+            job = ingestion_jobs.create_job(account_id, file.filename or "", os.path.getsize(path))
+            ingestion_jobs.start_job(job, work, settings.ingest_max_concurrent_jobs)
+        except BaseException:
+            # Until start_job hands it to work(), the spooled file is ours to delete.
+            os.unlink(path)
+            raise
+        logger.info("ingestion upload queued account_id=%s request_id=%s job_id=%s", account_id, request_id, job["id"])
+        return JSONResponse(
+            status_code=202,
+            content={"ok": True, "job_id": job["id"], "status": job["status"], "status_url": f"/ingestion/jobs/{job['id']}"},
+        )
+
+    try:
+        return await _ingest(supabase, file.file, parse_rows, compression, max_bytes, account_id, request_id)
+    except _UploadInterrupted as e:
+        return JSONResponse(status_code=e.status_code, content={"detail": e.detail, **e.body})
 
-    logger.info("ingestion upload account_id=%s request_id=%s stored=%s errors_len=%s", account_id, request_id, stored, len(errors))
-    return _upload_response(ok=True, stored=stored, errors=errors[:30], warnings=warnings)
+
+@router.get("/jobs/{job_id}")
+async def get_ingestion_job(job_id: str, ctx: AccountContext = Depends(get_account_context)):
+    """Background upload progress: status, stored, error_count, progress (0–1), and the final result when done."""
+    job = ingestion_jobs.get_job(job_id, ctx.account_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return ingestion_jobs.public_view(job)
+
+
+@router.get("/status")
+async def ingestion_status(ctx: AccountContext = Depends(get_account_context)):
+    """Ingestion status for the account: recent background upload jobs (no dashboard metrics)."""
+    jobs = [ingestion_jobs.public_view(j) for j in ingestion_jobs.list_jobs(ctx.account_id)]
+    running = sum(1 for j in jobs if j["status"] in ("queued", "running"))
+    if running:
+        message = f"{running} upload(s) in progress."
+    else:
+        message = "Ingestion ready. Upload logs to get started."
+    return {"message": message, "jobs": jobs}
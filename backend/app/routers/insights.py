@@ -2,55 +2,163 @@
 
 import logging
 import uuid
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 
-from app.auth import verify_supabase_jwt
 from app.config import settings
+from app.dependencies import get_account_context, get_supabase
 from app.rate_limit import check_rate_limit
-from app.services.insight_engine import run_insight_engine
-from app.services.organization import get_organization_for_user, get_account_id_for_user, can_upload_or_generate
-from supabase import create_client, Client
+from app.services.embedding_providers import get_embedding_provider
+from app.services.embedding_store import EmbeddingStore, LocalEmbeddingStore, SupabaseEmbeddingStore
+from app.services.insight_engine import (
+    CLUSTER_STATE_COLUMNS,
+    ENGINE_LOG_COLUMNS,
+    INSIGHT_COLUMNS,
+    MAX_NEGATIVE_LOGS,
+    load_cluster_state,
+    new_logs_since,
+    run_insight_engine,
+    sample_evenly,
+    update_insight_clusters,
+)
+from app.services.llm_cache import response_cache
+from app.services.llm_gateway import llm_gateway
+from app.services.log_reader import iter_account_rows
+from app.services.offload import run_io
+from app.services.organization import AccountContext
+from supabase import Client
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/insights", tags=["insights"])
 
 
-def get_supabase() -> Client:
-    if not settings.supabase_url or not settings.supabase_service_role_key:
-        raise HTTPException(status_code=503, detail="Server not configured for storage.")
-    return create_client(settings.supabase_url, settings.supabase_service_role_key)
+def _public(insight: dict) -> dict:
+    """Insight for API responses: without the stored cluster centroid."""
+    return {k: v for k, v in insight.items() if k != "centroid"}
 
 
 @router.post("/generate")
-async def generate_insights(user: dict = Depends(verify_supabase_jwt)):
-    """Fetch negative-feedback logs, cluster, explain with LLM, store insights. Returns count and list."""
+async def generate_insights(
+    preview: bool = Query(False, description="Fast local clustering without LLM calls; nothing is stored."),
+    ctx: AccountContext = Depends(get_account_context),
+    supabase: Client = Depends(get_supabase),
+):
+    """
+    Fetch negative-feedback logs, cluster, explain with LLM, store insights. Returns count and list.
+    After the first run, logs ingested since the last run are folded into the existing insights (mode "incremental");
+    a full re-cluster (mode "full") runs only when they drift too far from the stored clusters.
+    ?preview=true clusters with the local embedding provider and returns summaries only (mode "preview").
+    """
     request_id = str(uuid.uuid4())[:8]
-    user_id = user.get("sub")
-    if not user_id:
-        raise HTTPException(status_code=401, detail="Invalid session.")
-    if not settings.openai_api_key:
+    provider_name = "local" if preview else settings.embedding_provider
+    if provider_name == "openai" and not settings.openai_api_key:
         raise HTTPException(status_code=503, detail="Insight generation not configured (OPENAI_API_KEY).")
+    try:
+        provider = get_embedding_provider(provider_name, settings.openai_api_key, settings.embedding_batch_tokens)
+    except ValueError as e:
+        logger.error("insights generate misconfigured: %s", e)
+        raise HTTPException(status_code=503, detail="Insight generation not configured (EMBEDDING_PROVIDER).")
 
-    supabase = get_supabase()
-    org = get_organization_for_user(supabase, user_id)
-    if org is not None and not can_upload_or_generate(org, user_id):
+    if not ctx.can_upload_or_generate:
         raise HTTPException(
             status_code=403,
             detail="Trial ended. Subscribe to generate insights ($20/month).",
         )
-    account_id = get_account_id_for_user(supabase, user_id) or user_id
+    account_id = ctx.account_id
 
-    if not check_rate_limit(account_id, "insights/generate"):
+    if not await check_rate_limit(account_id, "insights/generate"):
         logger.warning("insights generate rate limited account_id=%s request_id=%s", account_id, request_id)
         raise HTTPException(status_code=429, detail="Too many requests. Please try again in a few minutes.")
 
-    r = supabase.table("ai_logs").select("*").eq("account_id", account_id).execute()
-    logs = list(r.data or [])
+    # Re-runs only embed logs that are new since the last run.
+    embedding_store = EmbeddingStore(
+        SupabaseEmbeddingStore(supabase, account_id, provider.name),
+        LocalEmbeddingStore(settings.embedding_cache_dir, settings.embedding_cache_max_mb * 1024 * 1024) if settings.embedding_cache_dir else None,
+    )
+
+    # Incremental path: fold logs ingested since the last run into the persisted clusters (no LLM calls).
+    state = None
+    if not preview and provider.stable:
+        state_rows = await run_io(list, iter_account_rows(supabase, "insights", account_id, columns=CLUSTER_STATE_COLUMNS, filters={"active": True}))
+        state = load_cluster_state(state_rows, provider.name)
+    if state is not None:
+        # Resume at the (created_at, id) keyset position: rows of one insert share a created_at, and the
+        # limit may have stopped the previous run in the middle of them.
+        through = state["clustered_through"].isoformat()
+        resume = {"after": (through, state["clustered_through_id"])} if state.get("clustered_through_id") else {"since": through}
+        recent = iter_account_rows(
+            supabase,
+            "ai_logs",
+            account_id,
+            columns=ENGINE_LOG_COLUMNS,
+            filters={"is_negative": True},
+            **resume,
+            descending=False,
+            limit=MAX_NEGATIVE_LOGS,
+        )
+        new_logs = new_logs_since(await run_io(list, recent), state)
+        if not new_logs:
+            return {"ok": True, "count": 0, "insights": [], "message": "No new negative feedback since the last run. Your insights are up to date."}
+        try:
+            updates = await run_io(update_insight_clusters, new_logs, state, settings.openai_api_key, embedding_store, provider)
+        except Exception as e:
+            logger.exception("insight_engine update failed account_id=%s request_id=%s: %s", account_id, request_id, e)
+            raise HTTPException(status_code=503, detail="Insight generation failed. Please try again later.")
+        if updates is not None:
+            updated = []
+            for upd in updates:
+                fields = {k: v for k, v in upd.items() if k != "id"}
+                resp = await run_io(supabase.table("insights").update(fields).eq("id", upd["id"]).eq("account_id", account_id).execute)
+                updated.extend(resp.data or [])
+            logger.info(
+                "insights generate incremental account_id=%s request_id=%s new_logs=%s updated=%s",
+                account_id, request_id, len(new_logs), len(updated),
+            )
+            return {
+                "ok": True,
+                "count": len(updated),
+                "mode": "incremental",
+                "insights": [_public(i) for i in updated],
+                "message": f"Added {len(new_logs)} new conversation(s) to {len(updated)} existing insight(s).",
+            }
+        logger.info("insights generate drift, full re-cluster account_id=%s request_id=%s", account_id, request_id)
+
+    # Negative feedback is classified at ingest (ai_logs.is_negative); fetch only those rows and columns.
+    def negative_logs(limit: int | None = None):
+        return iter_account_rows(
+            supabase,
+            "ai_logs",
+            account_id,
+            columns=ENGINE_LOG_COLUMNS,
+            time_column="timestamp",
+            filters={"is_negative": True},
+            limit=limit,
+        )
+
+    # Large accounts: cluster a sample spread evenly over time, then assign every negative log to a
+    # cluster so frequencies cover all of them. Preview stays on the newest MAX_NEGATIVE_LOGS.
+    population = None
+    total = 0
+    if not preview:
+        counted = await run_io(
+            supabase.table("ai_logs").select("id", count="exact").eq("account_id", account_id).eq("is_negative", True).limit(1).execute
+        )
+        total = counted.count or 0
+    if total > MAX_NEGATIVE_LOGS:
+        logs = await run_io(sample_evenly, negative_logs(), total, MAX_NEGATIVE_LOGS)
+        population = negative_logs
+    else:
+        logs = await run_io(list, negative_logs(MAX_NEGATIVE_LOGS))
     if not logs:
-        return {"ok": True, "count": 0, "insights": [], "message": "No logs to analyze. Upload AI logs first."}
+        any_log = await run_io(supabase.table("ai_logs").select("id").eq("account_id", account_id).limit(1).execute)
+        if not any_log.data:
+            return {"ok": True, "count": 0, "insights": [], "message": "No logs to analyze. Upload AI logs first."}
+        logger.info("insights generate no_patterns account_id=%s request_id=%s", account_id, request_id)
+        return {"ok": True, "count": 0, "insights": [], "message": "No negative feedback patterns found in your logs."}
 
     try:
-        raw_insights = run_insight_engine(logs, account_id, settings.openai_api_key)
+        # Preview skips the LLM: clusters are described by their summaries.
+        llm_key = "" if preview else settings.openai_api_key
+        raw_insights = await run_insight_engine(logs, account_id, llm_key, embedding_store, provider, population)
     except Exception as e:
         logger.exception("insight_engine failed account_id=%s request_id=%s: %s", account_id, request_id, e)
         raise HTTPException(status_code=503, detail="Insight generation failed. Please try again later.")
@@ -59,6 +167,10 @@ async def generate_insights(user: dict = Depends(verify_supabase_jwt)):
         logger.info("insights generate no_patterns account_id=%s request_id=%s", account_id, request_id)
         return {"ok": True, "count": 0, "insights": [], "message": "No negative feedback patterns found in your logs."}
 
+    if preview:
+        logger.info("insights generate preview account_id=%s request_id=%s count=%s", account_id, request_id, len(raw_insights))
+        return {"ok": True, "count": len(raw_insights), "mode": "preview", "insights": [_public(i) for i in raw_insights]}
+
     rows = []
     for ins in raw_insights:
         rows.append({
@@ -69,19 +181,29 @@ async def generate_insights(user: dict = Depends(verify_supabase_jwt)):
             "frequency": ins["frequency"],
             "avg_feedback": ins.get("avg_feedback"),
             "root_cause": ins["root_cause"],
+            "centroid": ins.get("centroid"),
+            "centroid_count": ins.get("centroid_count", ins["frequency"]),
+            "centroid_spread": ins.get("centroid_spread"),
+            "embedding_model": ins.get("embedding_model"),
+            "clustered_through": ins.get("clustered_through"),
+            "clustered_through_id": ins.get("clustered_through_id"),
         })
-    supabase.table("insights").insert(rows).execute()
-    logger.info("insights generate account_id=%s request_id=%s count=%s", account_id, request_id, len(rows))
-    return {"ok": True, "count": len(rows), "insights": raw_insights}
+    inserted = (await run_io(supabase.table("insights").insert(rows).execute)).data or []
+    # The new clustering replaces the previous one; older insights stay for existing Decision Cards but are no longer active.
+    new_ids = [r["id"] for r in inserted if r.get("id")]
+    if new_ids:
+        await run_io(supabase.table("insights").update({"active": False}).eq("account_id", account_id).eq("active", True).not_.in_("id", new_ids).execute)
+    logger.info(
+        "insights generate account_id=%s request_id=%s count=%s negative_logs=%s llm_usage=%s llm_cache=%s",
+        account_id, request_id, len(rows), max(total, len(logs)), llm_gateway.usage(account_id), response_cache.stats(),
+    )
+    return {"ok": True, "count": len(rows), "mode": "full", "insights": [_public(i) for i in raw_insights]}
 
 
 @router.get("/list")
-async def list_insights(user: dict = Depends(verify_supabase_jwt)):
+async def list_insights(
+    ctx: AccountContext = Depends(get_account_context),
+    supabase: Client = Depends(get_supabase),
+):
     """List insights for the account (for Decision Cards and UI)."""
-    user_id = user.get("sub")
-    if not user_id:
-        raise HTTPException(status_code=401, detail="Invalid session.")
-    supabase = get_supabase()
-    account_id = get_account_id_for_user(supabase, user_id) or user_id
-    r = supabase.table("insights").select("*").eq("account_id", account_id).order("created_at", desc=True).execute()
-    return {"items": list(r.data or [])}
+    return {"items": await run_io(list, iter_account_rows(supabase, "insights", ctx.account_id, columns=INSIGHT_COLUMNS, filters={"active": True}))}
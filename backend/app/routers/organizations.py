@@ -4,21 +4,16 @@ from datetime import datetime, timedelta, timezone
 import re
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
-from supabase import create_client
+from supabase import Client
 
 from app.auth import verify_supabase_jwt
-from app.config import settings
-from app.services.organization import get_organization_for_user, can_upload_or_generate
+from app.dependencies import get_account_context, get_supabase
+from app.services.offload import run_io
+from app.services.organization import AccountContext, account_contexts, get_organization_for_user
 
 router = APIRouter(prefix="/organizations", tags=["organizations"])
 
 
-def get_supabase():
-    if not settings.supabase_url or not settings.supabase_service_role_key:
-        raise HTTPException(status_code=503, detail="Server not configured.")
-    return create_client(settings.supabase_url, settings.supabase_service_role_key)
-
-
 class CreateOrganizationBody(BaseModel):
     name: str
     account_type: str | None = None  # analytics only: "organization" | "individual"
@@ -34,6 +29,7 @@ def _slug_from_name(name: str) -> str:
 async def create_organization(
     body: CreateOrganizationBody,
     user: dict = Depends(verify_supabase_jwt),
+    supabase: Client = Depends(get_supabase),
 ):
     """Create an organization for the current user (e.g. after signup). 14-day trial, no card required."""
     user_id = user.get("sub")
@@ -42,8 +38,7 @@ async def create_organization(
     name = (body.name or "").strip()
     if not name:
         raise HTTPException(status_code=400, detail="Organization name is required.")
-    supabase = get_supabase()
-    existing = get_organization_for_user(supabase, user_id)
+    existing = await run_io(get_organization_for_user, supabase, user_id)
     if existing:
         return {"id": existing["id"], "name": existing["name"], "slug": existing.get("slug"), "message": "Already in an organization."}
     slug = _slug_from_name(name)
@@ -60,7 +55,7 @@ async def create_organization(
         "account_type": account_type,
         "survey_responses": survey,
     }
-    org_resp = supabase.table("organizations").insert(org_row).execute()
+    org_resp = await run_io(supabase.table("organizations").insert(org_row).execute)
     if not org_resp.data or len(org_resp.data) == 0:
         raise HTTPException(status_code=500, detail="Failed to create organization.")
     org_id = org_resp.data[0]["id"]
@@ -69,7 +64,8 @@ async def create_organization(
         "user_id": user_id,
         "role": "owner",
     }
-    supabase.table("organization_members").insert(member_row).execute()
+    await run_io(supabase.table("organization_members").insert(member_row).execute)
+    account_contexts.invalidate(user_id=user_id)
     return {
         "id": org_id,
         "name": name,
@@ -80,16 +76,12 @@ async def create_organization(
 
 
 @router.get("/me")
-async def get_my_organization(user: dict = Depends(verify_supabase_jwt)):
+async def get_my_organization(ctx: AccountContext = Depends(get_account_context)):
     """Return the current user's organization and billing state (trial_ends_at, subscription_status)."""
-    user_id = user.get("sub")
-    if not user_id:
-        raise HTTPException(status_code=401, detail="Invalid session.")
-    supabase = get_supabase()
-    org = get_organization_for_user(supabase, user_id)
+    org = ctx.organization
     if not org:
         return {"organization": None, "can_upload": True}
-    can_upload = can_upload_or_generate(org, user_id)
+    can_upload = ctx.can_upload_or_generate
     return {
         "organization": {
             "id": org["id"],
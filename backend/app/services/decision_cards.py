@@ -1,69 +1,80 @@
 # You are helping build an AI Product Decision Platform. Never add generic charts or infra metrics. All outputs must directly support: what is broken, why, and what to fix first for an AI SaaS product.
 
+import asyncio
 import json
+import logging
 from typing import Any, List, Dict
 
-from openai import OpenAI
+from app.services.embeddings import pack_batches
+from app.services.llm_gateway import LLMSession, llm_gateway
 
+logger = logging.getLogger(__name__)
 
-def _llm_generate_cards_for_insight(insight: dict, api_key: str) -> list[dict[str, Any]]:
-  """
-  Use an LLM to turn a single Insight into 1–3 Decision Cards.
-  Each card: problem, evidence_snippets, recommended_action, impact_level (1–5), effort_estimate (1–5), confidence_score (0–1).
-  """
-  if not api_key:
-    return []
-  client = OpenAI(api_key=api_key)
-  examples = insight.get("example_snippets") or []
-  root = insight.get("root_cause") or {}
-  freq = insight.get("frequency") or 0
-  avg_feedback = insight.get("avg_feedback") or ""
-  prompt = {
-    "title": insight.get("title", ""),
-    "description": insight.get("description", ""),
-    "root_cause": root,
-    "frequency": freq,
-    "avg_feedback": avg_feedback,
-    "example_snippets": examples[:3],
-  }
-  resp = client.chat.completions.create(
-    model="gpt-4o-mini",
-    messages=[
-      {
-        "role": "system",
-        "content": (
-          "You are a senior product manager for an AI SaaS product. "
-          "Convert each failure-pattern Insight into 1–3 concrete Decision Cards that a small team can ship THIS WEEK. "
-          "No dashboards, no metrics jargon. Each card must be opinionated and shippable.\n\n"
-          "Return ONLY valid JSON: an array of objects with keys:\n"
-          "problem (string, 1 sentence),\n"
-          "evidence_snippets (array of 2–3 short strings),\n"
-          "recommended_action (string, specific change this week),\n"
-          "impact_level (integer 1–5, 5=highest impact),\n"
-          "effort_estimate (integer 1–5, 5=highest effort),\n"
-          "confidence_score (float 0–1).\n"
-        ),
-      },
-      {
-        "role": "user",
-        "content": (
-          "Here is one failure-pattern Insight as JSON:\n"
-          f"{json.dumps(prompt, ensure_ascii=False)}\n\n"
-          "Now output ONLY a JSON array of Decision Cards as described."
-        ),
-      },
-    ],
-    temperature=0.3,
-  )
-  text = (resp.choices[0].message.content or "").strip()
+CARDS_MODEL = "gpt-4o-mini"
+CARDS_TEMPERATURE = 0.3
+CARDS_CONCURRENCY = 4  # insights in flight per generate call (the gateway also caps per account)
+CARDS_BATCH_TOKENS = 3000  # insight JSON per batched request; leaves room for ~3 cards per insight in the answer
+CARDS_BATCH_MAX_INSIGHTS = 8
+
+
+_SYSTEM_INTRO = (
+  "You are a senior product manager for an AI SaaS product. "
+  "Convert each failure-pattern Insight into 1–3 concrete Decision Cards that a small team can ship THIS WEEK. "
+  "No dashboards, no metrics jargon. Each card must be opinionated and shippable.\n\n"
+)
+_CARD_KEYS = (
+  "problem (string, 1 sentence),\n"
+  "evidence_snippets (array of 2–3 short strings),\n"
+  "recommended_action (string, specific change this week),\n"
+  "impact_level (integer 1–5, 5=highest impact),\n"
+  "effort_estimate (integer 1–5, 5=highest effort),\n"
+  "confidence_score (float 0–1).\n"
+)
+_SINGLE_SYSTEM = _SYSTEM_INTRO + "Return ONLY valid JSON: an array of objects with keys:\n" + _CARD_KEYS
+_BATCH_SYSTEM = (
+  _SYSTEM_INTRO
+  + "You will receive several Insights, each with an id. Return ONLY valid JSON: an object whose keys are the "
+  "Insight ids and whose values are arrays of card objects with keys:\n" + _CARD_KEYS
+)
+
+
+def _strip_fences(text: str) -> str:
   if text.startswith("```"):
     text = text.split("```")[1].replace("json", "").strip()
+  return text
+
+
+def _parse_cards(text: str) -> list | None:
   try:
-    data = json.loads(text)
+    data = json.loads(_strip_fences(text))
   except json.JSONDecodeError:
-    return []
-  if not isinstance(data, list):
-    return []
+    return None
+  return data if isinstance(data, list) else None
+
+
+def _parse_batch(text: str) -> dict[str, list] | None:
+  """Cards keyed by insight id from a batched answer; None if it is not a JSON object. Non-list values are dropped."""
+  try:
+    data = json.loads(_strip_fences(text))
+  except json.JSONDecodeError:
+    return None
+  if not isinstance(data, dict):
+    return None
+  return {str(k): v for k, v in data.items() if isinstance(v, list)}
+
+
+def _insight_prompt(insight: dict) -> dict[str, Any]:
+  return {
+    "title": insight.get("title", ""),
+    "description": insight.get("description", ""),
+    "root_cause": insight.get("root_cause") or {},
+    "frequency": insight.get("frequency") or 0,
+    "avg_feedback": insight.get("avg_feedback") or "",
+    "example_snippets": (insight.get("example_snippets") or [])[:3],
+  }
+
+
+def _clean_cards(data: list) -> list[dict[str, Any]]:
   cards: list[dict[str, Any]] = []
   for item in data:
     if not isinstance(item, dict):
@@ -88,30 +99,133 @@ def _llm_generate_cards_for_insight(insight: dict, api_key: str) -> list[dict[st
   return cards
 
 
-def generate_decision_cards_for_account(
+async def _llm_generate_cards_for_insight(insight: dict, llm: LLMSession) -> list[dict[str, Any]]:
+  """
+  Use an LLM to turn a single Insight into 1–3 Decision Cards.
+  Each card: problem, evidence_snippets, recommended_action, impact_level (1–5), effort_estimate (1–5), confidence_score (0–1).
+  """
+  messages = [
+    {"role": "system", "content": _SINGLE_SYSTEM},
+    {
+      "role": "user",
+      "content": (
+        "Here is one failure-pattern Insight as JSON:\n"
+        f"{json.dumps(_insight_prompt(insight), ensure_ascii=False)}\n\n"
+        "Now output ONLY a JSON array of Decision Cards as described."
+      ),
+    },
+  ]
+  # Only well-formed answers are cached, so a malformed one is retried next time.
+  text = await llm.chat(messages, model=CARDS_MODEL, temperature=CARDS_TEMPERATURE, cacheable=lambda t: _parse_cards(t) is not None)
+  data = _parse_cards(text)
+  if data is None:
+    return []
+  return _clean_cards(data)
+
+
+async def _llm_generate_cards_for_batch(insights: list[dict], llm: LLMSession) -> dict[str, list[dict[str, Any]]]:
+  """
+  One request for several Insights: the system prompt and instructions are sent once. Returns cards keyed
+  by insight id; ids missing from the answer (or all of them, if it is malformed) are absent.
+  """
+  ids = [str(insight["id"]) for insight in insights]
+  payload = [{"id": i, **_insight_prompt(insight)} for i, insight in zip(ids, insights)]
+  messages = [
+    {"role": "system", "content": _BATCH_SYSTEM},
+    {
+      "role": "user",
+      "content": (
+        f"Here are {len(payload)} failure-pattern Insights as JSON:\n"
+        f"{json.dumps(payload, ensure_ascii=False)}\n\n"
+        "Now output ONLY a JSON object mapping every Insight id to its array of Decision Cards."
+      ),
+    },
+  ]
+
+  def complete(text: str) -> bool:
+    parsed = _parse_batch(text)
+    return parsed is not None and all(i in parsed for i in ids)
+
+  text = await llm.chat(messages, model=CARDS_MODEL, temperature=CARDS_TEMPERATURE, cacheable=complete)
+  parsed = _parse_batch(text) or {}
+  return {i: _clean_cards(parsed[i]) for i in ids if i in parsed}
+
+
+async def generate_decision_cards_for_account(
   insights: List[Dict[str, Any]],
   existing_cards_by_insight: Dict[str, List[Dict[str, Any]]],
   account_id: str,
   openai_api_key: str,
+  max_concurrency: int = CARDS_CONCURRENCY,
+  batched: bool = False,
+  batch_tokens: int = CARDS_BATCH_TOKENS,
+  batch_max_insights: int = CARDS_BATCH_MAX_INSIGHTS,
 ) -> List[Dict[str, Any]]:
   """
   For each Insight that does NOT already have Decision Cards, ask the LLM for 1–3 cards.
-  Returns rows ready to insert into decision_cards.
+  Insights are processed concurrently (at most max_concurrency LLM calls in flight). An insight whose call
+  fails is logged and skipped so the others' cards are still returned; raises only if every insight failed.
+  With batched=True, insights are packed into multi-insight requests of at most batch_tokens prompt tokens
+  and batch_max_insights insights; insights a batch answer does not cover (malformed JSON, missing ids,
+  failed call) are retried one by one.
+  Returns rows ready to insert into decision_cards, in insight order.
   """
+  if not openai_api_key:
+    return []
+  todo = [
+    insight for insight in insights
+    if insight.get("id") and not existing_cards_by_insight.get(insight["id"])
+  ]
+  if not todo:
+    return []
+  llm = llm_gateway.session(openai_api_key, account_id)
+  sem = asyncio.Semaphore(max_concurrency)
+  results: dict[str, list[dict[str, Any]] | Exception] = {}
+
+  async def one(insight: dict) -> None:
+    async with sem:
+      try:
+        results[insight["id"]] = await _llm_generate_cards_for_insight(insight, llm)
+      except Exception as e:
+        logger.warning("decision cards failed account_id=%s insight_id=%s: %s", account_id, insight["id"], e)
+        results[insight["id"]] = e
+
+  async def batch(group: list[dict]) -> None:
+    async with sem:
+      try:
+        by_id = await _llm_generate_cards_for_batch(group, llm)
+      except Exception as e:
+        logger.warning("decision cards batch of %s failed account_id=%s: %s", len(group), account_id, e)
+        by_id = {}
+    missing = [insight for insight in group if str(insight["id"]) not in by_id]
+    for insight in group:
+      if str(insight["id"]) in by_id:
+        results[insight["id"]] = by_id[str(insight["id"])]
+    if missing:
+      logger.info("decision cards batch incomplete, %s insights retried singly account_id=%s", len(missing), account_id)
+      await asyncio.gather(*(one(insight) for insight in missing))
+
+  if batched:
+    prompts = [json.dumps(_insight_prompt(insight), ensure_ascii=False) for insight in todo]
+    groups = [[todo[i] for i in idx] for idx in pack_batches(prompts, batch_tokens, batch_max_insights)]
+    await asyncio.gather(*(batch(g) if len(g) > 1 else one(g[0]) for g in groups))
+  else:
+    await asyncio.gather(*(one(insight) for insight in todo))
+
+  failures = [r for r in results.values() if isinstance(r, Exception)]
+  if len(failures) == len(todo):
+    raise failures[0]
+
   all_cards: list[dict[str, Any]] = []
-  for insight in insights:
-    ins_id = insight.get("id")
-    if not ins_id:
-      continue
-    if ins_id in existing_cards_by_insight and existing_cards_by_insight[ins_id]:
-      # Skip if cards already exist for this insight
+  for insight in todo:
+    cards = results.get(insight["id"])
+    if cards is None or isinstance(cards, Exception):
       continue
-    cards = _llm_generate_cards_for_insight(insight, openai_api_key)
     for card in cards:
       all_cards.append(
         {
           "account_id": account_id,
-          "insight_id": ins_id,
+          "insight_id": insight["id"],
           "problem": card["problem"],
           "evidence_snippets": card["evidence_snippets"],
           "recommended_action": card["recommended_action"],
@@ -122,4 +236,3 @@ def generate_decision_cards_for_account(
         }
       )
   return all_cards
-
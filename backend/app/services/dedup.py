@@ -0,0 +1,98 @@
+# You are helping build an AI Product Decision Platform. Never add generic charts or infra metrics. All outputs must directly support: what is broken, why, and what to fix first for an AI SaaS product.
+
+"""Collapse identical and near-identical logs before embedding.
+
+Production logs repeat the same canned refusal or retry many times. Texts are first grouped by an exact
+hash of their normalized form (case, whitespace, punctuation and digits folded), then representatives are
+compared with MinHash signatures over word 3-gram shingles, bucketed with LSH so only likely matches are
+compared. Only one representative per group is embedded; the group size becomes its weight."""
+
+from __future__ import annotations
+
+import hashlib
+import re
+import zlib
+from typing import Any, Callable
+
+import numpy as np
+
+NEAR_DUP_THRESHOLD = 0.8  # estimated Jaccard similarity of word 3-gram shingles
+NUM_PERM = 64
+LSH_BANDS = 16  # 16 bands x 4 rows: pairs at the threshold share a bucket with probability > 0.999
+SHINGLE_WORDS = 3
+
+_PRIME = (1 << 31) - 1
+_rng = np.random.default_rng(1)
+_A = _rng.integers(1, _PRIME, NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, _PRIME, NUM_PERM, dtype=np.uint64)
+_BASE = 1_000_003
+_NON_WORD = re.compile(r"[\W_]+")
+_DIGITS = re.compile(r"\d+")
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase, digits folded to 0, punctuation and whitespace collapsed to single spaces."""
+    return _NON_WORD.sub(" ", _DIGITS.sub("0", text.lower())).strip()
+
+
+def _minhash(words: list[str], word_hashes: dict[str, int]) -> np.ndarray:
+    h = np.fromiter(
+        (word_hashes.get(w) or word_hashes.setdefault(w, zlib.crc32(w.encode("utf-8")) % _PRIME or 1) for w in words),
+        dtype=np.uint64,
+        count=len(words),
+    )
+    if len(h) > SHINGLE_WORDS:
+        # Polynomial hash of each run of SHINGLE_WORDS word hashes, vectorized.
+        x = np.zeros(len(h) - SHINGLE_WORDS + 1, dtype=np.uint64)
+        for i in range(SHINGLE_WORDS):
+            x = (x * np.uint64(_BASE) + h[i : len(h) - SHINGLE_WORDS + 1 + i]) % _PRIME
+        x = np.unique(x)
+    else:
+        x = np.array([zlib.crc32(" ".join(words).encode("utf-8")) % _PRIME], dtype=np.uint64)
+    # (a * x + b) mod p stays below 2**62 for a, x < 2**31.
+    return ((x[:, None] * _A[None, :] + _B[None, :]) % _PRIME).min(axis=0)
+
+
+def collapse_duplicates(items: list[Any], text_of: Callable[[Any], str]) -> list[list[Any]]:
+    """
+    Group items whose texts are identical after normalize_text or near-identical (MinHash estimate of
+    Jaccard >= NEAR_DUP_THRESHOLD against the group's first item). Groups keep first-seen order and the
+    first item of each group is its representative.
+    """
+    exact: dict[bytes, list[Any]] = {}
+    words_of: dict[bytes, list[str]] = {}
+    for item in items:
+        norm = normalize_text(text_of(item))
+        key = hashlib.blake2b(norm.encode("utf-8"), digest_size=16).digest()
+        group = exact.get(key)
+        if group is None:
+            exact[key] = [item]
+            words_of[key] = norm.split()
+        else:
+            group.append(item)
+
+    rows = NUM_PERM // LSH_BANDS
+    word_hashes: dict[str, int] = {}
+    buckets: dict[tuple[int, bytes], list[int]] = {}
+    groups: list[list[Any]] = []
+    signatures: list[np.ndarray] = []
+    for key, members in exact.items():
+        sig = _minhash(words_of[key], word_hashes)
+        bands = [(b, sig[b * rows : (b + 1) * rows].tobytes()) for b in range(LSH_BANDS)]
+        match = None
+        for band in bands:
+            for g in buckets.get(band, ()):
+                if float((signatures[g] == sig).mean()) >= NEAR_DUP_THRESHOLD:
+                    match = g
+                    break
+            if match is not None:
+                break
+        if match is not None:
+            groups[match].extend(members)
+            continue
+        g = len(groups)
+        groups.append(list(members))
+        signatures.append(sig)
+        for band in bands:
+            buckets.setdefault(band, []).append(g)
+    return groups
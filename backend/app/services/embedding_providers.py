@@ -0,0 +1,117 @@
+# You are helping build an AI Product Decision Platform. Never add generic charts or infra metrics. All outputs must directly support: what is broken, why, and what to fix first for an AI SaaS product.
+
+"""Embedding providers for the insight engine.
+
+"openai" calls the embeddings API (token-budgeted, concurrent batches). "local" runs in-process with
+scikit-learn: hashed word/bigram counts, TF-IDF weighting and TruncatedSVD down to a dense vector, so
+the output drops straight into normalize + KMeans. It needs no network or key and runs in well under a
+second for a few thousand logs: use it for preview clustering and offline benchmarks.
+
+The local SVD basis is fitted per provider instance (one insight run), so its vectors are not comparable
+across runs (stable = False): they are not cached and no centroids are persisted from them."""
+
+from __future__ import annotations
+
+import threading
+from typing import Any, Protocol
+
+import numpy as np
+
+from app.services.embeddings import MAX_BATCH_TOKENS, embed_texts
+
+OPENAI_EMBEDDING_MODEL = "text-embedding-3-small"
+OPENAI_TIMEOUT_SEC = 60
+LOCAL_DIMENSIONS = 128
+LOCAL_HASH_FEATURES = 2**18
+EMBEDDING_PROVIDERS = ("openai", "local")
+
+
+class EmbeddingProvider(Protocol):
+    name: str  # recorded with cached vectors and persisted centroids
+    stable: bool  # same text -> same vector across calls (cacheable; centroids comparable across runs)
+
+    def embed(self, texts: list[str]) -> list[list[float]] | np.ndarray: ...
+
+
+class OpenAIEmbeddingProvider:
+    stable = True
+
+    def __init__(self, api_key: str, model: str = OPENAI_EMBEDDING_MODEL, batch_tokens: int = MAX_BATCH_TOKENS):
+        self.name = model
+        self._api_key = api_key
+        self._batch_tokens = batch_tokens
+        self._client: Any = None
+        self._client_lock = threading.Lock()
+
+    def _openai(self) -> Any:
+        """One client (and connection pool) per provider, shared by every batch and embed call."""
+        with self._client_lock:
+            if self._client is None:
+                from openai import OpenAI
+                # Retries are per batch in embed_texts.
+                self._client = OpenAI(api_key=self._api_key, timeout=OPENAI_TIMEOUT_SEC, max_retries=0)
+            return self._client
+
+    def embed(self, texts: list[str]) -> list[list[float]]:
+        if not self._api_key or not texts:
+            return []
+        try:
+            client = self._openai()
+
+            def create(batch: list[str]) -> list[list[float]]:
+                out = client.embeddings.create(model=self.name, input=batch)
+                by_idx = {d.index: d.embedding for d in out.data}
+                return [by_idx[i] for i in range(len(batch))]
+
+            return embed_texts(texts, create, max_tokens=self._batch_tokens)
+        except Exception as e:
+            raise RuntimeError(f"Embedding API failed: {e}") from e
+
+
+class LocalEmbeddingProvider:
+    """
+    The first embed call fits IDF weights and the SVD basis on its texts; later calls on the same instance
+    reuse them, so one instance can cluster a sample and then assign further logs in the same space.
+    """
+
+    stable = False
+
+    def __init__(self, dimensions: int = LOCAL_DIMENSIONS):
+        self.name = f"local-tfidf-svd-{dimensions}"
+        self._dimensions = dimensions
+        self._fitted = None
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, 0))
+        from sklearn.decomposition import TruncatedSVD
+        from sklearn.feature_extraction.text import HashingVectorizer, TfidfTransformer
+
+        counts = HashingVectorizer(
+            n_features=LOCAL_HASH_FEATURES, ngram_range=(1, 2), alternate_sign=False, norm=None
+        ).transform(texts)
+        if self._fitted is not None:
+            tfidf, columns, svd = self._fitted
+            reduced = tfidf.transform(counts)[:, columns]
+            return svd.transform(reduced) if svd is not None else np.ones((len(texts), 1))
+        tfidf = TfidfTransformer(sublinear_tf=True).fit(counts)
+        weighted = tfidf.transform(counts)
+        # Only hash buckets that occur matter; dropping the empty ones makes the SVD ~50x faster.
+        columns = np.unique(weighted.indices)
+        weighted = weighted[:, columns]
+        k = min(self._dimensions, len(texts) - 1, weighted.shape[1] - 1)
+        svd = TruncatedSVD(n_components=k, random_state=42) if k >= 1 else None
+        self._fitted = (tfidf, columns, svd)
+        if svd is None:
+            return np.ones((len(texts), 1))
+        return svd.fit_transform(weighted)
+
+
+def get_embedding_provider(name: str, openai_api_key: str = "", batch_tokens: int = MAX_BATCH_TOKENS) -> EmbeddingProvider:
+    """Provider by name ("openai" or "local"). Raises ValueError for anything else.
+    batch_tokens: estimated tokens per OpenAI embeddings request."""
+    if name == "openai":
+        return OpenAIEmbeddingProvider(openai_api_key, batch_tokens=batch_tokens)
+    if name == "local":
+        return LocalEmbeddingProvider()
+    raise ValueError(f"Unknown embedding provider {name!r}; expected one of {', '.join(EMBEDDING_PROVIDERS)}.")
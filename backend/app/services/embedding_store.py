@@ -0,0 +1,191 @@
+# You are helping build an AI Product Decision Platform. Never add generic charts or infra metrics. All outputs must directly support: what is broken, why, and what to fix first for an AI SaaS product.
+
+"""Embedding cache so insight re-runs only embed logs that were not embedded before.
+
+Vectors are keyed by embedding_key(text, model): the exact text sent to the provider plus the model name,
+so a changed prompt format or model never returns a stale vector. The primary store is the
+ai_log_embeddings table (per account); LocalEmbeddingStore keeps float32 .npy files on disk and is used
+when the table is unavailable (e.g. migration not applied yet) or when Supabase is not configured."""
+
+from __future__ import annotations
+
+import base64
+import hashlib
+import logging
+import os
+import tempfile
+from typing import Iterable, Protocol
+
+import numpy as np
+from supabase import Client
+
+logger = logging.getLogger(__name__)
+
+EMBEDDINGS_TABLE = "ai_log_embeddings"
+KEYS_PER_QUERY = 200  # keeps the in.(...) filter well under URL length limits
+ROWS_PER_UPSERT = 500
+LOCAL_MAX_BYTES = 512 * 1024 * 1024
+LOCAL_PRUNE_TO = 0.8  # when over the limit, evict down to this share of it, so pruning is not needed on every write
+
+
+def embedding_key(text: str, model: str) -> str:
+    """128-bit hex key for (model, text). Same width as ai_logs.content_hash."""
+    return hashlib.sha256(f"{model}\x1f{text}".encode("utf-8")).hexdigest()[:32]
+
+
+def encode_vector(vec: np.ndarray) -> str:
+    return base64.b64encode(np.asarray(vec, dtype="<f4").tobytes()).decode("ascii")
+
+
+def decode_vector(data: str) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(data), dtype="<f4")
+
+
+class VectorStore(Protocol):
+    def get_many(self, keys: list[str]) -> dict[str, np.ndarray]: ...
+
+    def put_many(self, vectors: dict[str, np.ndarray]) -> None: ...
+
+
+class SupabaseEmbeddingStore:
+    """ai_log_embeddings rows (account_id, key, model, dims, vector); vector is base64 little-endian float32."""
+
+    def __init__(self, supabase: Client, account_id: str, model: str):
+        self._supabase = supabase
+        self._account_id = account_id
+        self._model = model
+
+    def get_many(self, keys: list[str]) -> dict[str, np.ndarray]:
+        found: dict[str, np.ndarray] = {}
+        for start in range(0, len(keys), KEYS_PER_QUERY):
+            chunk = keys[start : start + KEYS_PER_QUERY]
+            r = (
+                self._supabase.table(EMBEDDINGS_TABLE)
+                .select("key, dims, vector")
+                .eq("account_id", self._account_id)
+                .in_("key", chunk)
+                .execute()
+            )
+            for row in r.data or []:
+                vec = decode_vector(row["vector"])
+                if len(vec) == row.get("dims", len(vec)):
+                    found[row["key"]] = vec
+        return found
+
+    def put_many(self, vectors: dict[str, np.ndarray]) -> None:
+        rows = [
+            {"account_id": self._account_id, "key": k, "model": self._model, "dims": int(len(v)), "vector": encode_vector(v)}
+            for k, v in vectors.items()
+        ]
+        for start in range(0, len(rows), ROWS_PER_UPSERT):
+            self._supabase.table(EMBEDDINGS_TABLE).upsert(
+                rows[start : start + ROWS_PER_UPSERT], on_conflict="account_id,key", ignore_duplicates=True
+            ).execute()
+
+
+class LocalEmbeddingStore:
+    """
+    One float32 .npy per key under directory/<key[:2]>/. Writes are atomic (temp file + rename).
+    The directory is kept under max_bytes: reads refresh a file's mtime, and after a write that takes it over
+    the limit the least recently used files are deleted.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = LOCAL_MAX_BYTES):
+        self._dir = directory
+        self.max_bytes = max_bytes
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self._dir, key[:2], f"{key}.npy")
+
+    def get_many(self, keys: list[str]) -> dict[str, np.ndarray]:
+        found: dict[str, np.ndarray] = {}
+        for key in keys:
+            path = self._path(key)
+            try:
+                found[key] = np.load(path, allow_pickle=False)
+                os.utime(path)
+            except (OSError, ValueError):
+                continue
+        return found
+
+    def put_many(self, vectors: dict[str, np.ndarray]) -> None:
+        for key, vec in vectors.items():
+            path = self._path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    np.save(f, np.asarray(vec, dtype=np.float32), allow_pickle=False)
+                os.replace(tmp, path)
+            except OSError:
+                if os.path.exists(tmp):
+                    os.unlink(tmp)
+                raise
+        if vectors:
+            self._prune()
+
+    def _prune(self) -> None:
+        files: list[tuple[float, int, str]] = []  # (mtime, size, path)
+        for sub in os.scandir(self._dir):
+            if not sub.is_dir():
+                continue
+            for entry in os.scandir(sub.path):
+                if entry.name.endswith(".npy"):
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    files.append((st.st_mtime, st.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        if total <= self.max_bytes:
+            return
+        target = self.max_bytes * LOCAL_PRUNE_TO
+        files.sort()
+        for _, size, path in files:
+            if total <= target:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            total -= size
+        logger.info("local embedding cache pruned to %s bytes (limit %s)", total, self.max_bytes)
+
+
+class EmbeddingStore:
+    """
+    Primary store with an optional fallback. If the primary fails (missing table, network), it is disabled
+    for the rest of this run and the fallback serves reads and writes. Cache errors never fail insight generation.
+    """
+
+    def __init__(self, primary: VectorStore | None = None, fallback: VectorStore | None = None):
+        self._stores = [s for s in (primary, fallback) if s is not None]
+
+    def get_many(self, keys: Iterable[str]) -> dict[str, np.ndarray]:
+        missing = list(dict.fromkeys(keys))
+        found: dict[str, np.ndarray] = {}
+        for store in list(self._stores):
+            if not missing:
+                break
+            try:
+                hits = store.get_many(missing)
+            except Exception as e:
+                self._disable(store, e)
+                continue
+            found.update(hits)
+            missing = [k for k in missing if k not in hits]
+        return found
+
+    def put_many(self, vectors: dict[str, np.ndarray]) -> None:
+        if not vectors:
+            return
+        for store in list(self._stores):
+            try:
+                store.put_many(vectors)
+                return
+            except Exception as e:
+                self._disable(store, e)
+
+    def _disable(self, store: VectorStore, e: Exception) -> None:
+        logger.warning("embedding cache %s unavailable, skipping: %s", type(store).__name__, e)
+        self._stores.remove(store)
@@ -0,0 +1,111 @@
+# You are helping build an AI Product Decision Platform. Never add generic charts or infra metrics. All outputs must directly support: what is broken, why, and what to fix first for an AI SaaS product.
+
+"""Batched, concurrent embedding requests.
+
+Texts are packed into batches under a token budget (the provider rejects requests over its per-request
+input/token limits), batches run concurrently up to a cap, each batch is retried on its own on transient
+errors, and vectors are returned in input order. Wall-clock time is about one batch round trip per
+max_concurrency batches instead of one giant request."""
+
+from __future__ import annotations
+
+import logging
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_TOKENS = 60_000  # provider limit is 300k tokens per request; smaller batches overlap better
+MAX_BATCH_INPUTS = 256  # provider limit is 2048 inputs per request
+MAX_CONCURRENCY = 8
+MAX_ATTEMPTS = 4
+BACKOFF_BASE_SEC = 0.5
+
+_encoder = None
+
+
+def estimate_tokens(text: str) -> int:
+    """Token count via tiktoken when installed; otherwise a conservative bytes/3 estimate."""
+    global _encoder
+    if _encoder is None:
+        try:
+            import tiktoken
+
+            _encoder = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoder = False
+    if _encoder:
+        return len(_encoder.encode(text, disallowed_special=()))
+    return len(text.encode("utf-8")) // 3 + 1
+
+
+def pack_batches(texts: list[str], max_tokens: int = MAX_BATCH_TOKENS, max_inputs: int = MAX_BATCH_INPUTS) -> list[list[int]]:
+    """Greedy packing of text indices, in order. A text over max_tokens gets a batch of its own."""
+    batches: list[list[int]] = []
+    current: list[int] = []
+    used = 0
+    for i, text in enumerate(texts):
+        n = estimate_tokens(text)
+        if current and (used + n > max_tokens or len(current) >= max_inputs):
+            batches.append(current)
+            current, used = [], 0
+        current.append(i)
+        used += n
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _is_transient(exc: Exception) -> bool:
+    status = getattr(exc, "status_code", None)
+    if status is not None:
+        return status == 429 or status >= 500
+    # openai.APIConnectionError / APITimeoutError carry no status code.
+    return type(exc).__name__ in ("APIConnectionError", "APITimeoutError") or isinstance(exc, (ConnectionError, TimeoutError))
+
+
+def _embed_batch(create: Callable[[list[str]], list[list[float]]], batch: list[str]) -> list[list[float]]:
+    attempt = 1
+    while True:
+        try:
+            vectors = create(batch)
+            if len(vectors) != len(batch):
+                raise RuntimeError(f"expected {len(batch)} embeddings, got {len(vectors)}")
+            return vectors
+        except Exception as e:
+            if attempt >= MAX_ATTEMPTS or not _is_transient(e):
+                raise
+            delay = BACKOFF_BASE_SEC * (2 ** (attempt - 1)) * (1 + random.random())
+            logger.warning("embedding batch of %s failed (attempt %s), retrying in %.1fs: %s", len(batch), attempt, delay, e)
+            time.sleep(delay)
+        attempt += 1
+
+
+def embed_texts(
+    texts: list[str],
+    create: Callable[[list[str]], list[list[float]]],
+    max_tokens: int = MAX_BATCH_TOKENS,
+    max_inputs: int = MAX_BATCH_INPUTS,
+    max_concurrency: int = MAX_CONCURRENCY,
+) -> list[list[float]]:
+    """
+    Embed texts with create(batch) -> vectors (one provider request). Returns vectors in input order.
+    Raises the last error of a batch that still fails after MAX_ATTEMPTS.
+    """
+    if not texts:
+        return []
+    batches = pack_batches(texts, max_tokens, max_inputs)
+    out: list[list[float] | None] = [None] * len(texts)
+    workers = max(1, min(max_concurrency, len(batches)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="embed") as pool:
+        futures = [(idx, pool.submit(_embed_batch, create, [texts[i] for i in idx])) for idx in batches]
+        try:
+            for idx, fut in futures:
+                for i, vec in zip(idx, fut.result()):
+                    out[i] = vec
+        except BaseException:
+            pool.shutdown(wait=False, cancel_futures=True)  # don't start batches whose result is discarded
+            raise
+    return out  # type: ignore[return-value]
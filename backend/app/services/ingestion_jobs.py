@@ -0,0 +1,136 @@
+# You are helping build an AI Product Decision Platform. Never add generic charts or infra metrics. All outputs must directly support: what is broken, why, and what to fix first for an AI SaaS product.
+
+"""In-memory registry of background ingestion jobs (POST /ingestion/upload?async=true).
+
+Production note: state lives in this process only. Run a single web instance (or sticky
+routing) for job polling; a restart loses job status, though rows already stored stay stored."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+MAX_JOBS_PER_ACCOUNT = 50
+FINISHED_JOB_TTL_SEC = 24 * 60 * 60
+MAX_REPORTED_ERRORS = 30
+
+_jobs: dict[str, dict[str, Any]] = {}
+_tasks: set[asyncio.Task] = set()  # strong refs so running jobs are not garbage-collected
+_slots: tuple[asyncio.AbstractEventLoop, asyncio.Semaphore] | None = None
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _evict(account_id: str) -> None:
+    cutoff = time.time() - FINISHED_JOB_TTL_SEC
+    for job_id in [j for j, job in _jobs.items() if job["_finished_ts"] and job["_finished_ts"] < cutoff]:
+        del _jobs[job_id]
+    own = sorted((j for j in _jobs.values() if j["account_id"] == account_id), key=lambda j: j["_created_ts"])
+    for job in own[: max(0, len(own) - MAX_JOBS_PER_ACCOUNT + 1)]:
+        if job["_finished_ts"]:
+            del _jobs[job["id"]]
+
+
+def create_job(account_id: str, filename: str, bytes_total: int | None) -> dict[str, Any]:
+    """Register a queued job and return it."""
+    _evict(account_id)
+    job = {
+        "id": str(uuid.uuid4()),
+        "account_id": account_id,
+        "filename": filename,
+        "status": "queued",
+        "created_at": _now(),
+        "started_at": None,
+        "finished_at": None,
+        "bytes_total": bytes_total,
+        "bytes_read": 0,
+        "stored": 0,
+        "duplicates": 0,
+        "failed": 0,
+        "error_count": 0,
+        "errors": [],
+        "warnings": [],
+        "stored_ranges": [],
+        "failed_ranges": [],
+        "partial": False,
+        "_created_ts": time.time(),
+        "_finished_ts": None,
+    }
+    _jobs[job["id"]] = job
+    return job
+
+
+def public_view(job: dict[str, Any]) -> dict[str, Any]:
+    """Job as returned by the API: internal fields dropped, progress (0–1) added."""
+    out = {k: v for k, v in job.items() if not k.startswith("_")}
+    total = job["bytes_total"]
+    if job["status"] in ("done", "failed"):
+        out["progress"] = 1.0
+    elif total:
+        out["progress"] = round(min(1.0, job["bytes_read"] / total), 3)
+    else:
+        out["progress"] = 0.0
+    return out
+
+
+def get_job(job_id: str, account_id: str) -> dict[str, Any] | None:
+    job = _jobs.get(job_id)
+    if job is None or job["account_id"] != account_id:
+        return None
+    return job
+
+
+def list_jobs(account_id: str) -> list[dict[str, Any]]:
+    """Account's jobs, newest first."""
+    own = [j for j in _jobs.values() if j["account_id"] == account_id]
+    return sorted(own, key=lambda j: j["_created_ts"], reverse=True)
+
+
+def _finish(job: dict[str, Any], status: str, result: dict[str, Any]) -> None:
+    job["status"] = status
+    for key in ("stored", "duplicates", "failed", "error_count", "stored_ranges", "failed_ranges", "warnings", "partial"):
+        if key in result:
+            job[key] = result[key]
+    job["errors"] = list(result.get("errors") or [])[:MAX_REPORTED_ERRORS]
+    job["finished_at"] = _now()
+    job["_finished_ts"] = time.time()
+
+
+def start_job(job: dict[str, Any], work: Callable[[dict[str, Any]], Awaitable[dict[str, Any]]], max_concurrent: int) -> None:
+    """
+    Run work(job) in the background. work returns the upload response shape and may update
+    job["bytes_read"] / job["stored"] as it goes; an exception marks the job failed.
+    At most max_concurrent jobs run per process; the rest wait as "queued".
+    """
+    global _slots
+    loop = asyncio.get_running_loop()
+    if _slots is None or _slots[0] is not loop:
+        _slots = (loop, asyncio.Semaphore(max(1, max_concurrent)))
+    slots = _slots[1]
+
+    async def run() -> None:
+        async with slots:
+            job["status"] = "running"
+            job["started_at"] = _now()
+            try:
+                result = await work(job)
+            except Exception as e:
+                detail = getattr(e, "detail", None)
+                if detail is None:
+                    logger.exception("ingestion job failed job_id=%s account_id=%s: %s", job["id"], job["account_id"], e)
+                    detail = "Ingestion failed. Please try again."
+                _finish(job, "failed", {"errors": [{"row": 0, "error": str(detail)}], "error_count": job["error_count"] + 1})
+                return
+            _finish(job, "done" if result.get("ok") else "failed", result)
+
+    task = asyncio.create_task(run())
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
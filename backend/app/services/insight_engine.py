@@ -1,90 +1,284 @@
 # You are helping build an AI Product Decision Platform. Never add generic charts or infra metrics. All outputs must directly support: what is broken, why, and what to fix first for an AI SaaS product.
 
+import asyncio
 import json
-from typing import Any
+import logging
+from datetime import datetime, timezone
+from typing import Any, Callable, Iterable, Iterator
 
 import numpy as np
 from sklearn.cluster import KMeans
 from sklearn.preprocessing import normalize
 
-MAX_NEGATIVE_LOGS = 2000
-OPENAI_TIMEOUT_SEC = 60
+from app.ingestion import is_negative_feedback
+from app.services.dedup import collapse_duplicates
+from app.services.embedding_store import EmbeddingStore, decode_vector, embedding_key, encode_vector
+from app.services.embedding_providers import OPENAI_EMBEDDING_MODEL, EmbeddingProvider, OpenAIEmbeddingProvider
+from app.services.llm_gateway import LLMSession, llm_gateway
+from app.services.offload import run_cpu, run_io
 
+logger = logging.getLogger(__name__)
 
-def _get_embeddings(texts: list[str], api_key: str) -> list[list[float]]:
-    """OpenAI embeddings. Swap provider by replacing this and env."""
-    if not api_key or not texts:
-        return []
+MAX_NEGATIVE_LOGS = 2000  # logs clustered per run; larger populations are sampled (see sample_evenly)
+ASSIGN_BLOCK_ROWS = 1000  # logs embedded and assigned to centroids at a time for the full population
+# ai_logs columns the engine reads; callers should select only these.
+ENGINE_LOG_COLUMNS = "id, timestamp, created_at, input, output, feedback_type, feedback_value"
+# insights columns returned by the API (everything except the stored cluster state).
+INSIGHT_COLUMNS = "id, account_id, title, description, example_snippets, frequency, avg_feedback, root_cause, created_at"
+# insights columns holding the persisted cluster state (see load_cluster_state).
+CLUSTER_STATE_COLUMNS = (
+    "id, frequency, avg_feedback, centroid, centroid_count, centroid_spread, embedding_model, clustered_through, clustered_through_id"
+)
+LLM_CONCURRENCY = 4  # cluster explanations in flight per run
+LLM_CALL_TIMEOUT_SEC = 30
+EXPLAIN_MODEL = "gpt-4o-mini"
+EXPLAIN_TEMPERATURE = 0.3
+EMBEDDING_MODEL = OPENAI_EMBEDDING_MODEL
+DRIFT_THRESHOLD = 1.5  # mean distance of new logs to their centroid, relative to the cluster's fit-time spread
+REFIT_GROWTH = 1.0  # full re-cluster once new logs outnumber the logs the clusters were built from
+MIN_SPREAD = 0.2  # floor for tiny or near-duplicate clusters so a single new log does not read as drift
+
+
+def _embed_cached(texts: list[str], provider: EmbeddingProvider, store: EmbeddingStore | None) -> list[list[float]] | np.ndarray:
+    """Embeddings for texts, calling the provider only for texts not already in store (and each distinct text once)."""
+    if store is None or not provider.stable:
+        return provider.embed(texts)
+    keys = [embedding_key(t, provider.name) for t in texts]
+    cached = store.get_many(keys)
+    todo = {k: t for k, t in zip(keys, texts) if k not in cached}
+    if todo:
+        fresh = provider.embed(list(todo.values()))
+        if len(fresh) != len(todo):
+            return []
+        new = {k: np.asarray(v, dtype=np.float32) for k, v in zip(todo, fresh)}
+        store.put_many(new)
+        cached.update(new)
+    return np.stack([cached[k] for k in keys]) if keys else []
+
+
+def _parse_explanation(text: str) -> dict[str, str] | None:
+    if text.startswith("```"):
+        text = text.split("```")[1].replace("json", "").strip()
     try:
-        from openai import OpenAI
-        client = OpenAI(api_key=api_key, timeout=OPENAI_TIMEOUT_SEC)
-        out = client.embeddings.create(
-            model="text-embedding-3-small",
-            input=texts,
-        )
-        by_idx = {d.index: d.embedding for d in out.data}
-        return [by_idx[i] for i in range(len(texts))]
-    except Exception as e:
-        raise RuntimeError(f"Embedding API failed: {e}") from e
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        return None
+    return data if isinstance(data, dict) else None
 
 
-def _explain_failure_cluster(summary: str, api_key: str) -> dict[str, str]:
+async def _explain_failure_cluster(summary: str, llm: LLMSession) -> dict[str, str]:
     """LLM: non-technical explanation for a failure cluster. Returns failure_cause, user_expectation, system_behavior."""
+    messages = [
+        {
+            "role": "system",
+            "content": "You are a senior product manager advising a startup founder. Explain why an AI feature is failing in plain language. No jargon (no 'cluster', 'embedding', 'latency'). Output valid JSON only with keys: failure_cause, user_expectation, system_behavior. One sentence each.",
+        },
+        {"role": "user", "content": f"Failure pattern summary:\n{summary}\n\nReturn JSON with failure_cause, user_expectation, system_behavior."},
+    ]
+    # Only well-formed answers are cached, so a malformed one is retried next run.
+    text = await llm.chat(
+        messages,
+        model=EXPLAIN_MODEL,
+        temperature=EXPLAIN_TEMPERATURE,
+        timeout_sec=LLM_CALL_TIMEOUT_SEC,
+        cacheable=lambda t: _parse_explanation(t) is not None,
+    )
+    explanation = _parse_explanation(text)
+    if explanation is None:
+        return {"failure_cause": text[:200], "user_expectation": "", "system_behavior": ""}
+    return explanation
+
+
+async def _explain_clusters(summaries: list[str], api_key: str, account_id: str = "") -> list[dict[str, str] | None]:
+    """
+    Explain all clusters concurrently (at most LLM_CONCURRENCY calls in flight per run, LLM_CALL_TIMEOUT_SEC each,
+    on top of the gateway's global and per-account limits). A failed or timed-out explanation is None so that
+    insight falls back to its summary; the run continues.
+    """
     if not api_key:
-        return {"failure_cause": "", "user_expectation": "", "system_behavior": ""}
-    try:
-        from openai import OpenAI
-        client = OpenAI(api_key=api_key, timeout=OPENAI_TIMEOUT_SEC)
-        resp = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a senior product manager advising a startup founder. Explain why an AI feature is failing in plain language. No jargon (no 'cluster', 'embedding', 'latency'). Output valid JSON only with keys: failure_cause, user_expectation, system_behavior. One sentence each.",
-                },
-                {"role": "user", "content": f"Failure pattern summary:\n{summary}\n\nReturn JSON with failure_cause, user_expectation, system_behavior."},
-            ],
-            temperature=0.3,
-        )
-        text = (resp.choices[0].message.content or "").strip()
-        if text.startswith("```"):
-            text = text.split("```")[1].replace("json", "").strip()
-        try:
-            return json.loads(text)
-        except json.JSONDecodeError:
-            return {"failure_cause": text[:200], "user_expectation": "", "system_behavior": ""}
-    except Exception as e:
-        raise RuntimeError(f"LLM API failed: {e}") from e
+        return [None for _ in summaries]
+    llm = llm_gateway.session(api_key, account_id)
+    sem = asyncio.Semaphore(LLM_CONCURRENCY)
+
+    async def explain(summary: str) -> dict[str, str] | None:
+        async with sem:
+            try:
+                return await _explain_failure_cluster(summary, llm)
+            except Exception as e:
+                logger.warning("cluster explanation failed, using summary: %s", e)
+                return None
+
+    return list(await asyncio.gather(*(explain(s) for s in summaries)))
 
 
 def _is_negative_feedback(log: dict[str, Any]) -> bool:
-    ft = (log.get("feedback_type") or "").lower()
-    fv = log.get("feedback_value")
-    if ft in ("thumb_down", "thumbs_down", "negative", "down"):
-        return True
-    if ft in ("thumb_up", "thumbs_up", "positive", "up"):
-        return False
+    if "is_negative" in log and log["is_negative"] is not None:
+        return bool(log["is_negative"])
+    return is_negative_feedback(log.get("feedback_type"), log.get("feedback_value"))
+
+
+def _log_text(log: dict[str, Any]) -> str:
+    inp = (log.get("input") or "")[:2000]
+    out = (log.get("output") or "")[:2000]
+    return f"input: {inp}\noutput: {out}"
+
+
+def _feedback_values(logs: list[dict[str, Any]]) -> list[float]:
+    fvs = []
+    for log in logs:
+        v = log.get("feedback_value")
+        try:
+            fvs.append(float(v))
+        except (TypeError, ValueError):
+            pass
+    return fvs
+
+
+def _keyset(log: dict[str, Any]) -> tuple[datetime, str] | None:
+    """(created_at, id) of an ai_logs row: its position in ingest order, or None without a created_at."""
+    created = _parse_created_at(log.get("created_at"))
+    return (created, str(log.get("id") or "")) if created is not None else None
+
+
+def _watermark(logs: Iterable[dict[str, Any]]) -> tuple[datetime, str] | None:
+    """
+    Last (created_at, id) among logs; the watermark for the next incremental run. Rows of one insert share a
+    created_at, so the id is needed to resume inside such a run when a read limit cut through it.
+    """
+    keys = [k for k in map(_keyset, logs) if k is not None]
+    return max(keys) if keys else None
+
+
+def _watermark_columns(watermark: tuple[datetime, str] | None) -> dict[str, Any]:
+    if watermark is None:
+        return {"clustered_through": None, "clustered_through_id": None}
+    return {"clustered_through": watermark[0].isoformat(), "clustered_through_id": watermark[1] or None}
+
+
+def _parse_created_at(v: Any) -> datetime | None:
+    if not v:
+        return None
     try:
-        v = float(fv) if fv is not None else None
-        if v is not None and v < 3.0:
-            return True
-        if v is not None and v >= 3.0:
-            return False
-    except (TypeError, ValueError):
-        pass
-    return False
+        dt = datetime.fromisoformat(str(v).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def _nearest(X: np.ndarray, C: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Nearest centroid per row and the euclidean distance to it, without an n x k x dim intermediate."""
+    d2 = (X * X).sum(axis=1)[:, None] - 2.0 * (X @ C.T) + (C * C).sum(axis=1)[None, :]
+    labels = d2.argmin(axis=1)
+    return labels, np.sqrt(np.maximum(d2[np.arange(len(X)), labels], 0.0))
+
+
+def _iter_blocks(rows: Iterable[dict[str, Any]], size: int) -> Iterator[list[dict[str, Any]]]:
+    block: list[dict[str, Any]] = []
+    for row in rows:
+        block.append(row)
+        if len(block) >= size:
+            yield block
+            block = []
+    if block:
+        yield block
+
+
+class _ClusterTotals:
+    """Per-cluster count, distance and feedback sums accumulated block by block (a group counts once per member)."""
+
+    __slots__ = ("count", "dist_sum", "fv_sum", "fv_n", "latest")
+
+    def __init__(self, k: int):
+        self.count = np.zeros(k, dtype=np.int64)
+        self.dist_sum = np.zeros(k)
+        self.fv_sum = np.zeros(k)
+        self.fv_n = np.zeros(k, dtype=np.int64)
+        self.latest: tuple[datetime, str] | None = None
+
+    def add(self, groups: list[list[dict[str, Any]]], labels: np.ndarray, dist: np.ndarray) -> None:
+        weights = np.array([len(g) for g in groups])
+        np.add.at(self.count, labels, weights)
+        np.add.at(self.dist_sum, labels, dist * weights)
+        for label, group in zip(labels, groups):
+            fvs = _feedback_values(group)
+            self.fv_sum[label] += sum(fvs)
+            self.fv_n[label] += len(fvs)
+            latest = _watermark(group)
+            if latest is not None and (self.latest is None or latest > self.latest):
+                self.latest = latest
+
+
+def sample_evenly(rows: Iterable[dict[str, Any]], total: int, size: int) -> list[dict[str, Any]]:
+    """
+    Every (total / size)-th row of a stream of total rows: a sample stratified over the stream order
+    (time, for ai_logs read by timestamp), holding only the sample in memory.
+    """
+    if total <= size:
+        return list(rows)
+    step = total / size
+    out: list[dict[str, Any]] = []
+    next_pick = 0.0
+    for i, row in enumerate(rows):
+        if i >= next_pick:
+            out.append(row)
+            next_pick += step
+            if len(out) >= size:
+                break
+    return out
+
+
+def _fit_kmeans(X: np.ndarray, n_clusters: int, weights: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Labels and centroids for X. Runs in the clustering process pool (app.services.offload)."""
+    kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=10)
+    labels = kmeans.fit_predict(X, sample_weight=weights)
+    return labels, kmeans.cluster_centers_
+
+
+def _assign_population(
+    rows: Iterable[dict[str, Any]],
+    centroids: np.ndarray,
+    provider: EmbeddingProvider,
+    store: EmbeddingStore | None,
+) -> _ClusterTotals:
+    """Embed and assign every negative log to its nearest centroid, ASSIGN_BLOCK_ROWS at a time (duplicates embedded once)."""
+    totals = _ClusterTotals(len(centroids))
+    for block in _iter_blocks((r for r in rows if _is_negative_feedback(r)), ASSIGN_BLOCK_ROWS):
+        groups = collapse_duplicates(block, _log_text)
+        embeddings = _embed_cached([_log_text(g[0]) for g in groups], provider, store)
+        if len(embeddings) != len(groups):
+            raise RuntimeError(f"Embedding returned {len(embeddings)} vectors for {len(groups)} logs.")
+        labels, dist = _nearest(normalize(np.asarray(embeddings, dtype=np.float64), axis=1), centroids)
+        totals.add(groups, labels, dist)
+    return totals
 
 
-def run_insight_engine(
+async def run_insight_engine(
     logs: list[dict[str, Any]],
     account_id: str,
     openai_api_key: str,
+    embedding_store: EmbeddingStore | None = None,
+    provider: EmbeddingProvider | None = None,
+    population: Callable[[], Iterable[dict[str, Any]]] | None = None,
 ) -> list[dict[str, Any]]:
     """
     Filter to negative feedback, embed input+output, cluster, explain with LLM.
-    Returns list of insight dicts ready for DB: title, description, example_snippets, frequency, avg_feedback, root_cause.
-    Caps at MAX_NEGATIVE_LOGS (newest first). Never sets n_clusters > n.
+    Returns list of insight dicts ready for DB: title, description, example_snippets, frequency, avg_feedback, root_cause,
+    plus the cluster state (centroid, centroid_count, centroid_spread, embedding_model, clustered_through, clustered_through_id) that
+    update_insight_clusters uses on later runs.
+    Callers with more than MAX_NEGATIVE_LOGS negative logs pass an even sample of the whole population as logs
+    (sample_evenly) plus population, a callable returning a fresh stream of all of them: the sample is clustered,
+    then every log in the stream is assigned to a centroid in blocks, so frequency and avg_feedback cover the
+    full population while memory stays bounded by the sample and one block. logs passed without a population are
+    only a guard case: past MAX_NEGATIVE_LOGS the newest are kept. Never sets n_clusters > n.
+    Identical and near-identical logs are embedded once and weighted by their count (app.services.dedup).
+    Clusters are explained concurrently; a cluster whose explanation fails is described by its summary.
+    Embedding and population reads run on the I/O thread pool and KMeans in the clustering process pool
+    (app.services.offload), so the event loop stays free while a run is in progress.
+    With embedding_store, only texts missing from the cache are sent to the embedding API.
+    provider defaults to OpenAI embeddings; without an OpenAI key, clusters are described by their summaries.
+    Cluster state is only returned for stable providers (see app.services.embedding_providers).
     """
+    provider = provider or OpenAIEmbeddingProvider(openai_api_key)
     negative = [l for l in logs if _is_negative_feedback(l)]
     if not negative:
         return []
@@ -92,59 +286,188 @@ def run_insight_engine(
     if len(negative) > MAX_NEGATIVE_LOGS:
         negative = sorted(negative, key=lambda x: x.get("timestamp") or "", reverse=True)[:MAX_NEGATIVE_LOGS]
 
-    texts = []
-    for log in negative:
-        inp = (log.get("input") or "")[:2000]
-        out = (log.get("output") or "")[:2000]
-        texts.append(f"input: {inp}\noutput: {out}")
-
-    embeddings = _get_embeddings(texts, openai_api_key)
-    if len(embeddings) != len(negative):
+    # Embed one representative per group of (near-)identical logs; group sizes weight the clustering.
+    groups = collapse_duplicates(negative, _log_text)
+    reps = [g[0] for g in groups]
+    weights = np.array([len(g) for g in groups], dtype=np.float64)
+    texts = [_log_text(log) for log in reps]
+    embeddings = await run_io(_embed_cached, texts, provider, embedding_store)
+    if len(embeddings) != len(reps):
         return []
 
     X = np.array(embeddings, dtype=np.float64)
     X = normalize(X, axis=1)
     n = len(X)
-    n_clusters = min(10, max(1, n // 3))
+    n_clusters = min(10, max(1, len(negative) // 3))
     n_clusters = min(n_clusters, n)
-    kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=10)
-    labels = kmeans.fit_predict(X)
+    labels, centroids = await run_cpu(_fit_kmeans, X, n_clusters, weights)
 
-    insights = []
+    if population is None:
+        totals = _ClusterTotals(n_clusters)
+        totals.add(groups, labels, np.linalg.norm(X - centroids[labels], axis=1))
+    else:
+        totals = await run_io(_assign_population, population(), centroids, provider, embedding_store)
+    watermark = _watermark_columns(totals.latest)
+
+    clusters = []
     for c in range(n_clusters):
         idx = [i for i in range(n) if labels[i] == c]
-        if not idx:
+        frequency = int(totals.count[c])
+        if not idx or not frequency:
             continue
-        cluster_logs = [negative[i] for i in idx]
+        # Most repeated failure first; snippets show distinct examples.
+        cluster_logs = [reps[i] for i in sorted(idx, key=lambda i: -weights[i])]
+        summary = (
+            f"Pattern: {frequency} similar conversations with negative feedback. "
+            f"Example: user said \"{cluster_logs[0].get('input', '')[:150]}...\" "
+            f"and got \"{cluster_logs[0].get('output', '')[:150]}...\""
+        )
+        clusters.append((c, frequency, cluster_logs, summary))
+    roots = await _explain_clusters([summary for *_, summary in clusters], openai_api_key, account_id)
+
+    insights = []
+    for (c, frequency, cluster_logs, summary), root in zip(clusters, roots):
         snippets = []
         for log in cluster_logs[:5]:
             snippets.append({
                 "input": (log.get("input") or "")[:300],
                 "output": (log.get("output") or "")[:300],
             })
-        fvs = []
-        for log in cluster_logs:
-            v = log.get("feedback_value")
-            try:
-                fvs.append(float(v))
-            except (TypeError, ValueError):
-                pass
-        avg_fb = str(round(sum(fvs) / len(fvs), 2)) if fvs else None
-        summary = (
-            f"Pattern: {len(cluster_logs)} similar conversations with negative feedback. "
-            f"Example: user said \"{cluster_logs[0].get('input', '')[:150]}...\" "
-            f"and got \"{cluster_logs[0].get('output', '')[:150]}...\""
-        )
-        root = _explain_failure_cluster(summary, openai_api_key)
-        title = (root.get("failure_cause") or "Failure pattern")[:200]
-        desc = f"Users expected: {root.get('user_expectation', '')}. System behaved: {root.get('system_behavior', '')}"[:500]
+        avg_fb = str(round(totals.fv_sum[c] / totals.fv_n[c], 2)) if totals.fv_n[c] else None
+        if root is None:
+            # Explanation failed: keep the insight, described by its summary.
+            root = {"failure_cause": "", "user_expectation": "", "system_behavior": ""}
+            title, desc = "", ""
+        else:
+            title = (root.get("failure_cause") or "Failure pattern")[:200]
+            desc = f"Users expected: {root.get('user_expectation', '')}. System behaved: {root.get('system_behavior', '')}"[:500]
         insights.append({
             "account_id": account_id,
-            "title": title or f"Negative feedback pattern ({len(cluster_logs)} conversations)",
+            "title": title or f"Negative feedback pattern ({frequency} conversations)",
             "description": desc or summary[:500],
             "example_snippets": snippets,
-            "frequency": len(cluster_logs),
+            "frequency": frequency,
             "avg_feedback": avg_fb,
             "root_cause": root,
+            "centroid": encode_vector(centroids[c]) if provider.stable else None,
+            "centroid_count": frequency,
+            "centroid_spread": float(totals.dist_sum[c] / frequency),
+            "embedding_model": provider.name,
+            **watermark,
         })
     return insights
+
+
+def load_cluster_state(insights: list[dict[str, Any]], model: str = EMBEDDING_MODEL) -> dict[str, Any] | None:
+    """
+    Cluster state from the account's active insight rows (CLUSTER_STATE_COLUMNS), or None when there is
+    nothing usable to update incrementally (no centroids yet, or they come from another embedding model).
+    """
+    clusters = []
+    for row in insights:
+        if not row.get("centroid") or row.get("embedding_model") != model:
+            return None
+        clusters.append({
+            "id": row["id"],
+            "centroid": decode_vector(row["centroid"]).astype(np.float64),
+            "count": int(row.get("centroid_count") or 0),
+            "spread": float(row.get("centroid_spread") or 0.0),
+            "frequency": int(row.get("frequency") or 0),
+            "avg_feedback": row.get("avg_feedback"),
+        })
+    watermarks = [
+        (ts, row.get("clustered_through_id") or "")
+        for row in insights
+        if (ts := _parse_created_at(row.get("clustered_through"))) is not None
+    ]
+    if not clusters or not watermarks or len({len(c["centroid"]) for c in clusters}) != 1:
+        return None
+    through, through_id = max(watermarks)
+    return {"clusters": clusters, "clustered_through": through, "clustered_through_id": through_id or None}
+
+
+def new_logs_since(logs: list[dict[str, Any]], state: dict[str, Any]) -> list[dict[str, Any]]:
+    """
+    Negative logs ingested after the state's watermark: a later (created_at, id), or a strictly later created_at
+    for state written before the watermark carried an id.
+    """
+    since, since_id = state["clustered_through"], state.get("clustered_through_id")
+    out = []
+    for log in logs:
+        key = _keyset(log)
+        if key is None or not _is_negative_feedback(log):
+            continue
+        if (key > (since, since_id)) if since_id else (key[0] > since):
+            out.append(log)
+    return out
+
+
+def update_insight_clusters(
+    logs: list[dict[str, Any]],
+    state: dict[str, Any],
+    openai_api_key: str,
+    embedding_store: EmbeddingStore | None = None,
+    provider: EmbeddingProvider | None = None,
+) -> list[dict[str, Any]] | None:
+    """
+    Assign new negative logs to the nearest persisted centroid and move centroids with a MiniBatch-KMeans
+    update (c += (x - c) / count, applied per cluster in closed form). No LLM calls: titles and explanations stay.
+    Returns {"id", ...changed columns} per touched insight, or None when a full re-cluster is needed: the new
+    logs sit on average more than DRIFT_THRESHOLD x the fit-time spread from their centroid, or they outnumber
+    the logs the clusters were built from (REFIT_GROWTH).
+    """
+    if not logs:
+        return []
+    provider = provider or OpenAIEmbeddingProvider(openai_api_key)
+    if not provider.stable:
+        return None
+    clusters = state["clusters"]
+    total = sum(c["count"] for c in clusters)
+    if len(logs) > REFIT_GROWTH * total:
+        return None
+    groups = collapse_duplicates(logs, _log_text)
+    weights = np.array([len(g) for g in groups], dtype=np.float64)
+    embeddings = _embed_cached([_log_text(g[0]) for g in groups], provider, embedding_store)
+    if len(embeddings) != len(groups):
+        return None
+    X = normalize(np.array(embeddings, dtype=np.float64), axis=1)
+    C = np.stack([c["centroid"] for c in clusters])
+    if X.shape[1] != C.shape[1]:
+        return None
+    labels, nearest = _nearest(X, C)
+    spreads = np.array([max(c["spread"], MIN_SPREAD) for c in clusters])
+    drift = float(np.average(nearest / spreads[labels], weights=weights))
+    if drift > DRIFT_THRESHOLD:
+        return None
+
+    watermark = _watermark_columns(_watermark(logs))
+    updates = []
+    for k, cluster in enumerate(clusters):
+        idx = np.flatnonzero(labels == k)
+        if not len(idx):
+            continue
+        w = weights[idx]
+        m = int(w.sum())
+        count = cluster["count"] + m
+        centroid = cluster["centroid"] + ((w[:, None] * X[idx]).sum(axis=0) - m * cluster["centroid"]) / count
+        spread = (cluster["spread"] * cluster["count"] + float((w * nearest[idx]).sum())) / count
+        frequency = cluster["frequency"] + m
+        update: dict[str, Any] = {
+            "id": cluster["id"],
+            "frequency": frequency,
+            "centroid": encode_vector(centroid),
+            "centroid_count": count,
+            "centroid_spread": spread,
+            **watermark,
+        }
+        fvs = _feedback_values([log for i in idx for log in groups[i]])
+        if fvs:
+            # Previous average weighted by previous frequency (logs without a numeric value count as that average).
+            try:
+                prev = float(cluster["avg_feedback"])
+                avg = (prev * cluster["frequency"] + sum(fvs)) / (cluster["frequency"] + len(fvs))
+            except (TypeError, ValueError):
+                avg = sum(fvs) / len(fvs)
+            update["avg_feedback"] = str(round(avg, 2))
+        updates.append(update)
+    return updates
@@ -0,0 +1,157 @@
+# You are helping build an AI Product Decision Platform. Never add generic charts or infra metrics. All outputs must directly support: what is broken, why, and what to fix first for an AI SaaS product.
+
+"""Response cache for deterministic-enough LLM calls (cluster explanations, Decision Cards, weekly report line).
+
+Keyed by (model, temperature, canonical JSON of the messages and other request params), so only a
+byte-for-byte identical request is served from cache. Entries live in a size-bounded LRU with a TTL;
+an optional shared table (llm_response_cache) lets instances and restarts reuse each other's answers.
+Only non-empty responses are cached. hits/misses are counted for the generate endpoints' logs."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Protocol
+
+from supabase import Client
+
+from app.services.offload import run_io
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_SEC = 7 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 2048
+CACHE_TABLE = "llm_response_cache"
+
+
+def cache_key(model: str, temperature: float, messages: list[dict[str, Any]], **params: Any) -> str:
+    """sha256 of the canonical request (sorted keys, no whitespace); None-valued params are ignored."""
+    payload = {"model": model, "temperature": temperature, "messages": messages}
+    payload.update({k: v for k, v in params.items() if v is not None})
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class SharedResponseStore(Protocol):
+    def get(self, key: str) -> str | None: ...
+
+    def put(self, key: str, model: str, text: str, ttl_sec: float) -> None: ...
+
+
+class SupabaseResponseStore:
+    """llm_response_cache rows (key, model, response, expires_at)."""
+
+    def __init__(self, supabase: Client):
+        self._supabase = supabase
+
+    def get(self, key: str) -> str | None:
+        now = datetime.now(timezone.utc).isoformat()
+        r = self._supabase.table(CACHE_TABLE).select("response").eq("key", key).gt("expires_at", now).limit(1).execute()
+        return r.data[0]["response"] if r.data else None
+
+    def put(self, key: str, model: str, text: str, ttl_sec: float) -> None:
+        expires = (datetime.now(timezone.utc) + timedelta(seconds=ttl_sec)).isoformat()
+        self._supabase.table(CACHE_TABLE).upsert(
+            {"key": key, "model": model, "response": text, "expires_at": expires}, on_conflict="key"
+        ).execute()
+
+
+class LLMResponseCache:
+    """Thread-safe TTL + LRU cache of response texts, with an optional shared second level."""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl_sec: float = DEFAULT_TTL_SEC, shared: SharedResponseStore | None = None):
+        self.max_entries = max_entries
+        self.ttl_sec = ttl_sec
+        self.shared = shared
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> str | None:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+        text = self._shared_get(key)
+        with self._lock:
+            if text is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        self._remember(key, text)
+        return text
+
+    def put(self, key: str, model: str, text: str) -> None:
+        if not text:
+            return
+        self._remember(key, text)
+        if self.shared is not None:
+            try:
+                self.shared.put(key, model, text, self.ttl_sec)
+            except Exception as e:
+                logger.warning("shared llm cache write failed: %s", e)
+
+    async def aget(self, key: str) -> str | None:
+        """get() for async callers; the shared store is queried off the event loop."""
+        if self.shared is None:
+            return self.get(key)
+        return await run_io(self.get, key)
+
+    async def aput(self, key: str, model: str, text: str) -> None:
+        if self.shared is None:
+            self.put(key, model, text)
+        else:
+            await run_io(self.put, key, model, text)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "entries": len(self._entries)}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def _remember(self, key: str, text: str) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_sec, text)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _shared_get(self, key: str) -> str | None:
+        if self.shared is None:
+            return None
+        try:
+            return self.shared.get(key)
+        except Exception as e:
+            logger.warning("shared llm cache read failed: %s", e)
+            return None
+
+
+# Process-wide cache; app.main configures size, TTL and the shared table from settings at startup.
+response_cache = LLMResponseCache()
+
+
+def configure_response_cache(max_entries: int, ttl_sec: float, shared: SharedResponseStore | None = None) -> None:
+    """Resize the process-wide cache (dropping entries over the new bound) and attach or detach the shared store."""
+    response_cache.ttl_sec = ttl_sec
+    response_cache.shared = shared
+    response_cache.max_entries = max_entries
+    with response_cache._lock:
+        while len(response_cache._entries) > max_entries:
+            response_cache._entries.popitem(last=False)
+            response_cache.evictions += 1
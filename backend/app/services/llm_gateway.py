@@ -0,0 +1,221 @@
+# You are helping build an AI Product Decision Platform. Never add generic charts or infra metrics. All outputs must directly support: what is broken, why, and what to fix first for an AI SaaS product.
+
+"""Single entry point for chat completions (cluster explanations, Decision Cards, weekly report line).
+
+One pooled AsyncOpenAI client per API key is reused across requests, so calls skip connection setup.
+Every call goes through the response cache, then a global and a per-account concurrency limit, and
+runs against a deadline that covers all of its attempts. 429 and 5xx responses and connection errors
+are retried with full-jitter exponential backoff while the deadline allows. Prompt and completion
+tokens are accounted per account (most recently active MAX_USAGE_ACCOUNTS); an account's semaphore
+exists only while it has calls in flight or waiting."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable
+
+from app.services.llm_cache import cache_key, response_cache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_CONCURRENCY = 16  # chat calls in flight per process
+DEFAULT_ACCOUNT_CONCURRENCY = 4  # chat calls in flight per account
+DEFAULT_TIMEOUT_SEC = 30  # deadline per call, across all attempts
+DEFAULT_MAX_RETRIES = 3
+BACKOFF_BASE_SEC = 0.5
+BACKOFF_MAX_SEC = 8.0
+MAX_USAGE_ACCOUNTS = 10_000  # token usage kept for this many recently active accounts (LRU)
+
+
+@dataclass
+class TokenUsage:
+    calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_calls: int = 0
+
+
+@dataclass
+class _AccountSlots:
+    semaphore: asyncio.Semaphore
+    users: int = 0  # calls holding or waiting for a slot
+
+
+def _is_retryable(e: Exception) -> bool:
+    status = getattr(e, "status_code", None)
+    if status is not None:
+        return status == 429 or status >= 500
+    try:
+        from openai import APIConnectionError
+    except ImportError:  # pragma: no cover
+        return False
+    return isinstance(e, APIConnectionError)
+
+
+class LLMGateway:
+    def __init__(
+        self,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        account_concurrency: int = DEFAULT_ACCOUNT_CONCURRENCY,
+        timeout_sec: float = DEFAULT_TIMEOUT_SEC,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        client_factory: Callable[[str], Any] | None = None,
+    ):
+        self.max_concurrency = max_concurrency
+        self.account_concurrency = account_concurrency
+        self.timeout_sec = timeout_sec
+        self.max_retries = max_retries
+        self._client_factory = client_factory or self._openai_client
+        # Clients and semaphores belong to the event loop they were created on; rebuilt if the loop changes.
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._clients: dict[str, Any] = {}
+        self._global: asyncio.Semaphore | None = None
+        self._accounts: dict[str, _AccountSlots] = {}
+        self._usage: OrderedDict[str, TokenUsage] = OrderedDict()
+
+    @staticmethod
+    def _openai_client(api_key: str) -> Any:
+        from openai import AsyncOpenAI
+        # Retries and deadlines are handled here, not by the SDK.
+        return AsyncOpenAI(api_key=api_key, max_retries=0)
+
+    def _bind(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._clients = {}
+            self._global = asyncio.Semaphore(self.max_concurrency)
+            self._accounts = {}
+
+    def _client(self, api_key: str) -> Any:
+        client = self._clients.get(api_key)
+        if client is None:
+            client = self._clients[api_key] = self._client_factory(api_key)
+        return client
+
+    @asynccontextmanager
+    async def _account_slot(self, account_id: str) -> AsyncIterator[None]:
+        """One of the account's account_concurrency slots; the semaphore is dropped once nobody uses it."""
+        slots = self._accounts.get(account_id)
+        if slots is None:
+            slots = self._accounts[account_id] = _AccountSlots(asyncio.Semaphore(self.account_concurrency))
+        slots.users += 1
+        try:
+            async with slots.semaphore:
+                yield
+        finally:
+            slots.users -= 1
+            if not slots.users and self._accounts.get(account_id) is slots:
+                del self._accounts[account_id]
+
+    def _account_usage(self, account_id: str) -> TokenUsage:
+        usage = self._usage.get(account_id)
+        if usage is None:
+            usage = self._usage[account_id] = TokenUsage()
+            while len(self._usage) > MAX_USAGE_ACCOUNTS:
+                self._usage.popitem(last=False)
+        self._usage.move_to_end(account_id)
+        return usage
+
+    async def chat(
+        self,
+        api_key: str,
+        messages: list[dict[str, Any]],
+        *,
+        model: str,
+        temperature: float,
+        account_id: str = "",
+        max_tokens: int | None = None,
+        timeout_sec: float | None = None,
+        cacheable: Callable[[str], bool] | None = None,
+    ) -> str:
+        """
+        Completion text for messages. Cached answers are returned without an API call; a fresh answer is
+        cached if it is non-empty and cacheable(text) is true (default: always). Raises the last error once
+        retries or the deadline (timeout_sec, default self.timeout_sec) run out.
+        """
+        usage = self._account_usage(account_id)
+        key = cache_key(model, temperature, messages, max_tokens=max_tokens)
+        cached = await response_cache.aget(key)
+        if cached is not None:
+            usage.cached_calls += 1
+            return cached
+
+        self._bind()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (timeout_sec or self.timeout_sec)
+        params: dict[str, Any] = {"model": model, "messages": messages, "temperature": temperature}
+        if max_tokens is not None:
+            params["max_tokens"] = max_tokens
+        # Account slot first, so an account at its limit does not hold global slots while it waits.
+        async with self._account_slot(account_id), self._global:
+            attempt = 0
+            while True:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError("LLM call deadline exceeded")
+                try:
+                    resp = await asyncio.wait_for(self._client(api_key).chat.completions.create(**params), remaining)
+                    break
+                except Exception as e:
+                    if attempt >= self.max_retries or not _is_retryable(e):
+                        raise
+                    delay = random.uniform(0, min(BACKOFF_MAX_SEC, BACKOFF_BASE_SEC * 2**attempt))
+                    if loop.time() + delay >= deadline:
+                        raise
+                    attempt += 1
+                    logger.info("LLM call retry %s in %.2fs account_id=%s: %s", attempt, delay, account_id, e)
+                    await asyncio.sleep(delay)
+
+        usage.calls += 1
+        tokens = getattr(resp, "usage", None)
+        if tokens is not None:
+            usage.prompt_tokens += tokens.prompt_tokens or 0
+            usage.completion_tokens += tokens.completion_tokens or 0
+        text = (resp.choices[0].message.content or "").strip()
+        if text and (cacheable is None or cacheable(text)):
+            await response_cache.aput(key, model, text)
+        return text
+
+    def session(self, api_key: str, account_id: str = "") -> "LLMSession":
+        return LLMSession(self, api_key, account_id)
+
+    def usage(self, account_id: str) -> TokenUsage:
+        return self._usage.get(account_id) or TokenUsage()
+
+    def configure(self, max_concurrency: int, account_concurrency: int, timeout_sec: float, max_retries: int) -> None:
+        """Apply limits from settings; semaphores are rebuilt on the next call."""
+        self.max_concurrency = max_concurrency
+        self.account_concurrency = account_concurrency
+        self.timeout_sec = timeout_sec
+        self.max_retries = max_retries
+        self._loop = None
+
+    async def aclose(self) -> None:
+        clients, self._clients, self._loop = list(self._clients.values()), {}, None
+        for client in clients:
+            try:
+                await client.close()
+            except Exception as e:
+                logger.warning("closing LLM client failed: %s", e)
+
+
+class LLMSession:
+    """An API key and account bound to the gateway, so call sites only pass the prompt."""
+
+    def __init__(self, gateway: LLMGateway, api_key: str, account_id: str):
+        self.gateway = gateway
+        self.api_key = api_key
+        self.account_id = account_id
+
+    async def chat(self, messages: list[dict[str, Any]], **kwargs: Any) -> str:
+        return await self.gateway.chat(self.api_key, messages, account_id=self.account_id, **kwargs)
+
+
+# Process-wide gateway; app.main applies limits from settings at startup and closes clients at shutdown.
+llm_gateway = LLMGateway()
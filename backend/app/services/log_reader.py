@@ -0,0 +1,77 @@
+# You are helping build an AI Product Decision Platform. Never add generic charts or infra metrics. All outputs must directly support: what is broken, why, and what to fix first for an AI SaaS product.
+
+"""Keyset-paginated reads of account-scoped tables (ai_logs, insights, decision_cards).
+
+A plain select is silently truncated by PostgREST's max-rows cap (1000 on Supabase), so large accounts
+were analyzed over an arbitrary subset. iter_account_rows pages on (time column, id) instead of OFFSET,
+so every page is an index range scan and rows are neither skipped nor repeated."""
+
+from __future__ import annotations
+
+from typing import Any, Iterator
+
+from supabase import Client
+
+PAGE_SIZE = 1000  # at or below PostgREST max-rows so a full page means "maybe more"
+
+
+def _columns_with_keys(columns: str, time_column: str) -> str:
+    if columns.strip() == "*":
+        return columns
+    cols = [c.strip() for c in columns.split(",") if c.strip()]
+    for key in (time_column, "id"):
+        if key not in cols:
+            cols.append(key)
+    return ", ".join(cols)
+
+
+def _quote(value: Any) -> str:
+    # Double quotes let PostgREST logic trees carry values with ':', '+', ',' or parentheses.
+    return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def iter_account_rows(
+    supabase: Client,
+    table: str,
+    account_id: str,
+    columns: str = "*",
+    time_column: str = "created_at",
+    since: str | None = None,
+    until: str | None = None,
+    filters: dict[str, Any] | None = None,
+    after: tuple[Any, Any] | None = None,
+    descending: bool = True,
+    limit: int | None = None,
+    page_size: int = PAGE_SIZE,
+) -> Iterator[dict[str, Any]]:
+    """
+    Yield the account's rows ordered by (time_column, id), newest first unless descending=False.
+    since/until bound time_column (inclusive, ISO strings); filters are equality filters; limit caps the total.
+    after=(time value, id) starts strictly past that keyset position, so a reader can resume where it stopped
+    even inside a run of rows sharing one timestamp.
+    time_column and id are added to the projection when missing (needed for the keyset).
+    """
+    select = _columns_with_keys(columns, time_column)
+    op = "lt" if descending else "gt"
+    last: dict[str, Any] | None = {time_column: after[0], "id": after[1]} if after else None
+    remaining = limit
+    while remaining is None or remaining > 0:
+        size = page_size if remaining is None else min(page_size, remaining)
+        q = supabase.table(table).select(select).eq("account_id", account_id)
+        for column, value in (filters or {}).items():
+            q = q.eq(column, value)
+        if since:
+            q = q.gte(time_column, since)
+        if until:
+            q = q.lte(time_column, until)
+        if last is not None:
+            t, i = _quote(last[time_column]), _quote(last["id"])
+            q = q.or_(f"{time_column}.{op}.{t},and({time_column}.eq.{t},id.{op}.{i})")
+        q = q.order(time_column, desc=descending).order("id", desc=descending).limit(size)
+        page = list(q.execute().data or [])
+        yield from page
+        if len(page) < size:
+            return
+        last = page[-1]
+        if remaining is not None:
+            remaining -= len(page)
@@ -0,0 +1,240 @@
+# You are helping build an AI Product Decision Platform. Never add generic charts or infra metrics. All outputs must directly support: what is broken, why, and what to fix first for an AI SaaS product.
+
+"""Concurrent, adaptive batched inserts into ai_logs.
+
+Rows are pulled from a (sync) row iterator in a worker thread, packed into batches sized by row bytes and
+recent insert latency, and inserted with a bounded number of batches in flight. Supabase calls run on the
+I/O thread pool (app.services.offload), so the event loop stays free for other requests while a large upload is stored."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import time
+from typing import Any, Callable, Iterator
+
+import httpx
+from supabase import Client
+
+from app.services.offload import run_io
+
+logger = logging.getLogger(__name__)
+
+MIN_BATCH_ROWS = 50
+START_BATCH_ROWS = 500
+MAX_BATCH_ROWS = 2000
+MAX_BATCH_BYTES = 2 * 1024 * 1024  # stay well under PostgREST/proxy request body limits
+TARGET_BATCH_SEC = 1.0
+MAX_ATTEMPTS = 4
+BACKOFF_BASE_SEC = 0.5
+_ROW_OVERHEAD_BYTES = 300  # JSON keys, ids, timestamp, feedback, tags
+PRECHECK_HASHES_PER_QUERY = 200  # keeps the `in.(...)` filter URL around 7KB
+
+# PostgREST returns the HTTP status as `code` when the body is not JSON; Postgres codes otherwise.
+_TRANSIENT_CODES = {
+    "429", "500", "502", "503", "504",
+    "40001",  # serialization_failure
+    "40P01",  # deadlock_detected
+    "53300",  # too_many_connections
+    "57014",  # statement timeout
+    "57P01",  # admin_shutdown
+}
+
+
+class RowsInterrupted(Exception):
+    """The row iterator raised (e.g. size limit, broken file) after some batches may have been stored.
+
+    result is what insert_log_rows would have returned for the rows read so far; the iterator's exception
+    is the __cause__."""
+
+    def __init__(self, result: dict[str, Any]):
+        super().__init__(f"row source failed after {result['stored']} stored row(s)")
+        self.result = result
+
+
+# The request never reached the server, so even a non-idempotent insert can be sent again.
+_NOT_SENT = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+def _is_transient(exc: Exception) -> bool:
+    if isinstance(exc, httpx.TransportError):
+        return True
+    code = str(getattr(exc, "code", "") or "")
+    return code in _TRANSIENT_CODES or code.startswith("08")  # 08xxx: connection exceptions
+
+
+def _row_bytes(row: dict[str, Any]) -> int:
+    """Cheap size estimate; input/output dominate an ai_logs row."""
+    return len(row.get("input") or "") + len(row.get("output") or "") + _ROW_OVERHEAD_BYTES
+
+
+def _take_batch(rows: Iterator[tuple[int, dict]], max_rows: int, max_bytes: int) -> list[tuple[int, dict]]:
+    batch: list[tuple[int, dict]] = []
+    size = 0
+    for item in rows:
+        batch.append(item)
+        size += _row_bytes(item[1])
+        if len(batch) >= max_rows or size >= max_bytes:
+            break
+    return batch
+
+
+def _next_batch_rows(current: int, elapsed: float, ok: bool) -> int:
+    """AIMD-style sizing: grow while inserts are fast, halve when slow or failing."""
+    if not ok or elapsed > TARGET_BATCH_SEC * 2:
+        return max(MIN_BATCH_ROWS, current // 2)
+    if elapsed < TARGET_BATCH_SEC / 2:
+        return min(MAX_BATCH_ROWS, int(current * 1.5))
+    return current
+
+
+def _insert_new(supabase: Client, chunk: list[dict]) -> tuple[int, int]:
+    """
+    Insert rows whose content_hash is not stored yet. Returns (stored, duplicates).
+    Known hashes are looked up once per batch so duplicate payloads are never sent; the
+    (account_id, content_hash) unique index with ignore-duplicates covers races between batches/uploads,
+    and makes a retried batch safe: rows the failed attempt did write are skipped as duplicates.
+    """
+    fresh: dict[str, dict] = {}
+    for row in chunk:
+        fresh.setdefault(row["content_hash"], row)
+    account_id = chunk[0]["account_id"]
+    hashes = list(fresh)
+    for i in range(0, len(hashes), PRECHECK_HASHES_PER_QUERY):
+        r = (
+            supabase.table("ai_logs")
+            .select("content_hash")
+            .eq("account_id", account_id)
+            .in_("content_hash", hashes[i : i + PRECHECK_HASHES_PER_QUERY])
+            .execute()
+        )
+        for existing in r.data or []:
+            fresh.pop(existing["content_hash"], None)
+    if not fresh:
+        return 0, len(chunk)
+    resp = (
+        supabase.table("ai_logs")
+        .upsert(list(fresh.values()), on_conflict="account_id,content_hash", ignore_duplicates=True)
+        .execute()
+    )
+    stored = len(resp.data or [])
+    return stored, len(chunk) - stored
+
+
+async def _insert_with_retry(
+    supabase: Client, chunk: list[dict], insert: Callable[[Client, list[dict]], tuple[int, int]], idempotent: bool
+) -> tuple[int, int]:
+    attempt = 1
+    while True:
+        try:
+            return await run_io(insert, supabase, chunk)
+        except Exception as e:
+            # A timeout or 5xx may come after the rows were written: only a repeatable insert is sent again.
+            retry = _is_transient(e) if idempotent else isinstance(e, _NOT_SENT)
+            if attempt >= MAX_ATTEMPTS or not retry:
+                raise
+            delay = BACKOFF_BASE_SEC * (2 ** (attempt - 1)) * (0.5 + random.random())
+            logger.warning("ai_logs insert retry attempt=%s rows=%s in %.2fs: %s", attempt, len(chunk), delay, e)
+            await asyncio.sleep(delay)
+        attempt += 1
+
+
+def _merge_ranges(batches: list[tuple[int, int, int]]) -> list[dict[str, int]]:
+    """(seq, first_row, last_row) per batch -> merged {from, to} ranges; consecutive batches join up."""
+    ranges: list[dict[str, int]] = []
+    prev_seq = None
+    for seq, first, last in sorted(batches):
+        if ranges and prev_seq == seq - 1:
+            ranges[-1]["to"] = last
+        else:
+            ranges.append({"from": first, "to": last})
+        prev_seq = seq
+    return ranges
+
+
+async def insert_log_rows(
+    supabase: Client,
+    rows: Iterator[tuple[int, dict]],
+    max_concurrency: int = 4,
+    insert: Callable[[Client, list[dict]], tuple[int, int]] = _insert_new,
+    on_batch: Callable[[int, int, int], None] | None = None,
+    idempotent: bool = True,
+) -> dict[str, Any]:
+    """
+    Insert (source_row_number, ai_logs row) pairs with up to max_concurrency batches in flight.
+    A failed batch is retried on transient errors and otherwise recorded, not raised. idempotent says insert may be
+    repeated after a timeout or 5xx (the default upsert skips rows already stored); with idempotent=False only
+    errors raised before the request was sent are retried, so a plain insert never stores a batch twice.
+    Returns {stored, duplicates, failed, stored_ranges, failed_ranges}; ranges are source row numbers ({from, to}),
+    and rows inside a stored range that failed validation or were duplicates were not inserted.
+    on_batch(stored, failed, duplicates) is called after each batch completes (progress reporting).
+    If the row iterator raises, in-flight batches finish and RowsInterrupted(result so far) is raised from
+    the iterator's exception, so callers can report the rows that were already stored.
+    """
+    sem = asyncio.Semaphore(max(1, max_concurrency))
+    tasks: set[asyncio.Task] = set()
+    stored = 0
+    duplicates = 0
+    failed = 0
+    stored_batches: list[tuple[int, int, int]] = []
+    failed_batches: list[tuple[int, int, int]] = []
+    batch_rows = START_BATCH_ROWS
+
+    async def run(seq: int, batch: list[tuple[int, dict]]) -> None:
+        nonlocal stored, duplicates, failed, batch_rows
+        chunk = [row for _, row in batch]
+        span = (seq, batch[0][0], batch[-1][0])
+        start = time.perf_counter()
+        try:
+            n, dup = await _insert_with_retry(supabase, chunk, insert, idempotent)
+            stored += n  # not `stored += await ...`: that reads `stored` before suspending
+            duplicates += dup
+            stored_batches.append(span)
+            ok = True
+        except Exception as e:
+            logger.warning("ai_logs insert failed rows=%s-%s: %s", span[1], span[2], e)
+            failed += len(chunk)
+            failed_batches.append(span)
+            ok = False
+        finally:
+            sem.release()
+        batch_rows = _next_batch_rows(batch_rows, time.perf_counter() - start, ok)
+        if on_batch is not None:
+            on_batch(stored, failed, duplicates)
+
+    seq = 0
+    source_error: Exception | None = None
+    try:
+        while True:
+            await sem.acquire()
+            try:
+                batch = await run_io(_take_batch, rows, batch_rows, MAX_BATCH_BYTES)
+            except Exception as e:
+                sem.release()
+                source_error = e
+                break
+            except BaseException:
+                sem.release()
+                raise
+            if not batch:
+                sem.release()
+                break
+            task = asyncio.create_task(run(seq, batch))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            seq += 1
+    finally:
+        if tasks:
+            await asyncio.gather(*tasks)
+
+    result = {
+        "stored": stored,
+        "duplicates": duplicates,
+        "failed": failed,
+        "stored_ranges": _merge_ranges(stored_batches),
+        "failed_ranges": _merge_ranges(failed_batches),
+    }
+    if source_error is not None:
+        raise RowsInterrupted(result) from source_error
+    return result
@@ -0,0 +1,79 @@
+# You are helping build an AI Product Decision Platform. Never add generic charts or infra metrics. All outputs must directly support: what is broken, why, and what to fix first for an AI SaaS product.
+
+"""Blocking work off the event loop, so one slow /insights/generate does not stall other requests.
+
+Route handlers are async, but supabase-py (PostgREST), the Stripe and embedding SDKs, and numpy/sklearn
+block. run_io runs blocking I/O on a bounded thread pool: a burst of slow queries queues for a thread
+instead of growing the pool without limit. run_cpu runs CPU-bound clustering in a process pool, so
+KMeans neither blocks the loop nor competes with it for the GIL; with cpu_workers=0 it runs on the I/O
+pool instead (for hosts that cannot start processes). Functions passed to run_cpu and their arguments
+must be picklable (module-level functions, numpy arrays)."""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import functools
+import logging
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+DEFAULT_IO_WORKERS = 32  # blocking Supabase/SDK calls in flight per process
+DEFAULT_CPU_WORKERS = 2  # clustering processes per API process
+
+_io_workers = DEFAULT_IO_WORKERS
+_cpu_workers = DEFAULT_CPU_WORKERS
+_io_pool: ThreadPoolExecutor | None = None
+_cpu_pool: ProcessPoolExecutor | None = None
+
+
+def _io_executor() -> ThreadPoolExecutor:
+    global _io_pool
+    if _io_pool is None:
+        _io_pool = ThreadPoolExecutor(max_workers=_io_workers, thread_name_prefix="io")
+    return _io_pool
+
+
+def _cpu_executor() -> Executor:
+    global _cpu_pool
+    if _cpu_workers <= 0:
+        return _io_executor()
+    if _cpu_pool is None:
+        # spawn, not fork: the API process has live threads (I/O pool, HTTP clients) that fork would copy mid-state.
+        _cpu_pool = ProcessPoolExecutor(max_workers=_cpu_workers, mp_context=multiprocessing.get_context("spawn"))
+    return _cpu_pool
+
+
+async def run_io(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """fn(*args, **kwargs) on the bounded I/O thread pool (context variables carried over)."""
+    call = functools.partial(contextvars.copy_context().run, fn, *args, **kwargs)
+    return await asyncio.get_running_loop().run_in_executor(_io_executor(), call)
+
+
+async def run_cpu(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """fn(*args, **kwargs) in the clustering process pool (or the I/O pool when cpu_workers is 0)."""
+    return await asyncio.get_running_loop().run_in_executor(_cpu_executor(), functools.partial(fn, *args, **kwargs))
+
+
+def configure_offload(io_workers: int, cpu_workers: int) -> None:
+    """Apply pool sizes from settings; pools are (re)created on next use."""
+    global _io_workers, _cpu_workers
+    shutdown_offload()
+    _io_workers = max(1, io_workers)
+    _cpu_workers = max(0, cpu_workers)
+
+
+def shutdown_offload() -> None:
+    """Stop both pools (app shutdown). Running work finishes; queued work is cancelled."""
+    global _io_pool, _cpu_pool
+    pools, _io_pool, _cpu_pool = [p for p in (_io_pool, _cpu_pool) if p is not None], None, None
+    for pool in pools:
+        try:
+            pool.shutdown(wait=True, cancel_futures=True)
+        except Exception as e:
+            logger.warning("offload pool shutdown failed: %s", e)
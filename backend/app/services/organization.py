@@ -2,28 +2,30 @@
 
 from __future__ import annotations
 
+import threading
+import time
+from dataclasses import dataclass
 from datetime import datetime, timezone
 from typing import Any
 
 from supabase import Client
 
+ACCOUNT_CONTEXT_TTL_SEC = 30
+ACCOUNT_CONTEXT_CACHE_SIZE = 10_000
+
 
 def get_organization_for_user(supabase: Client, user_id: str) -> dict[str, Any] | None:
-    """Return the organization the user belongs to, or None. Uses first membership."""
+    """Return the organization the user belongs to, or None. Uses first membership (one joined query)."""
     r = (
         supabase.table("organization_members")
-        .select("organization_id")
+        .select("organization_id, organizations(*)")
         .eq("user_id", user_id)
         .limit(1)
         .execute()
     )
     if not r.data or len(r.data) == 0:
         return None
-    org_id = r.data[0]["organization_id"]
-    r2 = supabase.table("organizations").select("*").eq("id", org_id).limit(1).execute()
-    if not r2.data or len(r2.data) == 0:
-        return None
-    return r2.data[0]
+    return r.data[0].get("organizations") or None
 
 
 def get_account_id_for_user(supabase: Client, user_id: str) -> str | None:
@@ -37,6 +39,68 @@ def get_account_id_for_user(supabase: Client, user_id: str) -> str | None:
     return user_id
 
 
+@dataclass(frozen=True)
+class AccountContext:
+    """Who is calling and which data they act on: resolved once per request (see get_account_context)."""
+
+    user_id: str
+    account_id: str
+    organization: dict[str, Any] | None
+
+    @property
+    def can_upload_or_generate(self) -> bool:
+        return can_upload_or_generate(self.organization, self.user_id)
+
+
+def resolve_account_context(supabase: Client, user_id: str) -> AccountContext:
+    org = get_organization_for_user(supabase, user_id)
+    return AccountContext(user_id=user_id, account_id=org["id"] if org else user_id, organization=org)
+
+
+class AccountContextCache:
+    """
+    Per-process TTL cache of AccountContext by user id. Organization creation and billing changes call
+    invalidate(); other instances see such changes after at most ttl_sec.
+    """
+
+    def __init__(self, ttl_sec: float = ACCOUNT_CONTEXT_TTL_SEC, max_entries: int = ACCOUNT_CONTEXT_CACHE_SIZE):
+        self.ttl_sec = ttl_sec
+        self.max_entries = max_entries
+        self._entries: dict[str, tuple[float, AccountContext]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, supabase: Client, user_id: str) -> AccountContext:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                return entry[1]
+        ctx = resolve_account_context(supabase, user_id)
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                self._entries = {k: v for k, v in self._entries.items() if v[0] > now}
+                if len(self._entries) >= self.max_entries:
+                    self._entries.pop(next(iter(self._entries)))
+            self._entries[user_id] = (now + self.ttl_sec, ctx)
+        return ctx
+
+    def invalidate(self, user_id: str | None = None, organization_id: str | None = None) -> None:
+        """Drop the context of user_id and of every cached member of organization_id."""
+        with self._lock:
+            if user_id is not None:
+                self._entries.pop(user_id, None)
+            if organization_id is not None:
+                org_id = str(organization_id)
+                self._entries = {k: v for k, v in self._entries.items() if str(v[1].account_id) != org_id}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+account_contexts = AccountContextCache()
+
+
 def can_upload_or_generate(org_or_legacy: dict[str, Any] | None, user_id: str) -> bool:
     """
     True if user can upload logs and run generate (insights / decision cards).
@@ -3,6 +3,11 @@
 from datetime import datetime, timezone, timedelta
 from typing import Any
 
+from app.services.llm_gateway import LLMSession, llm_gateway
+
+REPORT_MODEL = "gpt-4o-mini"
+REPORT_TEMPERATURE = 0.3
+
 
 def _priority_score(card: dict) -> float:
     impact = int(card.get("impact_level") or 3)
@@ -11,38 +16,32 @@ def _priority_score(card: dict) -> float:
     return impact * 2 + conf * 5 - effort
 
 
-def _one_thing_not_to_change(cards: list[dict], openai_api_key: str) -> str:
+async def _one_thing_not_to_change(cards: list[dict], llm: LLMSession | None) -> str:
     """Suggest one positive pattern / thing to keep doing (PM voice)."""
-    if not openai_api_key or not cards:
+    if llm is None or not cards:
         return "Keep focusing on one high-impact fix this week; don't spread effort across everything."
     try:
-        from openai import OpenAI
-        client = OpenAI(api_key=openai_api_key)
         top_problems = [c.get("problem", "")[:100] for c in cards[:3]]
-        resp = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a senior PM. In one short sentence, suggest ONE thing this team should NOT change—a positive pattern or habit to keep. No jargon. Example: 'Your users are giving clear feedback—keep collecting it.'",
-                },
-                {
-                    "role": "user",
-                    "content": f"Top issues this week: {top_problems}. What's one thing not to change?",
-                },
-            ],
-            temperature=0.3,
-            max_tokens=80,
-        )
-        text = (resp.choices[0].message.content or "").strip()
+        messages = [
+            {
+                "role": "system",
+                "content": "You are a senior PM. In one short sentence, suggest ONE thing this team should NOT change—a positive pattern or habit to keep. No jargon. Example: 'Your users are giving clear feedback—keep collecting it.'",
+            },
+            {
+                "role": "user",
+                "content": f"Top issues this week: {top_problems}. What's one thing not to change?",
+            },
+        ]
+        text = await llm.chat(messages, model=REPORT_MODEL, temperature=REPORT_TEMPERATURE, max_tokens=80)
         return text[:300] if text else "Keep iterating on the top fix; don't context-switch."
     except Exception:
         return "Keep focusing on one high-impact fix this week; don't spread effort across everything."
 
 
-def generate_weekly_report(
+async def generate_weekly_report(
     cards: list[dict[str, Any]],
     openai_api_key: str = "",
+    account_id: str = "",
 ) -> dict[str, Any]:
     """
     Build weekly report: top 3 issues, 1 focus card (thing to fix this week), 1 thing not to change.
@@ -51,7 +50,8 @@ def generate_weekly_report(
     sorted_cards = sorted(cards, key=_priority_score, reverse=True)
     top_3 = sorted_cards[:3]
     focus_card = top_3[0] if top_3 else None
-    thing_not_to_change = _one_thing_not_to_change(top_3, openai_api_key)
+    llm = llm_gateway.session(openai_api_key, account_id) if openai_api_key else None
+    thing_not_to_change = await _one_thing_not_to_change(top_3, llm)
 
     report = {
         "top_3_issues": [
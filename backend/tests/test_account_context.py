@@ -0,0 +1,106 @@
+# You are helping build an AI Product Decision Platform. Never add generic charts or infra metrics. All outputs must directly support: what is broken, why, and what to fix first for an AI SaaS product.
+
+from datetime import datetime, timedelta, timezone
+
+from fastapi.testclient import TestClient
+
+from app import auth, dependencies
+from app.main import app
+from app.services import organization
+from app.services.organization import AccountContextCache, resolve_account_context
+
+
+class _FakeQuery:
+    def __init__(self, db, table):
+        self.db, self.table, self.filters, self.columns = db, table, {}, ""
+
+    def select(self, columns):
+        self.columns = columns
+        return self
+
+    def eq(self, column, value):
+        self.filters[column] = value
+        return self
+
+    def limit(self, _n):
+        return self
+
+    def execute(self):
+        self.db.queries.append((self.table, self.columns))
+        assert self.table == "organization_members"
+        rows = [m for m in self.db.members if m["user_id"] == self.filters.get("user_id")]
+        return type("R", (), {"data": [{"organization_id": m["organization_id"], "organizations": self.db.orgs[m["organization_id"]]} for m in rows]})()
+
+
+class _FakeSupabase:
+    def __init__(self):
+        self.queries: list = []
+        future = (datetime.now(timezone.utc) + timedelta(days=3)).isoformat()
+        self.orgs = {"org-1": {"id": "org-1", "name": "Acme", "trial_ends_at": future, "subscription_status": "trialing"}}
+        self.members = [{"user_id": "u1", "organization_id": "org-1"}, {"user_id": "u2", "organization_id": "org-1"}]
+
+    def table(self, name):
+        return _FakeQuery(self, name)
+
+
+def test_context_is_resolved_with_one_joined_query():
+    sb = _FakeSupabase()
+    ctx = resolve_account_context(sb, "u1")
+    assert ctx.account_id == "org-1" and ctx.organization["name"] == "Acme" and ctx.can_upload_or_generate
+    assert sb.queries == [("organization_members", "organization_id, organizations(*)")]
+    legacy = resolve_account_context(sb, "solo")
+    assert legacy.account_id == "solo" and legacy.organization is None and legacy.can_upload_or_generate
+
+
+def test_cache_serves_repeat_lookups_until_invalidated():
+    sb = _FakeSupabase()
+    cache = AccountContextCache(ttl_sec=60)
+    for _ in range(3):
+        assert cache.get(sb, "u1").account_id == "org-1"
+    cache.get(sb, "u2")
+    assert len(sb.queries) == 2
+
+    sb.orgs["org-1"] = {**sb.orgs["org-1"], "trial_ends_at": "2020-01-01T00:00:00Z", "subscription_status": "canceled"}
+    assert cache.get(sb, "u1").can_upload_or_generate  # stale until invalidated
+    cache.invalidate(organization_id="org-1")  # billing webhook: every member of the org
+    assert not cache.get(sb, "u1").can_upload_or_generate
+    assert not cache.get(sb, "u2").can_upload_or_generate
+
+    cache.get(sb, "new-user")
+    sb.members.append({"user_id": "new-user", "organization_id": "org-1"})
+    cache.invalidate(user_id="new-user")  # organization creation
+    assert cache.get(sb, "new-user").account_id == "org-1"
+
+
+def test_cache_expires_and_stays_bounded(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(organization.time, "monotonic", lambda: now[0])
+    sb = _FakeSupabase()
+    cache = AccountContextCache(ttl_sec=10, max_entries=2)
+    cache.get(sb, "u1")
+    now[0] += 11
+    cache.get(sb, "u1")
+    assert len(sb.queries) == 2
+    for user in ("a", "b", "c"):
+        cache.get(sb, user)
+    assert len(cache._entries) == 2
+
+
+def test_dependency_resolves_once_per_request(monkeypatch):
+    sb = _FakeSupabase()
+    monkeypatch.setattr(organization, "account_contexts", AccountContextCache())
+    monkeypatch.setattr(dependencies, "account_contexts", organization.account_contexts)
+    app.dependency_overrides[dependencies.get_supabase] = lambda: sb
+
+    async def mock_verify():
+        return {"sub": "u1", "email": "pm@example.com"}
+
+    app.dependency_overrides[auth.verify_supabase_jwt] = mock_verify
+    try:
+        client = TestClient(app)
+        for _ in range(3):
+            r = client.get("/organizations/me")
+            assert r.status_code == 200 and r.json()["organization"]["id"] == "org-1"
+    finally:
+        app.dependency_overrides.clear()
+    assert len(sb.queries) == 1
@@ -0,0 +1,122 @@
+# You are helping build an AI Product Decision Platform. Never add generic charts or infra metrics. All outputs must directly support: what is broken, why, and what to fix first for an AI SaaS product.
+
+import time
+
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+
+from app import auth
+from app.config import settings
+
+_SECRET = "test-jwt-secret-with-at-least-32-bytes!"
+
+
+def _token(key=_SECRET, alg="HS256", kid=None, **claims) -> str:
+    payload = {"sub": "user-1", "email": "pm@example.com", "aud": "authenticated", "exp": int(time.time()) + 3600, **claims}
+    return jwt.encode(payload, key, algorithm=alg, headers={"kid": kid} if kid else None)
+
+
+def _creds(token: str) -> HTTPAuthorizationCredentials:
+    return HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+
+@pytest.fixture(autouse=True)
+def local_auth(monkeypatch):
+    monkeypatch.setattr(settings, "auth_mode", "local")
+    monkeypatch.setattr(settings, "supabase_jwt_secret", _SECRET)
+    monkeypatch.setattr(settings, "supabase_url", "https://project.supabase.co")
+    monkeypatch.setattr(settings, "supabase_anon_key", "anon")
+    monkeypatch.setattr(auth, "_claims", auth._ClaimsCache())
+    monkeypatch.setattr(auth, "_jwks", auth._JWKSCache())
+    remote_calls = []
+
+    async def remote_user(token):
+        remote_calls.append(token)
+        return {"id": "remote-user", "email": "remote@example.com"}
+
+    monkeypatch.setattr(auth, "_remote_user", remote_user)
+    return remote_calls
+
+
+async def test_hs256_token_verified_locally_and_cached(local_auth, monkeypatch):
+    decodes = []
+    real_decode = jwt.decode
+    monkeypatch.setattr(auth.jwt, "decode", lambda *a, **k: decodes.append(1) or real_decode(*a, **k))
+    token = _token()
+    user = await auth.verify_supabase_jwt(_creds(token))
+    assert user["sub"] == "user-1" and user["email"] == "pm@example.com"
+    assert await auth.verify_supabase_jwt(_creds(token)) == user
+    assert len(decodes) == 1
+    assert local_auth == []  # no Supabase round trip
+
+
+@pytest.mark.parametrize("token", [
+    _token(exp=int(time.time()) - 3600),
+    _token(key="another-secret-with-at-least-32-bytes"),
+    _token(aud="anon"),
+    "not-a-jwt",
+])
+async def test_bad_tokens_are_rejected_without_remote_call(local_auth, token):
+    with pytest.raises(HTTPException) as exc:
+        await auth.verify_supabase_jwt(_creds(token))
+    assert exc.value.status_code == 401
+    assert local_auth == []
+
+
+async def test_asymmetric_tokens_use_cached_jwks(local_auth, monkeypatch):
+    private = ec.generate_private_key(ec.SECP256R1())
+    public_jwk = jwt.algorithms.ECAlgorithm.to_jwk(private.public_key(), as_dict=True)
+    fetches = []
+
+    async def fetch_jwks():
+        fetches.append(1)
+        return {"keys": [{**public_jwk, "kid": "k1", "alg": "ES256"}]}
+
+    monkeypatch.setattr(auth, "_fetch_jwks", fetch_jwks)
+    for i in range(3):
+        user = await auth.verify_supabase_jwt(_creds(_token(private, "ES256", kid="k1", sub=f"user-{i}")))
+        assert user["sub"] == f"user-{i}"
+    assert len(fetches) == 1
+    # Unknown key id: refetched at most once per JWKS_MIN_REFETCH_SEC, then the remote check decides.
+    user = await auth.verify_supabase_jwt(_creds(_token(private, "ES256", kid="rotated")))
+    assert user["sub"] == "remote-user" and len(local_auth) == 1
+    assert len(fetches) == 1
+    auth._jwks.fetched_at -= auth.JWKS_MIN_REFETCH_SEC
+    await auth.verify_supabase_jwt(_creds(_token(private, "ES256", kid="rotated", sub="again")))
+    assert len(fetches) == 2
+
+
+async def test_alg_that_does_not_match_the_kid_key_type_is_rejected(local_auth, monkeypatch):
+    rsa_public = rsa.generate_private_key(public_exponent=65537, key_size=2048).public_key()
+    ec_private = ec.generate_private_key(ec.SECP256R1())
+
+    async def fetch_jwks():
+        return {"keys": [{**jwt.algorithms.RSAAlgorithm.to_jwk(rsa_public, as_dict=True), "kid": "rsa-1"}]}
+
+    monkeypatch.setattr(auth, "_fetch_jwks", fetch_jwks)
+    with pytest.raises(HTTPException) as exc:
+        await auth.verify_supabase_jwt(_creds(_token(ec_private, "ES256", kid="rsa-1")))
+    assert exc.value.status_code == 401
+    assert local_auth == []
+
+
+async def test_remote_mode_and_missing_secret_fall_back_to_supabase(local_auth, monkeypatch):
+    monkeypatch.setattr(settings, "auth_mode", "remote")
+    assert (await auth.verify_supabase_jwt(_creds(_token())))["sub"] == "remote-user"
+    monkeypatch.setattr(settings, "auth_mode", "local")
+    monkeypatch.setattr(settings, "supabase_jwt_secret", "")
+    assert (await auth.verify_supabase_jwt(_creds(_token(sub="other"))))["sub"] == "remote-user"
+    assert len(local_auth) == 2
+
+
+def test_claims_cache_never_outlives_the_token():
+    cache = auth._ClaimsCache(max_entries=2)
+    cache.put("a", {"sub": "a"}, ttl_sec=60, exp=time.time() - 1)
+    assert cache.get("a") is None
+    cache.put("a", {"sub": "a"}, ttl_sec=60)
+    cache.put("b", {"sub": "b"}, ttl_sec=60)
+    cache.put("c", {"sub": "c"}, ttl_sec=60)
+    assert cache.get("a") is None and cache.get("c") == {"sub": "c"}
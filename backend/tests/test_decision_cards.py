@@ -0,0 +1,121 @@
+# You are helping build an AI Product Decision Platform. Never add generic charts or infra metrics. All outputs must directly support: what is broken, why, and what to fix first for an AI SaaS product.
+
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import decision_cards, llm_gateway
+from app.services.decision_cards import generate_decision_cards_for_account
+from app.services.llm_cache import LLMResponseCache
+from app.services.llm_gateway import LLMGateway
+
+_CARD = {"problem": "p", "evidence_snippets": ["e"], "recommended_action": "a", "impact_level": 4, "effort_estimate": 2, "confidence_score": 0.8}
+
+
+def _insights(n: int) -> list[dict]:
+    return [{"id": f"ins-{i}", "title": f"Pattern {i}", "frequency": 10 + i} for i in range(n)]
+
+
+async def test_cards_are_generated_concurrently_and_bounded(monkeypatch):
+    in_flight = 0
+    peak = 0
+
+    async def generate(insight, llm):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.02)
+        in_flight -= 1
+        return [{**_CARD, "problem": insight["title"]}]
+
+    monkeypatch.setattr(decision_cards, "_llm_generate_cards_for_insight", generate)
+    rows = await generate_decision_cards_for_account(_insights(12), {"ins-0": [{"id": "c"}]}, "acct", "sk-test", max_concurrency=3)
+    assert peak == 3
+    assert [r["insight_id"] for r in rows] == [f"ins-{i}" for i in range(1, 12)]  # ins-0 already has cards
+    assert all(r["account_id"] == "acct" and r["problem"] == f"Pattern {r['insight_id'][4:]}" for r in rows)
+
+
+async def test_failed_insights_do_not_drop_the_others(monkeypatch):
+    async def generate(insight, llm):
+        if insight["id"] in ("ins-1", "ins-3"):
+            raise TimeoutError("deadline")
+        return [_CARD]
+
+    monkeypatch.setattr(decision_cards, "_llm_generate_cards_for_insight", generate)
+    rows = await generate_decision_cards_for_account(_insights(5), {}, "acct", "sk-test")
+    assert [r["insight_id"] for r in rows] == ["ins-0", "ins-2", "ins-4"]
+
+
+async def test_all_insights_failing_raises(monkeypatch):
+    async def generate(insight, llm):
+        raise TimeoutError("deadline")
+
+    monkeypatch.setattr(decision_cards, "_llm_generate_cards_for_insight", generate)
+    with pytest.raises(TimeoutError):
+        await generate_decision_cards_for_account(_insights(2), {}, "acct", "sk-test")
+    assert await generate_decision_cards_for_account(_insights(2), {}, "acct", "") == []
+
+
+def _session(answer) -> tuple:
+    calls: list = []
+
+    async def create(**kwargs):
+        calls.append(kwargs)
+        return _completion(answer(kwargs["messages"]))
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    return LLMGateway(client_factory=lambda key: client), calls
+
+
+def _completion(text: str):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))])
+
+
+def _batch_answer(messages, skip=()):
+    content = messages[-1]["content"]
+    payload = json.loads(content.split("\n")[1])
+    if isinstance(payload, dict):  # single-insight prompt
+        return json.dumps([{**_CARD, "problem": f"single {payload['title']}"}])
+    return json.dumps({p["id"]: [{**_CARD, "problem": f"batch {p['title']}"}] for p in payload if p["id"] not in skip})
+
+
+@pytest.fixture
+def gateway(monkeypatch):
+    monkeypatch.setattr(llm_gateway, "response_cache", LLMResponseCache(max_entries=0))
+
+    def use(answer):
+        gw, calls = _session(answer)
+        monkeypatch.setattr(decision_cards, "llm_gateway", gw)
+        return calls
+
+    return use
+
+
+async def test_batched_mode_packs_insights_into_fewer_requests(gateway):
+    calls = gateway(_batch_answer)
+    rows = await generate_decision_cards_for_account(_insights(10), {}, "acct", "sk-test", batched=True, batch_max_insights=4)
+    assert len(calls) == 3  # 4 + 4 + 2 insights
+    assert [r["problem"] for r in rows] == [f"batch Pattern {i}" for i in range(10)]
+    assert sum(c["messages"][0]["content"].count("senior product manager") for c in calls) == 3
+
+
+async def test_batch_size_follows_the_token_budget(gateway):
+    calls = gateway(_batch_answer)
+    big = [{**ins, "description": "word " * 400} for ins in _insights(6)]
+    rows = await generate_decision_cards_for_account(big, {}, "acct", "sk-test", batched=True, batch_tokens=600)
+    assert len(rows) == 6
+    assert len(calls) >= 3
+
+
+async def test_malformed_or_incomplete_batches_fall_back_to_single_insights(gateway):
+    calls = gateway(lambda messages: "not json" if "Pattern 0" in messages[-1]["content"] and "Here are" in messages[-1]["content"]
+                    else _batch_answer(messages, skip=("ins-5",)))
+    rows = await generate_decision_cards_for_account(_insights(8), {}, "acct", "sk-test", batched=True, batch_max_insights=4)
+    by_insight = {r["insight_id"]: r["problem"] for r in rows}
+    assert by_insight == {
+        **{f"ins-{i}": f"single Pattern {i}" for i in (0, 1, 2, 3, 5)},
+        **{f"ins-{i}": f"batch Pattern {i}" for i in (4, 6, 7)},
+    }
+    assert len(calls) == 2 + 5
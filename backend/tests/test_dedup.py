@@ -0,0 +1,56 @@
+# You are helping build an AI Product Decision Platform. Never add generic charts or infra metrics. All outputs must directly support: what is broken, why, and what to fix first for an AI SaaS product.
+
+from app.services import insight_engine
+from app.services.dedup import collapse_duplicates, normalize_text
+
+_REFUSAL = (
+    "I'm sorry, but I can't help with that request. As an AI assistant I am not able to access your account, "
+    "process refunds, or change subscription settings. Please contact our support team at the help center, "
+    "where a member of staff will be happy to assist you with order {n} as soon as possible."
+)
+_OTHER = "The export to CSV finished but the file only contains the header row and none of the {n} records."
+
+
+def test_normalize_text_folds_case_digits_and_punctuation():
+    assert normalize_text("Order #123 FAILED!!  Retry?") == normalize_text("order 9 failed retry")
+
+
+def test_collapse_groups_exact_and_near_duplicates():
+    texts = [
+        _REFUSAL.format(n=1),
+        _OTHER.format(n=5),
+        _REFUSAL.format(n=2).upper(),  # exact after normalization
+        _REFUSAL.format(n=3).replace("as soon as possible", "soon"),  # near duplicate
+        _OTHER.format(n=7).replace("records", "rows"),
+        "Completely unrelated question about pricing tiers.",
+    ]
+    groups = collapse_duplicates(texts, lambda t: t)
+    assert [len(g) for g in groups] == [3, 2, 1]
+    assert groups[0][0] == texts[0]
+
+
+async def test_engine_embeds_one_representative_per_group(monkeypatch):
+    embedded: list = []
+
+    def embed(_provider, texts):
+        embedded.extend(texts)
+        return [[1.0, 0.0] if "sorry" in t else [0.0, 1.0] for t in texts]
+
+    async def explain(summary, client):
+        return {"failure_cause": "c"}
+
+    monkeypatch.setattr(insight_engine.OpenAIEmbeddingProvider, "embed", embed)
+    monkeypatch.setattr(insight_engine, "_explain_failure_cluster", explain)
+    logs = [
+        {"id": str(i), "timestamp": "2024-01-01T00:00:00Z", "input": "refund please", "output": _REFUSAL.format(n=i),
+         "feedback_type": "thumb_down", "feedback_value": "1" if i % 2 else "2"}
+        for i in range(90)
+    ] + [
+        {"id": f"x{i}", "timestamp": "2024-01-01T00:00:00Z", "input": "export", "output": _OTHER.format(n=i),
+         "feedback_type": "thumb_down", "feedback_value": None}
+        for i in range(10)
+    ]
+    insights = await insight_engine.run_insight_engine(logs, "acct", "sk-test")
+    assert len(embedded) == 2
+    by_freq = sorted((i["frequency"], i["avg_feedback"]) for i in insights)
+    assert by_freq == [(10, None), (90, "1.5")]
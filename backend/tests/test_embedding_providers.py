@@ -0,0 +1,75 @@
+# You are helping build an AI Product Decision Platform. Never add generic charts or infra metrics. All outputs must directly support: what is broken, why, and what to fix first for an AI SaaS product.
+
+import time
+
+import numpy as np
+import pytest
+
+from app.services import embedding_providers
+from app.services.embedding_providers import LocalEmbeddingProvider, OpenAIEmbeddingProvider, get_embedding_provider
+from app.services.insight_engine import run_insight_engine
+
+_FAILURES = {
+    "refund": "How do I get a refund for order {i}? -> I cannot help with billing questions.",
+    "password": "Reset my password for account {i} -> Please contact your administrator.",
+    "translate": "Translate paragraph {i} to German -> Here is the French translation.",
+}
+
+
+def _logs(per_topic: int):
+    return [
+        {"id": f"{topic}-{i}", "timestamp": "2024-01-01T00:00:00Z", "input": text.format(i=i).split(" -> ")[0],
+         "output": text.format(i=i).split(" -> ")[1], "feedback_type": "thumb_down", "feedback_value": "1"}
+        for topic, text in _FAILURES.items()
+        for i in range(per_topic)
+    ]
+
+
+def test_get_embedding_provider():
+    assert isinstance(get_embedding_provider("openai", "sk-test"), OpenAIEmbeddingProvider)
+    assert isinstance(get_embedding_provider("local"), LocalEmbeddingProvider)
+    with pytest.raises(ValueError):
+        get_embedding_provider("nope")
+
+
+def test_local_provider_returns_dense_deterministic_vectors():
+    texts = [f"input: question {i} about refunds\noutput: no" for i in range(50)]
+    a = LocalEmbeddingProvider(dimensions=16).embed(texts)
+    b = LocalEmbeddingProvider(dimensions=16).embed(texts)
+    assert a.shape == (50, 16)
+    assert np.allclose(a, b)
+    assert LocalEmbeddingProvider().embed(["only one"]).shape == (1, 1)
+
+
+async def test_local_preview_clusters_offline_and_fast():
+    started = time.monotonic()
+    insights = await run_insight_engine(_logs(200), "acct", "", provider=LocalEmbeddingProvider())
+    assert time.monotonic() - started < 5
+    assert sum(i["frequency"] for i in insights) == 600
+    for ins in insights:
+        inputs = {s["input"].split()[0] for s in ins["example_snippets"]}
+        assert len(inputs) == 1  # each cluster holds a single failure type
+        assert ins["title"].startswith("Negative feedback pattern")
+        assert ins["centroid"] is None  # per-call SVD basis: nothing to persist
+
+
+def test_openai_provider_packs_batches_to_the_configured_token_budget(monkeypatch):
+    seen = {}
+
+    def fake_embed_texts(texts, create, max_tokens):
+        seen["max_tokens"] = max_tokens
+        return [[0.0] for _ in texts]
+
+    monkeypatch.setattr(embedding_providers, "embed_texts", fake_embed_texts)
+    provider = get_embedding_provider("openai", "sk-test", batch_tokens=8000)
+    assert provider.embed(["a", "b"]) == [[0.0], [0.0]]
+    assert seen["max_tokens"] == 8000
+
+
+def test_openai_provider_reuses_one_client_across_embed_calls(monkeypatch):
+    monkeypatch.setattr(embedding_providers, "embed_texts", lambda texts, create, max_tokens: [[0.0] for _ in texts])
+    provider = get_embedding_provider("openai", "sk-test")
+    provider.embed(["a"])
+    client = provider._client
+    provider.embed(["b"])
+    assert client is not None and provider._client is client
@@ -0,0 +1,94 @@
+# You are helping build an AI Product Decision Platform. Never add generic charts or infra metrics. All outputs must directly support: what is broken, why, and what to fix first for an AI SaaS product.
+
+import os
+
+import numpy as np
+
+from app.services import insight_engine
+from app.services.embedding_store import EmbeddingStore, LocalEmbeddingStore, embedding_key
+
+
+def _word(i: int) -> str:
+    # Distinct letters, not digits: the engine folds digits when collapsing duplicate logs.
+    return "".join("abcdefghijklmnopqrstuvwxyz"[int(d)] for d in str(i))
+
+
+def _logs(n: int, start: int = 0):
+    return [
+        {"id": str(i), "timestamp": f"2024-01-01T00:{i % 60:02d}:00Z", "input": f"question {_word(i)} about topic {_word(i * 7)}",
+         "output": f"answer {_word(i * 13)}", "feedback_type": "thumb_down"}
+        for i in range(start, start + n)
+    ]
+
+
+def _fake_api(calls: list):
+    def get_embeddings(_provider, texts):
+        calls.append(len(texts))
+        return [[float(len(t)), float(i % 7), 1.0] for i, t in enumerate(texts)]
+
+    return get_embeddings
+
+
+class _BrokenStore:
+    def get_many(self, keys):
+        raise RuntimeError("relation ai_log_embeddings does not exist")
+
+    def put_many(self, vectors):
+        raise RuntimeError("relation ai_log_embeddings does not exist")
+
+
+def test_embedding_key_depends_on_model_and_text():
+    assert embedding_key("a", "m1") != embedding_key("a", "m2")
+    assert embedding_key("a", "m1") != embedding_key("b", "m1")
+    assert len(embedding_key("a", "m1")) == 32
+
+
+def test_local_store_round_trips_float32(tmp_path):
+    store = LocalEmbeddingStore(str(tmp_path))
+    store.put_many({"ab12": np.array([0.5, -1.25, 3.0])})
+    got = store.get_many(["ab12", "cd34"])
+    assert list(got) == ["ab12"]
+    assert got["ab12"].dtype == np.float32
+    assert got["ab12"].tolist() == [0.5, -1.25, 3.0]
+
+
+def test_local_store_evicts_least_recently_used_past_max_bytes(tmp_path):
+    store = LocalEmbeddingStore(str(tmp_path))
+    store.put_many({f"{i:02d}aa": np.zeros(256) for i in range(10)})
+    size = os.path.getsize(tmp_path / "00" / "00aa.npy")
+    for i in range(10):
+        os.utime(tmp_path / f"{i:02d}" / f"{i:02d}aa.npy", (1000 + i, 1000 + i))
+    store.get_many(["00aa"])  # read: most recently used now
+    store.max_bytes = size * 10
+    store.put_many({"10aa": np.zeros(256)})
+    kept = sorted(p.name for p in tmp_path.rglob("*.npy"))
+    assert sum(p.stat().st_size for p in tmp_path.rglob("*.npy")) <= size * 8
+    assert "00aa.npy" in kept and "10aa.npy" in kept
+    assert "01aa.npy" not in kept and "02aa.npy" not in kept
+
+
+def test_store_falls_back_when_primary_fails(tmp_path):
+    store = EmbeddingStore(_BrokenStore(), LocalEmbeddingStore(str(tmp_path)))
+    assert store.get_many(["k1"]) == {}
+    store.put_many({"k1": np.ones(3)})
+    assert store.get_many(["k1"])["k1"].tolist() == [1.0, 1.0, 1.0]
+
+
+async def test_rerun_embeds_only_new_logs(tmp_path, monkeypatch):
+    calls: list = []
+    monkeypatch.setattr(insight_engine.OpenAIEmbeddingProvider, "embed", _fake_api(calls))
+
+    async def explain(summary, client):
+        return {"failure_cause": "x"}
+
+    monkeypatch.setattr(insight_engine, "_explain_failure_cluster", explain)
+    store = EmbeddingStore(LocalEmbeddingStore(str(tmp_path)))
+
+    first = await insight_engine.run_insight_engine(_logs(30), "acct", "sk-test", store)
+    assert calls == [30]
+    again = await insight_engine.run_insight_engine(_logs(30), "acct", "sk-test", store)
+    assert calls == [30]
+    assert [i["frequency"] for i in again] == [i["frequency"] for i in first]
+
+    await insight_engine.run_insight_engine(_logs(35), "acct", "sk-test", store)
+    assert calls == [30, 5]
@@ -0,0 +1,77 @@
+# You are helping build an AI Product Decision Platform. Never add generic charts or infra metrics. All outputs must directly support: what is broken, why, and what to fix first for an AI SaaS product.
+
+import threading
+
+import pytest
+
+from app.services import embeddings
+from app.services.embeddings import embed_texts, estimate_tokens, pack_batches
+
+
+class _RateLimited(Exception):
+    status_code = 429
+
+
+class _BadRequest(Exception):
+    status_code = 400
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(embeddings, "BACKOFF_BASE_SEC", 0.0)
+
+
+def test_pack_batches_respects_token_and_input_budgets():
+    texts = ["x" * 300] * 10  # ~101 tokens each with the fallback estimate
+    per = estimate_tokens(texts[0])
+    batches = pack_batches(texts, max_tokens=per * 3, max_inputs=100)
+    assert [len(b) for b in batches] == [3, 3, 3, 1]
+    assert [i for b in batches for i in b] == list(range(10))
+    assert [len(b) for b in pack_batches(texts, max_tokens=10**6, max_inputs=4)] == [4, 4, 2]
+    # An oversized text still gets sent, alone.
+    assert pack_batches(["y" * 10_000, "z"], max_tokens=100) == [[0], [1]]
+
+
+def test_embed_texts_runs_batches_concurrently_in_input_order():
+    lock = threading.Lock()
+    in_flight = 0
+    peak = 0
+    # Every batch waits until all ten are in flight: this only completes if they overlap.
+    all_in_flight = threading.Barrier(10, timeout=5)
+
+    def create(batch):
+        nonlocal in_flight, peak
+        with lock:
+            in_flight += 1
+            peak = max(peak, in_flight)
+        all_in_flight.wait()
+        with lock:
+            in_flight -= 1
+        return [[float(t)] for t in batch]
+
+    texts = [str(i) for i in range(100)]
+    out = embed_texts(texts, create, max_inputs=10, max_concurrency=10)
+    assert out == [[float(i)] for i in range(100)]
+    assert peak == 10
+
+
+def test_embed_texts_retries_only_the_failed_batch():
+    calls: dict = {}
+
+    def create(batch):
+        calls[batch[0]] = calls.get(batch[0], 0) + 1
+        if batch[0] == "4" and calls[batch[0]] == 1:
+            raise _RateLimited("slow down")
+        return [[1.0] for _ in batch]
+
+    out = embed_texts([str(i) for i in range(8)], create, max_inputs=2)
+    assert len(out) == 8
+    assert calls == {"0": 1, "2": 1, "4": 2, "6": 1}
+
+
+def test_embed_texts_raises_on_permanent_error():
+    def create(batch):
+        raise _BadRequest("input too long")
+
+    with pytest.raises(_BadRequest):
+        embed_texts(["a", "b"], create)
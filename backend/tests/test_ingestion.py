@@ -1,7 +1,29 @@
 # You are helping build an AI Product Decision Platform. Never add generic charts or infra metrics. All outputs must directly support: what is broken, why, and what to fix first for an AI SaaS product.
 
+import gzip
+import io
+import json
+
 import pytest
-from app.ingestion import parse_json_rows, parse_csv_rows
+from app import ingestion
+from app.ingestion import (
+    DECOMPRESS_OUTPUT_BYTES,
+    DecompressedTooLargeError,
+    DecompressionError,
+    RowValidator,
+    UploadTooLargeError,
+    _row_to_log,
+    iter_csv_rows,
+    iter_decompressed,
+    iter_file_chunks,
+    iter_json_rows,
+    is_negative_feedback,
+    iter_ndjson_rows,
+    parse_csv_rows,
+    parse_json_rows,
+    parse_ndjson_rows,
+    split_compression,
+)
 
 ACCOUNT_ID = "test-account-123"
 
@@ -67,3 +89,229 @@ def test_parse_csv_empty():
     valid, errors = parse_csv_rows(b"session_id,timestamp\n", ACCOUNT_ID)
     assert len(valid) == 0
     assert len(errors) > 0
+
+
+def _chunked(body: bytes, size: int) -> list[bytes]:
+    return [body[i : i + size] for i in range(0, len(body), size)]
+
+
+def _collect_rows(results) -> tuple[list[dict], list[dict]]:
+    valid, errors = [], []
+    for row_no, row, row_errors in results:
+        errors.extend({"row": row_no, "error": e} for e in row_errors)
+        if row is not None:
+            valid.append(row)
+    return valid, errors
+
+
+def test_iter_json_rows_streams_array_across_chunk_boundaries():
+    items = [
+        {"session_id": f"s{i}", "timestamp": "2024-01-15T10:00:00Z", "input": "caf\u00e9 " * (i + 1), "output": "o", "feedback_type": "thumb_down", "feedback_value": i}
+        for i in range(20)
+    ]
+    body = json.dumps(items).encode("utf-8")
+    results = list(iter_json_rows(_chunked(body, 7), ACCOUNT_ID))
+    assert [r[0] for r in results] == list(range(1, 21))
+    assert all(row is not None and not errs for _, row, errs in results)
+    assert results[3][1]["input"] == "caf\u00e9 caf\u00e9 caf\u00e9 caf\u00e9"
+
+
+def test_iter_json_rows_truncated_array_reports_file_error():
+    body = b'[{"session_id": "a", "timestamp": "2024-01-15T10:00:00Z", "input": "x", "output": "y", "feedback_type": "up", "feedback_value": "1"}, {"session_id": '
+    results = list(iter_json_rows(_chunked(body, 16), ACCOUNT_ID))
+    assert results[0][1] is not None
+    assert results[-1][0] == 0
+    assert results[-1][2][0].startswith("Invalid JSON")
+
+
+def test_iter_json_rows_splits_literals_and_escapes_at_any_byte():
+    items = [{"session_id": "s\u00e9", "timestamp": "2024-01-15T10:00:00Z", "input": "x", "output": "o", "feedback_type": "up", "feedback_value": 1, "user_id": None, "metadata": {"beta": False, "ok": True}}] * 3
+    body = json.dumps(items).encode("utf-8")
+    results = list(iter_json_rows(_chunked(body, 1), ACCOUNT_ID))
+    assert [r[0] for r in results] == [1, 2, 3]
+    assert results[0][1]["session_id"] == "s\u00e9"
+
+
+def test_iter_json_rows_stops_reading_at_malformed_element():
+    pulled = []
+
+    def chunks():
+        yield b'[{"session_id": "a", "timestamp": "2024-01-15T10:00:00Z", "input": "x", "output": "y"}, {"session_id": oops}, '
+        for i in range(1000):
+            pulled.append(i)
+            yield b'{"session_id": "b", "timestamp": "2024-01-15T10:00:00Z", "input": "x", "output": "y"}, '
+
+    results = list(iter_json_rows(chunks(), ACCOUNT_ID))
+    assert results[-1][0] == 0 and results[-1][2][0].startswith("Invalid JSON")
+    assert len(pulled) <= 1
+
+
+@pytest.mark.parametrize("first", [b'"a string', b"12345", b"not json"])
+def test_iter_json_rows_rejects_other_top_levels_at_the_first_chunk(first):
+    pulled = []
+
+    def chunks():
+        yield first
+        for i in range(1000):
+            pulled.append(i)
+            yield b"0" * 1024
+
+    results = list(iter_json_rows(chunks(), ACCOUNT_ID))
+    assert results == [(0, None, ["JSON must be an array of objects or a single object."])]
+    assert pulled == []
+
+
+def test_iter_json_rows_bounds_one_oversized_item(monkeypatch):
+    monkeypatch.setattr(ingestion, "MAX_JSON_ITEM_CHARS", 4096)
+    pulled = []
+
+    def chunks():
+        yield b'{"session_id": "'
+        for i in range(1000):
+            pulled.append(i)
+            yield b"x" * 1024
+
+    results = list(iter_json_rows(chunks(), ACCOUNT_ID))
+    assert results[-1][0] == 0 and "over" in results[-1][2][0]
+    assert len(pulled) <= 6
+
+
+def test_iter_csv_rows_streams_quoted_newlines_across_chunks():
+    body = b"""session_id,timestamp,input,output,feedback_type,feedback_value
+s1,2024-01-15T10:00:00Z,"multi
+line",hello,thumb_down,-1
+s2,2024-01-15T10:00:00Z,hi,hello,thumb_down,-1
+"""
+    results = list(iter_csv_rows(_chunked(body, 5), ACCOUNT_ID))
+    assert [r[0] for r in results] == [2, 3]
+    assert results[0][1]["input"] == "multi\nline"
+
+
+def test_iter_file_chunks_enforces_limit():
+    with pytest.raises(UploadTooLargeError):
+        list(iter_file_chunks(io.BytesIO(b"x" * 100), max_bytes=50, chunk_size=16))
+
+
+def test_row_validator_matches_per_row_normalization():
+    raw = {"Session ID": " s1 ", "Timestamp": "2024-01-15T10:00:00Z", "Input": "hi", "output": "ho", "Feedback-Type": "thumb_down", "feedback_value": -1, "Tags": "a, b"}
+    validator = RowValidator(list(raw))
+    assert validator.to_log(ACCOUNT_ID, raw) == _row_to_log(ACCOUNT_ID, raw)
+    positional = RowValidator(list(raw), positional=True)
+    assert positional.to_log(ACCOUNT_ID, list(raw.values())) == _row_to_log(ACCOUNT_ID, raw)
+    row, errors = validator.to_log(ACCOUNT_ID, raw)
+    assert errors == []
+    assert row["session_id"] == "s1"
+    assert row["tags"] == ["a", "b"]
+
+
+def test_parse_csv_normalized_headers_and_short_rows():
+    body = b"""Session ID,Timestamp,Input,Output,Feedback Type,Feedback Value
+s1,2024-01-15T10:00:00Z,hi,hello,thumb_down,-1
+
+s2,2024-01-15T10:00:00Z,hi,hello,thumb_down
+"""
+    valid, errors = parse_csv_rows(body, ACCOUNT_ID)
+    assert [r["session_id"] for r in valid] == ["s1"]
+    assert errors == [{"row": 3, "error": "Missing or empty required field: 'feedback_value'"}]
+
+
+def test_parse_ndjson_reports_errors_by_line():
+    body = b"""{"session_id": "a", "timestamp": "2024-01-15T10:00:00Z", "input": "x", "output": "y", "feedback_type": "thumb_down", "feedback_value": "-1"}
+
+{"session_id": "b", "timestamp": "2024-01-15T10:00:00Z"
+["not", "an", "object"]
+{"session_id": "c", "timestamp": "2024-01-16T10:00:00Z", "input": "p", "output": "q", "feedback_type": "thumb_up", "feedback_value": "1"}
+"""
+    valid, errors = parse_ndjson_rows(body, ACCOUNT_ID)
+    assert [r["session_id"] for r in valid] == ["a", "c"]
+    assert [e["row"] for e in errors] == [3, 4]
+    assert errors[0]["error"].startswith("Invalid JSON")
+
+
+def test_parse_ndjson_empty():
+    valid, errors = parse_ndjson_rows(b"\n\n", ACCOUNT_ID)
+    assert valid == []
+    assert errors == [{"row": 0, "error": "File has no JSON lines."}]
+
+
+def test_split_compression():
+    assert split_compression("logs.csv.gz") == ("logs.csv", "gzip")
+    assert split_compression("logs.jsonl.zst") == ("logs.jsonl", "zstd")
+    assert split_compression("logs.json") == ("logs.json", None)
+
+
+def test_gzip_csv_streams_through_parser():
+    csv_body = b"session_id,timestamp,input,output,feedback_type,feedback_value\n" + b"".join(
+        b"s%d,2024-01-15T10:00:00Z,hi,hello,thumb_down,-1\n" % i for i in range(300)
+    )
+    body = gzip.compress(csv_body[:4000]) + gzip.compress(csv_body[4000:])
+    results = list(iter_csv_rows(iter_decompressed(_chunked(body, 64), "gzip", 1 << 20), ACCOUNT_ID))
+    assert len(results) == 300
+    assert all(row is not None for _, row, _ in results)
+
+
+def test_zstd_jsonl_streams_through_parser():
+    zstandard = pytest.importorskip("zstandard")
+    line = b'{"session_id": "a", "timestamp": "2024-01-15T10:00:00Z", "input": "x", "output": "y", "feedback_type": "up", "feedback_value": "1"}\n'
+    body = zstandard.ZstdCompressor().compress(line * 50)
+    valid, errors = _collect_rows(iter_ndjson_rows(iter_decompressed(_chunked(body, 32), "zstd", 1 << 20), ACCOUNT_ID))
+    assert len(valid) == 50
+    assert errors == []
+
+
+def test_decompression_bomb_is_stopped():
+    body = gzip.compress(b"\0" * (20 * 1024 * 1024))
+    with pytest.raises(DecompressedTooLargeError):
+        for _ in iter_decompressed(_chunked(body, 4096), "gzip", 1024 * 1024):
+            pass
+
+
+def test_zstd_bomb_is_stopped_in_bounded_steps():
+    zstandard = pytest.importorskip("zstandard")
+    body = zstandard.ZstdCompressor().compress(b"\0" * (64 * 1024 * 1024)) * 2  # two frames, ~4KB of input
+    sizes = []
+    with pytest.raises(DecompressedTooLargeError):
+        for out in iter_decompressed([body], "zstd", 80 * 1024 * 1024):
+            sizes.append(len(out))
+    assert max(sizes) <= DECOMPRESS_OUTPUT_BYTES
+    assert sum(sizes) > 64 * 1024 * 1024  # read on into the second frame
+
+
+def test_truncated_gzip_raises():
+    body = gzip.compress(b"session_id\n" * 1000)[:-12]
+    with pytest.raises(DecompressionError):
+        list(iter_decompressed([body], "gzip", 1 << 20))
+
+
+def test_content_hash_is_stable_across_timestamp_formats():
+    base = {"session_id": "s1", "input": "hi", "output": "hello", "feedback_type": "thumb_down", "feedback_value": "-1"}
+    a, _ = _row_to_log(ACCOUNT_ID, {**base, "timestamp": "2024-01-15T10:00:00Z"})
+    b, _ = _row_to_log(ACCOUNT_ID, {**base, "timestamp": "2024-01-15T12:00:00+02:00"})
+    c, _ = _row_to_log(ACCOUNT_ID, {**base, "timestamp": "1705312800"})
+    d, _ = _row_to_log(ACCOUNT_ID, {**base, "timestamp": "2024-01-15T10:00:00Z", "output": "other"})
+    assert a["content_hash"] == b["content_hash"] == c["content_hash"]
+    assert a["content_hash"] != d["content_hash"]
+    assert len(a["content_hash"]) == 32
+
+
+def test_is_negative_flag_set_at_ingest():
+    body = b"""session_id,timestamp,input,output,feedback_type,feedback_value
+s1,2024-01-15T10:00:00Z,hi,hello,thumb_down,5
+s2,2024-01-15T10:00:00Z,hi,hello,rating,2
+s3,2024-01-15T10:00:00Z,hi,hello,rating,4
+s4,2024-01-15T10:00:00Z,hi,hello,Thumbs_Up,1"""
+    valid, _ = parse_csv_rows(body, ACCOUNT_ID)
+    assert [r["is_negative"] for r in valid] == [True, True, False, False]
+    assert is_negative_feedback("comment", "n/a") is False
+
+
+@pytest.mark.parametrize(
+    "value, negative",
+    [("2", True), (" -1 ", True), ("+.5", True), ("2.", True), ("1e0", True), ("2.5E+0", True), ("3", False), ("4.0", False),
+     ("1_0", False), ("inf", False), ("-inf", False), ("nan", False), ("0x1", False), ("1\n", True), ("\u00a01", False), ("", False),
+     # Out of double precision range: saturates to +-inf / 0.0 (the backfill's feedback_score does the same).
+     ("1e400", False), ("-1e400", True), ("1e-400", True), ("1" * 400, False), ("1e0001", False)],
+)
+def test_is_negative_feedback_accepts_the_same_scores_as_the_sql_backfill(value, negative):
+    # Pattern and cases follow migration 20261018000002: what Postgres casts, Python scores, and nothing else.
+    assert is_negative_feedback("rating", value) is negative
@@ -0,0 +1,178 @@
+# You are helping build an AI Product Decision Platform. Never add generic charts or infra metrics. All outputs must directly support: what is broken, why, and what to fix first for an AI SaaS product.
+
+import asyncio
+import zlib
+
+import numpy as np
+import pytest
+
+from app.services import insight_engine
+from app.services.insight_engine import load_cluster_state, new_logs_since, run_insight_engine, update_insight_clusters
+
+_TOPICS = {"billing": 0, "login": 1, "export": 2, "weather": 3}
+
+
+def _vector(text: str) -> list[float]:
+    topic = next(t for t in _TOPICS if t in text)
+    rng = np.random.default_rng(zlib.crc32(text.encode()))
+    v = rng.normal(0, 0.05, 8)
+    v[_TOPICS[topic]] += 1.0
+    return v.tolist()
+
+
+def _logs(topic: str, n: int, created: str, start: int = 0):
+    return [
+        {
+            "id": f"{topic}-{i}",
+            "timestamp": "2024-01-01T00:00:00Z",
+            "created_at": created,
+            "input": f"{topic} question {i}",
+            "output": "sorry",
+            "feedback_type": "thumb_down",
+            "feedback_value": "1",
+        }
+        for i in range(start, start + n)
+    ]
+
+
+@pytest.fixture
+def llm_calls(monkeypatch):
+    calls: list = []
+    monkeypatch.setattr(insight_engine.OpenAIEmbeddingProvider, "embed", lambda self, texts: [_vector(t) for t in texts])
+
+    async def explain(summary, client):
+        calls.append(summary)
+        return {"failure_cause": "cause", "user_expectation": "u", "system_behavior": "s"}
+
+    monkeypatch.setattr(insight_engine, "_explain_failure_cluster", explain)
+    return calls
+
+
+def _state_rows(insights):
+    return [dict(ins, id=f"ins-{k}") for k, ins in enumerate(insights)]
+
+
+async def test_full_run_persists_cluster_state(llm_calls):
+    logs = _logs("billing", 30, "2024-02-01T00:00:00+00:00") + _logs("login", 30, "2024-02-02T00:00:00+00:00")
+    insights = await run_insight_engine(logs, "acct", "sk-test")
+    assert sum(i["centroid_count"] for i in insights) == 60
+    assert all(i["embedding_model"] == insight_engine.EMBEDDING_MODEL for i in insights)
+    assert {i["clustered_through"] for i in insights} == {"2024-02-02T00:00:00+00:00"}
+    state = load_cluster_state(_state_rows(insights))
+    assert state is not None and len(state["clusters"]) == len(insights)
+
+
+async def test_incremental_update_assigns_new_logs_without_llm_calls(llm_calls):
+    base = _logs("billing", 30, "2024-02-01T00:00:00+00:00") + _logs("login", 30, "2024-02-01T00:00:00+00:00")
+    insights = await run_insight_engine(base, "acct", "sk-test")
+    explained = len(llm_calls)
+    state = load_cluster_state(_state_rows(insights))
+
+    fetched = base[:5] + _logs("login", 6, "2024-03-01T00:00:00+00:00", start=100)
+    new = new_logs_since(fetched, state)
+    assert [l["id"] for l in new] == [f"login-{i}" for i in range(100, 106)]
+
+    updates = update_insight_clusters(new, state, "sk-test")
+    assert len(llm_calls) == explained
+    before = {c["id"]: c["frequency"] for c in state["clusters"]}
+    assert sum(u["frequency"] - before[u["id"]] for u in updates) == 6
+    touched = {u["id"] for u in updates}
+    login_ids = {f"ins-{k}" for k, ins in enumerate(insights) if "login" in ins["example_snippets"][0]["input"]}
+    assert touched <= login_ids
+    assert {u["clustered_through"] for u in updates} == {"2024-03-01T00:00:00+00:00"}
+
+
+async def test_incremental_watermark_resumes_inside_one_insert_batch(llm_calls):
+    base = _logs("billing", 30, "2024-02-01T00:00:00+00:00") + _logs("login", 30, "2024-02-01T00:00:00+00:00")
+    rows = _state_rows(await run_insight_engine(base, "acct", "sk-test"))
+    state = load_cluster_state(rows)
+    # One upload: every row has the same created_at, and the read limit stops after the first three.
+    batch = _logs("login", 6, "2024-03-01T00:00:00+00:00", start=100)
+    updates = update_insight_clusters(new_logs_since(batch, state)[:3], state, "sk-test")
+    assert {(u["clustered_through"], u["clustered_through_id"]) for u in updates} == {("2024-03-01T00:00:00+00:00", "login-102")}
+
+    by_id = {u["id"]: u for u in updates}
+    state = load_cluster_state([{**row, **by_id.get(row["id"], {})} for row in rows])
+    assert [l["id"] for l in new_logs_since(batch, state)] == ["login-103", "login-104", "login-105"]
+
+
+async def test_incremental_update_requests_full_recluster_on_drift(llm_calls):
+    base = _logs("billing", 30, "2024-02-01T00:00:00+00:00") + _logs("login", 30, "2024-02-01T00:00:00+00:00")
+    state = load_cluster_state(_state_rows(await run_insight_engine(base, "acct", "sk-test")))
+    assert update_insight_clusters(_logs("weather", 10, "2024-03-01T00:00:00+00:00"), state, "sk-test") is None
+    # More new logs than the clusters were built from also forces a re-cluster.
+    assert update_insight_clusters(_logs("billing", 61, "2024-03-01T00:00:00+00:00", start=100), state, "sk-test") is None
+
+
+def test_state_without_centroids_is_not_usable():
+    assert load_cluster_state([{"id": "old", "frequency": 3, "centroid": None}]) is None
+    assert load_cluster_state([]) is None
+
+
+async def test_failed_explanation_falls_back_to_summary(llm_calls, monkeypatch):
+    async def explain(summary, client):
+        if "billing" in summary:
+            raise TimeoutError("LLM timed out")
+        return {"failure_cause": "Login answers are wrong", "user_expectation": "u", "system_behavior": "s"}
+
+    monkeypatch.setattr(insight_engine, "_explain_failure_cluster", explain)
+    logs = _logs("billing", 30, "2024-02-01T00:00:00+00:00") + _logs("login", 30, "2024-02-01T00:00:00+00:00")
+    insights = await run_insight_engine(logs, "acct", "sk-test")
+    assert sum(i["frequency"] for i in insights) == 60
+    for ins in insights:
+        if "billing" in ins["example_snippets"][0]["input"]:
+            assert ins["title"] == f"Negative feedback pattern ({ins['frequency']} conversations)"
+            assert ins["description"].startswith(f"Pattern: {ins['frequency']} similar conversations")
+        else:
+            assert ins["title"] == "Login answers are wrong"
+
+
+async def test_cluster_explanations_run_concurrently(llm_calls, monkeypatch):
+    monkeypatch.setattr(insight_engine, "LLM_CONCURRENCY", 4)
+    in_flight = 0
+    peak = 0
+
+    async def explain(summary, client):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.02)
+        in_flight -= 1
+        return {"failure_cause": "c"}
+
+    monkeypatch.setattr(insight_engine, "_explain_failure_cluster", explain)
+    logs = [l for t in ("billing", "login", "export", "weather") for l in _logs(t, 12, "2024-02-01T00:00:00+00:00")]
+    insights = await run_insight_engine(logs, "acct", "sk-test")
+    assert len(insights) >= 4
+    assert peak == 4
+
+
+def test_sample_evenly_spreads_over_the_stream():
+    rows = [{"i": i} for i in range(10_000)]
+    sample = insight_engine.sample_evenly(iter(rows), 10_000, 100)
+    assert len(sample) == 100
+    assert [r["i"] for r in sample[:3]] == [0, 100, 200]
+    assert sample[-1]["i"] == 9_900
+    assert insight_engine.sample_evenly(iter(rows[:50]), 50, 100) == rows[:50]
+
+
+async def test_population_mode_counts_every_log(llm_calls, monkeypatch):
+    monkeypatch.setattr(insight_engine, "ASSIGN_BLOCK_ROWS", 700)
+    population = _logs("billing", 3000, "2024-02-01T00:00:00+00:00") + _logs("login", 1000, "2024-02-03T00:00:00+00:00")
+    for log in population[:3000]:
+        log["feedback_value"] = "2"
+    streamed = []
+
+    def stream():
+        for log in population:
+            streamed.append(log["id"])
+            yield log
+
+    sample = insight_engine.sample_evenly(iter(population), len(population), 200)
+    insights = await run_insight_engine(sample, "acct", "sk-test", population=stream)
+    assert len(streamed) == 4000
+    assert sum(i["frequency"] for i in insights) == 4000
+    billing = [i for i in insights if "billing" in i["example_snippets"][0]["input"]]
+    assert sum(i["frequency"] for i in billing) == 3000
+    assert {i["avg_feedback"] for i in billing} == {"2.0"}
+    assert {i["clustered_through"] for i in insights} == {"2024-02-03T00:00:00+00:00"}
@@ -0,0 +1,111 @@
+# You are helping build an AI Product Decision Platform. Never add generic charts or infra metrics. All outputs must directly support: what is broken, why, and what to fix first for an AI SaaS product.
+
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import decision_cards, insight_engine, llm_cache, llm_gateway
+from app.services.llm_cache import LLMResponseCache, cache_key
+from app.services.llm_gateway import LLMGateway, LLMSession
+
+_CARD = {"problem": "p", "evidence_snippets": ["e"], "recommended_action": "a", "impact_level": 4, "effort_estimate": 2, "confidence_score": 0.8}
+
+
+def _completion(text: str):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))])
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    cache = LLMResponseCache(max_entries=16, ttl_sec=60)
+    monkeypatch.setattr(llm_gateway, "response_cache", cache)
+    return cache
+
+
+def _session(answers: list[str], calls: list) -> LLMSession:
+    async def create(**kwargs):
+        calls.append(kwargs)
+        return _completion(answers[min(len(calls), len(answers)) - 1])
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    return LLMGateway(client_factory=lambda key: client).session("sk-test", "acct")
+
+
+def test_cache_key_is_canonical_and_covers_params():
+    a = cache_key("m", 0.3, [{"role": "user", "content": "hi"}], max_tokens=80)
+    assert a == cache_key("m", 0.3, [{"content": "hi", "role": "user"}], max_tokens=80)
+    assert a != cache_key("m", 0.0, [{"role": "user", "content": "hi"}], max_tokens=80)
+    assert a != cache_key("m", 0.3, [{"role": "user", "content": "hi"}], max_tokens=40)
+    assert cache_key("m", 0.3, []) == cache_key("m", 0.3, [], max_tokens=None)
+
+
+def test_lru_eviction_ttl_and_counters(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(llm_cache.time, "monotonic", lambda: now[0])
+    cache = LLMResponseCache(max_entries=2, ttl_sec=10)
+    cache.put("a", "m", "A")
+    cache.put("b", "m", "B")
+    assert cache.get("a") == "A"  # a is now most recently used
+    cache.put("c", "m", "C")
+    assert cache.get("b") is None
+    now[0] += 11
+    assert cache.get("a") is None  # expired
+    cache.put("empty", "m", "")
+    assert cache.get("empty") is None  # empty answers are not cached
+    assert cache.stats() == {"hits": 1, "misses": 3, "evictions": 1, "entries": 1}
+
+
+def test_shared_store_fills_local_and_failures_are_misses():
+    class Shared:
+        def __init__(self):
+            self.rows = {"k": "shared answer"}
+
+        def get(self, key):
+            return self.rows.get(key)
+
+        def put(self, key, model, text, ttl_sec):
+            self.rows[key] = text
+
+    shared = Shared()
+    cache = LLMResponseCache(shared=shared)
+    assert cache.get("k") == "shared answer"
+    shared.rows.clear()
+    assert cache.get("k") == "shared answer"  # now served locally
+    cache.put("n", "m", "new")
+    assert shared.rows == {"n": "new"}
+
+    class Broken:
+        def get(self, key):
+            raise RuntimeError("table missing")
+
+        def put(self, key, model, text, ttl_sec):
+            raise RuntimeError("table missing")
+
+    broken = LLMResponseCache(shared=Broken())
+    assert broken.get("x") is None
+    broken.put("x", "m", "X")
+    assert broken.get("x") == "X"
+
+
+async def test_identical_card_prompt_calls_llm_once(fresh_cache):
+    calls: list = []
+    llm = _session(["not json", json.dumps([_CARD])], calls)
+    insight = {"id": "i1", "title": "Refund refusals", "frequency": 12, "example_snippets": ["x"]}
+    assert await decision_cards._llm_generate_cards_for_insight(insight, llm) == []  # malformed: not cached
+    first = await decision_cards._llm_generate_cards_for_insight(insight, llm)
+    again = await decision_cards._llm_generate_cards_for_insight(insight, llm)
+    assert first == again and first[0]["impact_level"] == 4
+    assert len(calls) == 2
+    changed = await decision_cards._llm_generate_cards_for_insight({**insight, "frequency": 13}, llm)
+    assert len(calls) == 3 and changed == first
+    assert fresh_cache.stats()["hits"] == 1
+
+
+async def test_cluster_explanation_is_cached():
+    calls: list = []
+    llm = _session(['{"failure_cause": "c", "user_expectation": "u", "system_behavior": "s"}'], calls)
+    first = await insight_engine._explain_failure_cluster("summary", llm)
+    again = await insight_engine._explain_failure_cluster("summary", llm)
+    assert first == again == {"failure_cause": "c", "user_expectation": "u", "system_behavior": "s"}
+    assert len(calls) == 1
@@ -0,0 +1,131 @@
+# You are helping build an AI Product Decision Platform. Never add generic charts or infra metrics. All outputs must directly support: what is broken, why, and what to fix first for an AI SaaS product.
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import llm_gateway
+from app.services.llm_cache import LLMResponseCache
+from app.services.llm_gateway import LLMGateway
+
+_MESSAGES = [{"role": "user", "content": "hi"}]
+
+
+class StatusError(Exception):
+    def __init__(self, status_code: int):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def _completion(text: str, prompt_tokens: int = 10, completion_tokens: int = 5):
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=text))],
+        usage=SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens),
+    )
+
+
+class FakeClient:
+    def __init__(self, create):
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=create))
+
+
+@pytest.fixture(autouse=True)
+def no_cache(monkeypatch):
+    monkeypatch.setattr(llm_gateway, "response_cache", LLMResponseCache(max_entries=0))
+    monkeypatch.setattr(llm_gateway, "BACKOFF_BASE_SEC", 0.01)
+
+
+async def test_client_is_pooled_and_tokens_are_accounted_per_account():
+    made = []
+
+    async def create(**kwargs):
+        return _completion("ok")
+
+    gw = LLMGateway(client_factory=lambda key: made.append(key) or FakeClient(create))
+    for account in ("a", "a", "b"):
+        assert await gw.chat("sk", _MESSAGES, model="m", temperature=0.0, account_id=account) == "ok"
+    assert made == ["sk"]
+    assert gw.usage("a").calls == 2 and gw.usage("a").prompt_tokens == 20 and gw.usage("a").completion_tokens == 10
+    assert gw.usage("b").calls == 1
+    assert gw.usage("nobody").calls == 0
+
+
+async def test_retries_rate_limits_and_server_errors_then_succeeds():
+    errors = [StatusError(429), StatusError(503)]
+
+    async def create(**kwargs):
+        if errors:
+            raise errors.pop(0)
+        return _completion("done")
+
+    gw = LLMGateway(client_factory=lambda key: FakeClient(create))
+    assert await gw.chat("sk", _MESSAGES, model="m", temperature=0.0) == "done"
+
+
+async def test_client_errors_and_exhausted_retries_raise():
+    attempts = []
+
+    async def bad_request(**kwargs):
+        attempts.append(1)
+        raise StatusError(400)
+
+    with pytest.raises(StatusError):
+        await LLMGateway(client_factory=lambda key: FakeClient(bad_request)).chat("sk", _MESSAGES, model="m", temperature=0.0)
+    assert len(attempts) == 1
+
+    async def overloaded(**kwargs):
+        attempts.append(1)
+        raise StatusError(500)
+
+    attempts.clear()
+    with pytest.raises(StatusError):
+        await LLMGateway(max_retries=2, client_factory=lambda key: FakeClient(overloaded)).chat("sk", _MESSAGES, model="m", temperature=0.0)
+    assert len(attempts) == 3
+
+
+async def test_deadline_covers_the_whole_call():
+    async def hang(**kwargs):
+        await asyncio.sleep(5)
+
+    gw = LLMGateway(client_factory=lambda key: FakeClient(hang))
+    with pytest.raises(asyncio.TimeoutError):
+        await gw.chat("sk", _MESSAGES, model="m", temperature=0.0, timeout_sec=0.05)
+
+
+async def test_global_and_per_account_concurrency_limits():
+    in_flight: dict[str, int] = {}
+    peak: dict[str, int] = {}
+
+    async def create(**kwargs):
+        account = kwargs["messages"][0]["content"]
+        in_flight[account] = in_flight.get(account, 0) + 1
+        in_flight["*"] = in_flight.get("*", 0) + 1
+        for k in (account, "*"):
+            peak[k] = max(peak.get(k, 0), in_flight[k])
+        await asyncio.sleep(0.02)
+        in_flight[account] -= 1
+        in_flight["*"] -= 1
+        return _completion("ok")
+
+    gw = LLMGateway(max_concurrency=3, account_concurrency=2, client_factory=lambda key: FakeClient(create))
+    await asyncio.gather(*(
+        gw.chat("sk", [{"role": "user", "content": account}], model="m", temperature=0.0, account_id=account)
+        for account in ("a", "b", "c") for _ in range(4)
+    ))
+    assert peak["*"] == 3
+    assert max(peak[a] for a in "abc") == 2
+
+
+async def test_per_account_state_does_not_grow_with_every_account(monkeypatch):
+    monkeypatch.setattr(llm_gateway, "MAX_USAGE_ACCOUNTS", 3)
+
+    async def create(**kwargs):
+        return _completion("ok")
+
+    gw = LLMGateway(client_factory=lambda key: FakeClient(create))
+    for i in range(10):
+        await gw.chat("sk", _MESSAGES, model="m", temperature=0.0, account_id=f"acct-{i}")
+    assert gw._accounts == {}  # semaphores are dropped once an account has no calls in flight
+    assert list(gw._usage) == ["acct-7", "acct-8", "acct-9"]
+    assert gw.usage("acct-9").calls == 1 and gw.usage("acct-0").calls == 0
@@ -0,0 +1,102 @@
+# You are helping build an AI Product Decision Platform. Never add generic charts or infra metrics. All outputs must directly support: what is broken, why, and what to fix first for an AI SaaS product.
+
+import threading
+import time
+
+import httpx
+import pytest
+
+from app.services import log_writer
+from app.services.log_writer import insert_log_rows
+
+
+def _rows(n: int, start: int = 1):
+    for i in range(start, start + n):
+        yield i, {"session_id": f"s{i}", "input": "x", "output": "y"}
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(log_writer, "BACKOFF_BASE_SEC", 0.0)
+
+
+async def test_insert_log_rows_bounds_concurrency_and_counts_all_rows():
+    lock = threading.Lock()
+    in_flight = 0
+    peak = 0
+
+    def insert(_supabase, chunk):
+        nonlocal in_flight, peak
+        with lock:
+            in_flight += 1
+            peak = max(peak, in_flight)
+        time.sleep(0.01)
+        with lock:
+            in_flight -= 1
+        return len(chunk), 0
+
+    result = await insert_log_rows(None, _rows(5000), max_concurrency=3, insert=insert)
+    assert result["stored"] == 5000
+    assert result["failed"] == 0
+    assert result["stored_ranges"] == [{"from": 1, "to": 5000}]
+    assert 1 < peak <= 3
+
+
+async def test_insert_log_rows_retries_transient_errors():
+    calls = 0
+
+    def insert(_supabase, chunk):
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            raise httpx.ConnectError("reset")
+        return len(chunk), 0
+
+    result = await insert_log_rows(None, _rows(10), insert=insert)
+    assert result["stored"] == 10
+    assert calls == 2
+
+
+async def test_non_idempotent_insert_is_not_retried_once_sent():
+    calls = []
+
+    def insert(_supabase, chunk):
+        calls.append(chunk[0]["session_id"])
+        if len(calls) == 1:
+            raise httpx.ConnectError("refused")  # never sent: safe to send again
+        if len(calls) == 2:
+            raise httpx.ReadTimeout("no response")  # may have been written
+        return len(chunk), 0
+
+    result = await insert_log_rows(None, _rows(10), insert=insert, idempotent=False)
+    assert calls == ["s1", "s1"]
+    assert result["stored"] == 0
+    assert result["failed_ranges"] == [{"from": 1, "to": 10}]
+
+
+async def test_idempotent_insert_is_retried_after_timeout():
+    calls = 0
+
+    def insert(_supabase, chunk):
+        nonlocal calls
+        calls += 1
+        if calls < log_writer.MAX_ATTEMPTS:
+            raise httpx.ReadTimeout("no response")
+        return len(chunk), 0
+
+    result = await insert_log_rows(None, _rows(10), insert=insert)
+    assert result["stored"] == 10
+    assert calls == log_writer.MAX_ATTEMPTS
+
+
+async def test_insert_log_rows_reports_failed_ranges():
+    def insert(_supabase, chunk):
+        if chunk[0]["session_id"] == "s1":
+            raise ValueError("bad row")
+        return len(chunk), 0
+
+    result = await insert_log_rows(None, _rows(1200), max_concurrency=1, insert=insert)
+    assert result["failed_ranges"] == [{"from": 1, "to": 500}]
+    assert result["stored_ranges"] == [{"from": 501, "to": 1200}]
+    assert result["stored"] == 700
+    assert result["failed"] == 500
@@ -0,0 +1,119 @@
+# You are helping build an AI Product Decision Platform. Never add generic charts or infra metrics. All outputs must directly support: what is broken, why, and what to fix first for an AI SaaS product.
+
+import asyncio
+import os
+import threading
+import time
+
+import httpx
+import pytest
+
+from app.dependencies import get_account_context, get_supabase
+from app.main import app
+from app.routers import insights as insights_router
+from app.services import offload
+from app.services.organization import AccountContext
+
+SLOW_QUERY_SEC = 0.5
+
+
+@pytest.fixture(autouse=True)
+def pools():
+    yield
+    offload.configure_offload(offload.DEFAULT_IO_WORKERS, offload.DEFAULT_CPU_WORKERS)
+
+
+class _SlowQuery:
+    """PostgREST builder whose execute() blocks like a slow query over the network."""
+
+    def __init__(self, rows):
+        self._rows = rows
+
+    def __getattr__(self, _name):
+        return lambda *a, **k: self
+
+    def execute(self):
+        time.sleep(SLOW_QUERY_SEC)
+        return type("Result", (), {"data": self._rows, "count": len(self._rows)})()
+
+
+class _SlowSupabase:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def table(self, _name):
+        return _SlowQuery(self._rows)
+
+
+def _negative_logs(n: int):
+    topics = ["refund was refused", "login link expired", "export has no columns"]
+    return [
+        {
+            "id": f"log-{i}",
+            "timestamp": f"2024-01-01T00:{i // 60:02d}:{i % 60:02d}Z",
+            "created_at": "2024-01-02T00:00:00+00:00",
+            "input": f"{topics[i % 3]} case {i}",
+            "output": "sorry, I cannot help with that",
+            "feedback_type": "thumb_down",
+            "feedback_value": "-1",
+        }
+        for i in range(n)
+    ]
+
+
+async def test_io_pool_is_bounded():
+    offload.configure_offload(io_workers=2, cpu_workers=0)
+    running, peak = [0], [0]
+    lock = threading.Lock()
+
+    def work():
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.05)
+        with lock:
+            running[0] -= 1
+        return threading.current_thread().name
+
+    names = await asyncio.gather(*(offload.run_io(work) for _ in range(6)))
+    assert peak[0] == 2
+    assert all(n.startswith("io") for n in names)
+
+
+async def test_cpu_work_runs_in_another_process():
+    offload.configure_offload(io_workers=2, cpu_workers=1)
+    assert await offload.run_cpu(os.getpid) != os.getpid()
+    offload.configure_offload(io_workers=2, cpu_workers=0)
+    assert await offload.run_cpu(os.getpid) == os.getpid()  # on the I/O threads
+
+
+async def test_health_stays_fast_while_generate_runs(monkeypatch):
+    async def allow(_account_id, _key):
+        return True
+
+    monkeypatch.setattr(insights_router, "check_rate_limit", allow)
+    app.dependency_overrides[get_account_context] = lambda: AccountContext(user_id="user-a", account_id="acct-a", organization=None)
+    app.dependency_overrides[get_supabase] = lambda: _SlowSupabase(_negative_logs(90))
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            await client.get("/health")  # warm up the server thread pool
+            started = time.perf_counter()
+            generate = asyncio.create_task(client.post("/insights/generate?preview=true"))
+            # Each tick includes a short sleep, so time the loop spends blocked by generate is measured too.
+            latencies = []
+            while not generate.done() and len(latencies) < 20:
+                t0 = time.perf_counter()
+                await asyncio.sleep(0.02)
+                r = await client.get("/health")
+                latencies.append(time.perf_counter() - t0)
+                assert r.status_code == 200
+            resp = await generate
+            elapsed = time.perf_counter() - started
+    finally:
+        app.dependency_overrides.clear()
+
+    assert resp.status_code == 200, resp.text
+    assert resp.json()["mode"] == "preview" and resp.json()["count"] > 0
+    assert elapsed >= SLOW_QUERY_SEC
+    assert len(latencies) >= 5  # health checks were answered while generate was still running
+    assert max(latencies) < SLOW_QUERY_SEC / 2
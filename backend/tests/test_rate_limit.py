@@ -0,0 +1,109 @@
+# You are helping build an AI Product Decision Platform. Never add generic charts or infra metrics. All outputs must directly support: what is broken, why, and what to fix first for an AI SaaS product.
+
+from types import SimpleNamespace
+
+import pytest
+
+from app import rate_limit
+from app.rate_limit import MemoryRateLimitBackend, RateLimit, RateLimiter, SupabaseRateLimitBackend, parse_limits
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [6000.0]  # start of a 600s window
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: now[0])
+    return now
+
+
+class _RpcStandIn:
+    """Local stand-in for the rate_limit_hit function: one counter store shared by every client."""
+
+    def __init__(self):
+        self.store = MemoryRateLimitBackend()
+        self.calls: list = []
+        self.down = False
+
+    def rpc(self, name, params):
+        self.calls.append((name, params))
+        if self.down:
+            raise ConnectionError("database unreachable")
+        allowed = self.store.hit(params["p_key"], RateLimit(params["p_limit"], params["p_window_sec"]))
+        return SimpleNamespace(execute=lambda: SimpleNamespace(data=allowed))
+
+
+def test_sliding_window_weights_the_previous_window(clock):
+    backend = MemoryRateLimitBackend()
+    limit = RateLimit(max_requests=10, window_sec=600)
+    assert all(backend.hit("k", limit) for _ in range(10))
+    assert not backend.hit("k", limit)
+    clock[0] += 600 + 90  # 15% into the next window: 10 x 0.85 = 8.5 still count
+    assert backend.hit("k", limit)
+    assert not backend.hit("k", limit)
+    clock[0] += 300  # 65% in: 10 x 0.35 + 1 = 4.5
+    assert [backend.hit("k", limit) for _ in range(6)] == [True] * 5 + [False]
+    clock[0] += 1200  # two windows idle: nothing counts any more
+    assert all(backend.hit("k", limit) for _ in range(10))
+
+
+def test_idle_keys_are_evicted_and_key_count_is_bounded(clock):
+    backend = MemoryRateLimitBackend(max_keys=50)
+    limit = RateLimit(max_requests=1, window_sec=60)
+    for i in range(200):
+        backend.hit(f"acct-{i}", limit)
+    assert len(backend) == 50
+    clock[0] += 120
+    backend.hit("acct-new", limit)
+    assert len(backend) == 1
+
+
+def test_limits_per_endpoint_key(clock):
+    limiter = RateLimiter(limits=parse_limits("ingestion/upload=3/60, insights/generate=1/600"))
+    assert [limiter.check("a", "ingestion/upload") for _ in range(4)] == [True, True, True, False]
+    assert [limiter.check("a", "insights/generate") for _ in range(2)] == [True, False]
+    assert limiter.check("b", "insights/generate")  # per account
+    assert [limiter.check("a", "decision_cards/generate") for _ in range(11)] == [True] * 10 + [False]
+
+
+@pytest.mark.parametrize("spec", ["upload", "upload=3", "upload=x/60", "=3/60", "upload=3/0"])
+def test_parse_limits_rejects_malformed_entries(spec):
+    with pytest.raises(ValueError):
+        parse_limits(spec)
+
+
+def test_shared_backend_limits_across_instances(clock):
+    db = _RpcStandIn()
+    limit = {"insights/generate": RateLimit(2, 600)}
+    first = RateLimiter(limits=limit, shared=SupabaseRateLimitBackend(db))
+    second = RateLimiter(limits=limit, shared=SupabaseRateLimitBackend(db))
+    assert first.check("acct", "insights/generate")
+    assert second.check("acct", "insights/generate")
+    assert not first.check("acct", "insights/generate")
+    assert db.calls[0] == ("rate_limit_hit", {"p_key": "insights/generate:acct", "p_limit": 2, "p_window_sec": 600})
+
+
+def test_unreachable_shared_backend_falls_back_to_local_counters(clock):
+    db = _RpcStandIn()
+    db.down = True
+    limiter = RateLimiter(limits={"k": RateLimit(1, 600)}, shared=SupabaseRateLimitBackend(db))
+    assert limiter.check("acct", "k")
+    assert not limiter.check("acct", "k")
+
+
+def test_unreachable_shared_backend_is_retried_after_a_cooldown(clock):
+    db = _RpcStandIn()
+    db.down = True
+    limiter = RateLimiter(limits={"k": RateLimit(100, 600)}, shared=SupabaseRateLimitBackend(db))
+    for _ in range(5):
+        assert limiter.check("acct", "k")
+    assert len(db.calls) == 1  # later requests skip the unreachable table instead of waiting on it
+    db.down = False
+    clock[0] += rate_limit.SHARED_RETRY_SEC
+    assert limiter.check("acct", "k")
+    assert len(db.calls) == 2
+    assert db.store.hit("k:acct", RateLimit(100, 600))  # counted in the shared table again
+
+
+async def test_check_rate_limit_uses_the_process_limiter(clock, monkeypatch):
+    monkeypatch.setattr(rate_limit, "rate_limiter", RateLimiter(limits={"ingestion/upload": RateLimit(1, 600)}))
+    assert await rate_limit.check_rate_limit("acct", "ingestion/upload")
+    assert not await rate_limit.check_rate_limit("acct", "ingestion/upload")
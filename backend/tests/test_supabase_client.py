@@ -0,0 +1,43 @@
+# You are helping build an AI Product Decision Platform. Never add generic charts or infra metrics. All outputs must directly support: what is broken, why, and what to fix first for an AI SaaS product.
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from app import dependencies
+from app.config import settings
+from app.main import app
+
+
+@pytest.fixture
+def storage(monkeypatch):
+    monkeypatch.setattr(settings, "supabase_url", "https://project.supabase.co")
+    monkeypatch.setattr(settings, "supabase_service_role_key", "service-role")
+    monkeypatch.setattr(settings, "supabase_pool_size", 7)
+    dependencies.close_supabase()
+    yield
+    dependencies.close_supabase()
+
+
+def test_one_pooled_client_is_shared(storage):
+    first = dependencies.get_supabase()
+    assert dependencies.get_supabase() is first
+    http = dependencies._http
+    assert first.postgrest.session is http  # PostgREST requests go through the shared pool
+    assert http._transport._pool._max_connections == 7
+    assert http._transport._pool._http2 is True
+
+
+def test_lifespan_creates_and_closes_the_client(storage):
+    with TestClient(app):
+        client = dependencies._supabase
+        assert client is not None
+        assert dependencies.get_supabase() is client
+    assert dependencies._supabase is None
+
+
+def test_unconfigured_storage_is_503(monkeypatch):
+    monkeypatch.setattr(settings, "supabase_url", "")
+    with pytest.raises(HTTPException) as exc:
+        dependencies.get_supabase()
+    assert exc.value.status_code == 503
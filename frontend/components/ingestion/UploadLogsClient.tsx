@@ -79,7 +79,7 @@ export default function UploadLogsClient() {
       e.preventDefault();
       setDrag(false);
       const f = e.dataTransfer.files[0];
-      if (f && (f.name.endsWith(".csv") || f.name.endsWith(".json"))) uploadFile(f);
+      if (f && /\.(csv|json|jsonl|ndjson)(\.(gz|zst))?$/i.test(f.name)) uploadFile(f);
     },
     [uploadFile]
   );
@@ -113,7 +113,7 @@ export default function UploadLogsClient() {
       >
         <input
           type="file"
-          accept=".csv,.json"
+          accept=".csv,.json,.jsonl,.ndjson,.gz,.zst"
           className="hidden"
           id="file-upload"
           onChange={(e) => {
@@ -12,6 +12,7 @@ type GenerateResult = {
   count: number;
   insights: Array<{ title: string; description: string; frequency: number }>;
   message?: string;
+  mode?: "full" | "incremental";
 } | null;
 
 export default function GenerateInsightsClient() {
@@ -79,7 +80,9 @@ export default function GenerateInsightsClient() {
         <div className="rounded-xl border border-brand-cyan/50 bg-brand-cyan/5 p-4">
           {result.count > 0 ? (
             <>
-              <p className="text-white font-medium mb-2">Generated {result.count} insight(s).</p>
+              <p className="text-white font-medium mb-2">
+                {result.mode === "incremental" && result.message ? result.message : `Generated ${result.count} insight(s).`}
+              </p>
               <p className="text-white/70 text-sm mb-4">
                 These are failure patterns from your logs with plain-language explanations.
               </p>
@@ -0,0 +1,41 @@
+-- You are helping build an AI Product Decision Platform. Never add generic charts or infra metrics.
+-- ai_logs dedup: content_hash = first 128 bits (hex) of sha256(account_id, session_id, timestamp in UTC, input, output),
+-- joined with \x1f. Must match app.ingestion.content_hash; re-uploaded rows are skipped at insert time.
+
+alter table public.ai_logs
+  add column if not exists content_hash text;
+
+-- Backfill without deleting data: only the earliest copy of each duplicate group gets the hash, so the
+-- unique index can be built. Older duplicates keep content_hash null (see the cleanup query at the bottom).
+with hashed as (
+  select
+    id,
+    account_id,
+    encode(substring(sha256(convert_to(
+      account_id::text || E'\x1f' ||
+      session_id || E'\x1f' ||
+      to_char(timestamp at time zone 'UTC', 'YYYY-MM-DD"T"HH24:MI:SS.US"Z"') || E'\x1f' ||
+      input || E'\x1f' ||
+      output,
+      'UTF8'
+    )) from 1 for 16), 'hex') as h,
+    created_at
+  from public.ai_logs
+  where content_hash is null
+),
+ranked as (
+  select id, h, row_number() over (partition by account_id, h order by created_at, id) as rn
+  from hashed
+)
+update public.ai_logs l
+set content_hash = ranked.h
+from ranked
+where l.id = ranked.id and ranked.rn = 1;
+
+create unique index if not exists idx_ai_logs_account_content_hash
+  on public.ai_logs (account_id, content_hash);
+
+comment on column public.ai_logs.content_hash is 'Dedup key (see app.ingestion.content_hash). Null only on pre-existing duplicate rows.';
+
+-- Optional cleanup of pre-existing duplicates (they would otherwise still count in insight clustering):
+--   delete from public.ai_logs where content_hash is null;
@@ -0,0 +1,44 @@
+-- You are helping build an AI Product Decision Platform. Never add generic charts or infra metrics.
+-- ai_logs.is_negative: negative-feedback flag computed once at ingest (app.ingestion.is_negative_feedback),
+-- so insight generation fetches only negative rows instead of every log for the account.
+
+alter table public.ai_logs
+  add column if not exists is_negative boolean not null default false;
+
+-- Python's float() saturates where the double precision cast raises: overflow gives +-inf, underflow 0.0.
+-- Do the same here so one value like '1e400' cannot abort the backfill. The score pattern caps the exponent
+-- at 3 digits, which numeric accepts on every Postgres version.
+create or replace function pg_temp.feedback_score(v text)
+returns double precision
+language plpgsql
+immutable
+as $$
+declare
+  n numeric;
+begin
+  return v::double precision;
+exception when numeric_value_out_of_range then
+  n := v::numeric;
+  if abs(n) < 1 then
+    return 0.0;
+  end if;
+  return sign(n) * 'infinity'::double precision;
+end;
+$$;
+
+-- Backfill with the same rule as is_negative_feedback: the type decides; otherwise a numeric value below 3.
+update public.ai_logs
+set is_negative = case
+  when lower(feedback_type) in ('thumb_down', 'thumbs_down', 'negative', 'down') then true
+  when lower(feedback_type) in ('thumb_up', 'thumbs_up', 'positive', 'up') then false
+  when feedback_value ~ '^\s*[-+]?([0-9]+\.?[0-9]*|\.[0-9]+)([eE][-+]?[0-9]{1,3})?\s*$'
+    then pg_temp.feedback_score(feedback_value) < 3.0
+  else false
+end;
+
+-- Insight generation reads the newest negative logs per account.
+create index if not exists idx_ai_logs_account_negative_ts
+  on public.ai_logs (account_id, timestamp desc)
+  where is_negative;
+
+comment on column public.ai_logs.is_negative is 'Negative feedback (thumb_down etc. or score < 3); set at ingest, see app.ingestion.is_negative_feedback.';
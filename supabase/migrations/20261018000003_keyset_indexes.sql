@@ -0,0 +1,12 @@
+-- You are helping build an AI Product Decision Platform. Never add generic charts or infra metrics.
+-- Composite indexes for keyset pagination (app.services.log_reader.iter_account_rows): each page is
+-- "account_id = ? and (ts, id) < (?, ?) order by ts desc, id desc limit n", served by one index range scan.
+
+create index if not exists idx_insights_account_created_id
+  on public.insights (account_id, created_at desc, id desc);
+
+create index if not exists idx_decision_cards_account_created_id
+  on public.decision_cards (account_id, created_at desc, id desc);
+
+create index if not exists idx_ai_logs_account_timestamp_id
+  on public.ai_logs (account_id, timestamp desc, id desc);
@@ -0,0 +1,18 @@
+-- You are helping build an AI Product Decision Platform. Never add generic charts or infra metrics.
+-- Embedding cache for insight generation: re-runs only embed logs that were not embedded before.
+-- key = app.services.embedding_store.embedding_key(text, model); vector = base64 little-endian float32.
+
+create table if not exists public.ai_log_embeddings (
+  account_id uuid not null,
+  key text not null,
+  model text not null,
+  dims int not null,
+  vector text not null,
+  created_at timestamptz default now(),
+  primary key (account_id, key)
+);
+
+-- Written and read only by the backend (service role); no client access.
+alter table public.ai_log_embeddings enable row level security;
+
+comment on table public.ai_log_embeddings is 'Cached embeddings of negative-feedback log texts (see app.services.embedding_store).';
@@ -0,0 +1,23 @@
+-- You are helping build an AI Product Decision Platform. Never add generic charts or infra metrics.
+-- Persisted cluster state per insight so /insights/generate can fold new negative logs into existing
+-- insights (app.services.insight_engine.update_insight_clusters) instead of re-clustering from scratch.
+
+alter table public.insights
+  add column if not exists centroid text,                       -- base64 little-endian float32 (see embedding_store.encode_vector)
+  add column if not exists centroid_count int not null default 0,
+  add column if not exists centroid_spread double precision,    -- mean distance of member logs to the centroid
+  add column if not exists embedding_model text,
+  add column if not exists clustered_through timestamptz,       -- newest ai_logs.created_at folded into this cluster
+  add column if not exists active boolean not null default true; -- false once a full re-cluster replaced it
+
+-- Insights list, Decision Card generation and the incremental update read only active insights.
+create index if not exists idx_insights_account_active
+  on public.insights (account_id, created_at desc, id desc)
+  where active;
+
+-- Incremental runs read negative logs ingested after the watermark.
+create index if not exists idx_ai_logs_account_negative_created
+  on public.ai_logs (account_id, created_at, id)
+  where is_negative;
+
+comment on column public.insights.active is 'False when a later full re-cluster superseded this insight; kept for existing Decision Cards.';
@@ -0,0 +1,18 @@
+-- You are helping build an AI Product Decision Platform. Never add generic charts or infra metrics.
+-- Optional shared LLM response cache (LLM_CACHE_SHARED=true): identical prompts across instances and restarts
+-- reuse one answer. key = app.services.llm_cache.cache_key(model, temperature, messages, ...).
+
+create table if not exists public.llm_response_cache (
+  key text primary key,
+  model text not null,
+  response text not null,
+  expires_at timestamptz not null,
+  created_at timestamptz default now()
+);
+
+create index if not exists llm_response_cache_expires_at_idx on public.llm_response_cache (expires_at);
+
+-- Written and read only by the backend (service role); no client access.
+alter table public.llm_response_cache enable row level security;
+
+comment on table public.llm_response_cache is 'Cached LLM answers keyed by model, temperature and canonical prompt hash (see app.services.llm_cache).';
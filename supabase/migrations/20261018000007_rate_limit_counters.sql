@@ -0,0 +1,61 @@
+-- You are helping build an AI Product Decision Platform. Never add generic charts or infra metrics.
+-- Optional shared rate limit (RATE_LIMIT_SHARED=true): all backend instances count requests against the same
+-- sliding-window counters. One row per limited key (endpoint key + account_id); see app.rate_limit.
+
+create table if not exists public.rate_limit_counters (
+  key text primary key,
+  window_start timestamptz not null,
+  current_count integer not null default 0,
+  previous_count integer not null default 0,
+  expires_at timestamptz not null
+);
+
+create index if not exists rate_limit_counters_expires_at_idx on public.rate_limit_counters (expires_at);
+
+-- Written and read only by the backend (service role); no client access.
+alter table public.rate_limit_counters enable row level security;
+
+-- Sliding-window counter: the request is allowed if previous_count weighted by the share of the previous window
+-- still inside the sliding window, plus current_count, plus this request stays within p_limit. Windows are
+-- aligned to multiples of p_window_sec. Rows idle for two windows carry no count and are deleted.
+create or replace function public.rate_limit_hit(p_key text, p_limit integer, p_window_sec integer)
+returns boolean
+language plpgsql
+as $$
+declare
+  now_ts timestamptz := clock_timestamp();
+  win interval := make_interval(secs => p_window_sec);
+  cur_start timestamptz := to_timestamp(floor(extract(epoch from now_ts) / p_window_sec) * p_window_sec);
+  counter public.rate_limit_counters%rowtype;
+  prev integer := 0;
+  cur integer := 0;
+  allowed boolean;
+begin
+  delete from public.rate_limit_counters where expires_at < now_ts and key <> p_key;
+
+  insert into public.rate_limit_counters (key, window_start, expires_at)
+  values (p_key, cur_start, cur_start + 2 * win)
+  on conflict (key) do nothing;
+  select * into counter from public.rate_limit_counters where key = p_key for update;
+
+  if counter.window_start = cur_start then
+    prev := counter.previous_count;
+    cur := counter.current_count;
+  elsif counter.window_start = cur_start - win then
+    prev := counter.current_count;
+  end if;
+
+  allowed := prev * (1 - extract(epoch from now_ts - cur_start) / p_window_sec) + cur + 1 <= p_limit;
+  update public.rate_limit_counters
+  set window_start = cur_start,
+      previous_count = prev,
+      current_count = cur + (case when allowed then 1 else 0 end),
+      expires_at = cur_start + 2 * win
+  where key = p_key;
+  return allowed;
+end;
+$$;
+
+revoke execute on function public.rate_limit_hit(text, integer, integer) from public, anon, authenticated;
+
+comment on table public.rate_limit_counters is 'Shared sliding-window request counters per endpoint key and account (see app.rate_limit).';
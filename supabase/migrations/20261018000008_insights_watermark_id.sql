@@ -0,0 +1,6 @@
+-- You are helping build an AI Product Decision Platform. Never add generic charts or infra metrics.
+-- Incremental insight runs resume at the (created_at, id) keyset position of the last folded log. Rows of one
+-- upload batch share created_at, so the timestamp alone cannot tell which of them were already folded in.
+
+alter table public.insights
+  add column if not exists clustered_through_id uuid;  -- id of the ai_logs row at clustered_through (keyset tiebreak)
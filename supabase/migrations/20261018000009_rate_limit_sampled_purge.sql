@@ -0,0 +1,52 @@
+-- You are helping build an AI Product Decision Platform. Never add generic charts or infra metrics.
+-- rate_limit_hit no longer deletes every expired counter on every call: the purge ran a table-wide delete inside
+-- the caller's transaction, so concurrent calls waited on (or deadlocked over) each other's expired rows.
+-- Now about 1 call in 100 removes at most 500 expired rows, skipping rows another call has locked.
+
+create or replace function public.rate_limit_hit(p_key text, p_limit integer, p_window_sec integer)
+returns boolean
+language plpgsql
+as $$
+declare
+  now_ts timestamptz := clock_timestamp();
+  win interval := make_interval(secs => p_window_sec);
+  cur_start timestamptz := to_timestamp(floor(extract(epoch from now_ts) / p_window_sec) * p_window_sec);
+  counter public.rate_limit_counters%rowtype;
+  prev integer := 0;
+  cur integer := 0;
+  allowed boolean;
+begin
+  if random() < 0.01 then
+    delete from public.rate_limit_counters
+    where key in (
+      select key from public.rate_limit_counters
+      where expires_at < now_ts and key <> p_key
+      limit 500
+      for update skip locked
+    );
+  end if;
+
+  insert into public.rate_limit_counters (key, window_start, expires_at)
+  values (p_key, cur_start, cur_start + 2 * win)
+  on conflict (key) do nothing;
+  select * into counter from public.rate_limit_counters where key = p_key for update;
+
+  if counter.window_start = cur_start then
+    prev := counter.previous_count;
+    cur := counter.current_count;
+  elsif counter.window_start = cur_start - win then
+    prev := counter.current_count;
+  end if;
+
+  allowed := prev * (1 - extract(epoch from now_ts - cur_start) / p_window_sec) + cur + 1 <= p_limit;
+  update public.rate_limit_counters
+  set window_start = cur_start,
+      previous_count = prev,
+      current_count = cur + (case when allowed then 1 else 0 end),
+      expires_at = cur_start + 2 * win
+  where key = p_key;
+  return allowed;
+end;
+$$;
+
+revoke execute on function public.rate_limit_hit(text, integer, integer) from public, anon, authenticated;